@@ -2,38 +2,192 @@
 """
 Script to add packaging structure information to drugs inventory using AI.
 Processes drugs in batches and updates the JSON file with packaging hierarchy.
+
+Drugs are first run through the deterministic rules in packaging_inference
+(exact stock-quantity ratios, then packaging conventions); those inferred
+with at least --min-confidence are filled in straight away, and only the
+rest go to the model. Every inference is logged with its source and
+confidence to <drugs>_inference.jsonl.
+
+With --concurrency above 1, batches are sent through one pooled async client
+with many requests in flight, within optional requests-per-minute and
+tokens-per-minute limits. Results are still applied and checkpointed in
+batch order.
+
+Answers are kept in a persistent cache (packaging_cache.sqlite next to the
+drugs file) keyed by drug name and unit chain; cached drugs are filled in
+before batching, so only cache misses are sent to the model. Drugs that
+differ only in brand (same active ingredient, strength and unit chain) are
+sent once and the answer is copied to the rest of the group, with every
+copy logged to <drugs>_groups.jsonl.
+
+Batches are packed to a prompt and completion token budget rather than a
+fixed count, and the number of drugs per batch shrinks when responses come
+back cut off or incomplete and grows while they come back complete.
+
+Progress is kept in an append-only journal (<drugs>_journal.jsonl) holding
+each drug's result as it arrives; a rerun replays it to restore both the
+results and which drugs are done. The journal is compacted when a run ends
+without saving, and removed once the final results are saved.
+
+Failed calls are retried with exponential backoff and jitter. A batch that
+keeps failing, is rejected for its content (e.g. a content filter or the
+context length), or comes back cut off, is split in half until the drug at
+fault is isolated, and drugs a response leaves out are sent again; whatever
+is still unprocessed at the end is listed and left for the next run.
+
+Every model call is recorded (tokens, latency, attempt, parse path) to
+<drugs>_metrics.jsonl, with run-level percentiles and cost when the run
+ends. --dry-run estimates calls, tokens, cost and wall time without sending
+anything. The default compact prompt lists each drug on one line and asks
+for just the counts per level; --prompt-template verbose uses the original
+prompt and reply format.
+
+Manual prompts (option 2) get batch IDs, hashed from the drugs in each
+batch, recorded in <drugs>_manifest.json. Responses saved as <batch id>.json in a directory
+(<drugs>_responses/ by default) are ingested in one pass with --ingest or
+option 4: validated in parallel against the manifest and applied with a
+single checkpoint.
 """
 
+import argparse
+import asyncio
+import copy
 import json
 import os
+import shutil
+import math
+import statistics
+import time
+from collections import Counter
 from datetime import datetime
 from typing import List, Dict, Any
 import sys
 
+from batch_planner import (
+    DEFAULT_COMPLETION_BUDGET,
+    DEFAULT_MAX_BATCH_SIZE,
+    DEFAULT_PROMPT_BUDGET,
+    BatchSizer,
+    estimate_completion_tokens,
+    next_batch_end,
+)
+from compressed_io import compression_for, format_suffixes, open_compressed, open_decompressed
+from drug_groups import group_drugs
+from inventory_io import save_items
+from inventory_snapshot import load_snapshot_items
+from packaging_cache import DEFAULT_CACHE_NAME, PackagingCache, unit_chain
+from packaging_inference import DEFAULT_MIN_CONFIDENCE, infer
+from rate_limiter import RateLimiter, estimate_tokens
+from response_manifest import (
+    BATCH_ID_PREFIX,
+    build_manifest,
+    entry_matches,
+    find_responses,
+    load_manifest,
+    save_manifest,
+    validate_response,
+    validate_responses,
+)
+from result_journal import ResultJournal
+from retry_policy import RetryPolicy, is_fatal
+from run_metrics import (
+    COMPLETION_PRICE_PER_MILLION,
+    PROMPT_PRICE_PER_MILLION,
+    RunMetrics,
+    cost,
+    count_tokens,
+    recorded_latencies,
+)
+
 # You'll need to install: pip install openai
 # Or use any other AI API you prefer
 try:
-    from openai import OpenAI
+    from openai import AsyncOpenAI, OpenAI
 except ImportError:
     print("Warning: openai package not installed. Install with: pip install openai")
     print("You can still generate prompts and process manually.")
-    OpenAI = None
+    AsyncOpenAI = OpenAI = None
+
+MODEL = "gpt-4o"  # or "gpt-4" or "gpt-3.5-turbo"
+SYSTEM_PROMPT = "You are a pharmaceutical packaging expert. Return only valid JSON."
+
+PROMPT_TEMPLATES = ('compact', 'verbose')
+
+# Compact prompt: drugs numbered within the batch, one per line, and a reply
+# of counts only; unit names are filled back in from each drug's unit chain
+COMPACT_PROMPT = """For each drug below, give its packaging hierarchy: how many of each unit fit in the unit before it. Units are listed largest first. Use standard pharmaceutical packaging (packs often hold 10 cards, cards 10 tablets; a Container is a bottle or jar).
+
+Reply with JSON only: {{"drugs": [{{"n": <drug number>, "contains": [<one count per "->">]}}]}}. Use [] for a drug with one unit.
+
+{drugs}"""
+
+# Dry-run wall time without recorded calls: fixed cost plus generation time
+CALL_OVERHEAD_SECONDS = 1.0
+COMPLETION_TOKENS_PER_SECOND = 60
+
+
+class TruncatedResponseError(ValueError):
+    """The model stopped at the output token limit before finishing its answer."""
 
 
 class PackagingStructureAdder:
-    def __init__(self, json_file_path: str, batch_size: int = 12):
+    def __init__(self, json_file_path: str, batch_size: int = 12, compress_backup: bool = False,
+                 cache: PackagingCache = None, group_identical: bool = True,
+                 prompt_budget: int = DEFAULT_PROMPT_BUDGET, completion_budget: int = DEFAULT_COMPLETION_BUDGET,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, adaptive: bool = True,
+                 retry: RetryPolicy = None, max_requeues: int = 2, base_url: str = None,
+                 use_rules: bool = True, min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+                 prompt_template: str = 'compact', metrics: RunMetrics = None,
+                 prompt_price: float = PROMPT_PRICE_PER_MILLION,
+                 completion_price: float = COMPLETION_PRICE_PER_MILLION):
         self.json_file_path = json_file_path
         self.batch_size = batch_size
+        self.prompt_budget = prompt_budget
+        self.completion_budget = completion_budget
+        # Drugs per batch starts at batch_size and adapts to the responses
+        if adaptive:
+            self.sizer = BatchSizer(batch_size, maximum=max_batch_size)
+        else:
+            self.sizer = BatchSizer(batch_size, minimum=batch_size, maximum=batch_size)
+        self.retry = retry or RetryPolicy()
+        # Times a drug left out of a response is sent again before giving up
+        self.max_requeues = max_requeues
+        self.requeues = {}
+        self.prompt_template = prompt_template
+        self._prompt_overheads = {}
+        self.use_rules = use_rules
+        self.min_confidence = min_confidence
+        self.cache = cache
+        self.group_identical = group_identical
+        # Representative index -> (group key, other members), set by get_pending
+        self.group_members = {}
         self.drugs = []
         self.processed_indices = set()
-        self.checkpoint_file = json_file_path.replace('.json', '_checkpoint.json')
-        self.backup_file = json_file_path.replace('.json', f'_backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json')
+        # Works for .json and .jsonl drugs files, plain or .gz/.zst; the
+        # backup keeps the format, and is gzipped if asked and not already
+        extension = format_suffixes(json_file_path)
+        self.base_path = json_file_path[:len(json_file_path) - len(extension)]
+        if compress_backup and compression_for(json_file_path) is None:
+            extension += '.gz'
+        # Progress from runs before the journal: indices only, no results
+        self.checkpoint_file = f'{self.base_path}_checkpoint.json'
+        self.journal = ResultJournal(f'{self.base_path}_journal.jsonl')
+        self.group_audit_file = f'{self.base_path}_groups.jsonl'
+        self.inference_audit_file = f'{self.base_path}_inference.jsonl'
+        # Stable batch IDs for manual prompts, and where their responses are saved
+        self.manifest_file = f'{self.base_path}_manifest.json'
+        self.responses_dir = f'{self.base_path}_responses'
+        self.metrics = metrics or RunMetrics(f'{self.base_path}_metrics.jsonl', prompt_price, completion_price)
+        # API endpoint, e.g. a local mock_model_server.py; None for OpenAI's
+        self.base_url = base_url
+        self._client = None
+        self.backup_file = f'{self.base_path}_backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}{extension}'
 
     def load_data(self):
-        """Load the drugs JSON file and checkpoint if exists."""
+        """Load the drugs file (.json or .jsonl) and replay the journal if it exists."""
         print(f"Loading data from {self.json_file_path}...")
-        with open(self.json_file_path, 'r', encoding='utf-8') as f:
-            self.drugs = json.load(f)
+        self.drugs = load_snapshot_items(self.json_file_path)
         print(f"Loaded {len(self.drugs)} drugs")
 
         # Load checkpoint if exists
@@ -43,30 +197,242 @@ class PackagingStructureAdder:
                 self.processed_indices = set(checkpoint.get('processed_indices', []))
                 print(f"Loaded checkpoint: {len(self.processed_indices)} drugs already processed")
 
+        if self.journal.exists():
+            self.replay_journal()
+
+    def replay_journal(self) -> int:
+        """Restore results and progress from the journal; returns the drugs restored."""
+        restored = 0
+        mismatched = 0
+        results = self.journal.replay()
+        for idx, (name, packaging_structure) in results.items():
+            if idx >= len(self.drugs) or self.drugs[idx]['name'] != name:
+                mismatched += 1
+                continue
+            self.drugs[idx]['packagingStructure'] = packaging_structure
+            self.processed_indices.add(idx)
+            restored += 1
+
+        print(f"Replayed journal: {restored} drugs already processed")
+        if mismatched:
+            print(f"Warning: {mismatched} journal entries do not match a drug in "
+                  f"{self.json_file_path} and were ignored")
+        if self.journal.records > len(results):
+            self.journal.compact()
+        return restored
+
     def create_backup(self):
         """Create a backup of the original file."""
         print(f"Creating backup at {self.backup_file}...")
-        with open(self.json_file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        with open(self.backup_file, 'w', encoding='utf-8') as f:
-            f.write(content)
+        if compression_for(self.backup_file) == compression_for(self.json_file_path):
+            shutil.copyfile(self.json_file_path, self.backup_file)
+        else:
+            with open_decompressed(self.json_file_path) as src, open_compressed(self.backup_file) as dst:
+                shutil.copyfileobj(src, dst)
         print("Backup created successfully")
 
-    def get_batches(self) -> List[List[tuple]]:
-        """Split unprocessed drugs into batches."""
+    def apply_inferred_results(self) -> int:
+        """
+        Fill in unprocessed drugs the rules infer with at least min_confidence.
+
+        Every inference is logged with its source, confidence and whether it
+        was accepted; drugs below the threshold are left for the model.
+        """
+        if not self.use_rules:
+            return 0
+
+        sources = Counter()
+        rejected = 0
+        with open(self.inference_audit_file, 'a', encoding='utf-8') as f:
+            for idx, drug in enumerate(self.drugs):
+                if idx in self.processed_indices:
+                    continue
+                inference = infer(drug)
+                accepted = inference.confidence >= self.min_confidence
+                f.write(json.dumps({
+                    'timestamp': datetime.now().isoformat(),
+                    'index': idx,
+                    'name': drug['name'],
+                    **inference.to_dict(),
+                    'accepted': accepted,
+                }, ensure_ascii=False) + '\n')
+                if accepted:
+                    self._apply_result(idx, inference.structure, to_cache=False)
+                    sources[inference.source] += 1
+                else:
+                    rejected += 1
+
+        applied = sum(sources.values())
+        by_source = ', '.join(f"{count} from {source}" for source, count in sources.most_common())
+        print(f"Inferred {applied} packaging structures without the model" + (f" ({by_source})" if applied else ""))
+        print(f"{rejected} drugs scored below {self.min_confidence} and are left for the model")
+        if applied:
+            self.save_checkpoint()
+        return applied
+
+    def apply_cached_results(self) -> int:
+        """Fill in unprocessed drugs whose answer is already in the cache."""
+        if self.cache is None:
+            return 0
+
+        applied = 0
+        for idx, drug in enumerate(self.drugs):
+            if idx in self.processed_indices:
+                continue
+            packaging_structure = self.cache.get(drug)
+            if packaging_structure is not None:
+                # Journaled like every other result, so a later run restores it
+                self._apply_result(idx, packaging_structure, to_cache=False)
+                applied += 1
+        self.cache.commit()
+
+        print(f"Applied {applied} packaging structures from the cache")
+        print(self.cache.report())
+        if applied:
+            self.save_checkpoint()
+        return applied
+
+    def get_pending(self) -> List[tuple]:
+        """
+        Unprocessed (index, drug) pairs to send to the model, in file order.
+
+        With grouping on, only the first drug of each group of identical
+        drugs is included; the others get its result when it comes back.
+        """
         unprocessed = [
             (idx, drug) for idx, drug in enumerate(self.drugs)
             if idx not in self.processed_indices
         ]
 
+        self.group_members = {}
+        if self.group_identical:
+            groups = group_drugs(unprocessed)
+            self.group_members = {members[0][0]: (key, members[1:]) for key, members in groups if len(members) > 1}
+            unprocessed = [members[0] for _, members in groups]
+        return unprocessed
+
+    def token_costs(self, pending: List[tuple]) -> List[tuple]:
+        """Estimated (prompt, completion) tokens for each pending drug."""
+        return [
+            (estimate_tokens(self.format_drug_line(idx, drug)), self.completion_tokens(drug))
+            for idx, drug in pending
+        ]
+
+    def completion_tokens(self, drug) -> int:
+        """Estimated reply tokens for one drug with the current prompt template."""
+        return estimate_completion_tokens(drug, compact=self.prompt_template == 'compact')
+
+    def next_batch_end(self, costs: List[tuple], start: int) -> int:
+        """End of the next batch, packed to the token budgets and current size limit."""
+        if self.prompt_template not in self._prompt_overheads:
+            self._prompt_overheads[self.prompt_template] = estimate_tokens(
+                SYSTEM_PROMPT + self.format_prompt_for_batch([]))
+        return next_batch_end(costs, start, self.sizer.limit, self.prompt_budget,
+                              self.completion_budget, self._prompt_overheads[self.prompt_template])
+
+    def get_batches(self) -> List[List[tuple]]:
+        """Split unprocessed drugs into batches packed to the token budgets."""
+        pending = self.get_pending()
+        costs = self.token_costs(pending)
+
         batches = []
-        for i in range(0, len(unprocessed), self.batch_size):
-            batches.append(unprocessed[i:i + self.batch_size])
+        start = 0
+        while start < len(pending):
+            end = self.next_batch_end(costs, start)
+            batches.append(pending[start:end])
+            start = end
 
         return batches
 
+    def plan_run(self, concurrency: int = 1, requests_per_minute: int = None,
+                 tokens_per_minute: int = None) -> Dict[str, Dict]:
+        """
+        Estimate calls, tokens, cost and wall time per prompt template without calling the model.
+
+        Drugs the rules would accept or the cache already holds are left out,
+        as a real run would do; nothing is written and the cache is not
+        touched. Batches are packed at the starting batch size, so adaptive
+        growth makes a real run need somewhat fewer calls. Wall time uses the
+        median latency of earlier calls in the metrics file, or a rough
+        token-rate model when there are none, and is bounded by the rate
+        limits.
+
+        Returns:
+            dict: Plan per template name
+        """
+        skipped = set()
+        for idx, drug in enumerate(self.drugs):
+            if idx in self.processed_indices:
+                continue
+            if self.use_rules and infer(drug).confidence >= self.min_confidence:
+                skipped.add(idx)
+            elif self.cache is not None and self.cache.peek(drug):
+                skipped.add(idx)
+
+        previous = recorded_latencies(self.metrics.path) if self.metrics.path else []
+        median_latency = statistics.median(previous) if previous else None
+        template = self.prompt_template
+        processed = set(self.processed_indices)
+        self.processed_indices |= skipped
+        plans = {}
+        try:
+            for name in PROMPT_TEMPLATES:
+                self.prompt_template = name
+                batches = self.get_batches()
+                prompt_tokens = [count_tokens(SYSTEM_PROMPT + self.format_prompt_for_batch(batch)) for batch in batches]
+                completion_tokens = [sum(self.completion_tokens(drug) for _, drug in batch) for batch in batches]
+                drugs = sum(len(batch) for batch in batches)
+                total = sum(prompt_tokens) + sum(completion_tokens)
+
+                if median_latency is not None:
+                    busy = median_latency * len(batches)
+                else:
+                    busy = sum(CALL_OVERHEAD_SECONDS + tokens / COMPLETION_TOKENS_PER_SECOND for tokens in completion_tokens)
+                wall = busy / max(1, min(concurrency, len(batches) or 1))
+                if requests_per_minute:
+                    wall = max(wall, 60 * len(batches) / requests_per_minute)
+                if tokens_per_minute:
+                    wall = max(wall, 60 * total / tokens_per_minute)
+
+                plans[name] = {
+                    'calls': len(batches),
+                    'drugs': drugs,
+                    'shared': sum(len(members) for _, members in self.group_members.values()),
+                    'prompt_tokens': sum(prompt_tokens),
+                    'completion_tokens': sum(completion_tokens),
+                    'tokens_per_drug': round(total / drugs, 1) if drugs else None,
+                    'cost_usd': round(cost(sum(prompt_tokens), sum(completion_tokens),
+                                           self.metrics.prompt_price, self.metrics.completion_price), 4),
+                    'wall_seconds': math.ceil(wall),
+                    'latency_source': 'recorded' if median_latency is not None else 'estimated',
+                }
+        finally:
+            self.prompt_template = template
+            self.processed_indices = processed
+            self.group_members = {}
+
+        print(f"Dry run: {len(skipped)} drugs would come from the rules or cache")
+        for name, plan in plans.items():
+            marker = ' (selected)' if name == template else ''
+            print(f"  {name}{marker}: {plan['calls']} calls for {plan['drugs']} drugs "
+                  f"(+{plan['shared']} sharing a result), "
+                  f"{plan['prompt_tokens']} prompt + {plan['completion_tokens']} completion tokens "
+                  f"({plan['tokens_per_drug']} per drug), about ${plan['cost_usd']:.2f}, "
+                  f"~{plan['wall_seconds']}s at concurrency {concurrency} ({plan['latency_source']} latency)")
+        compact, verbose = plans['compact'], plans['verbose']
+        verbose_total = verbose['prompt_tokens'] + verbose['completion_tokens']
+        if verbose_total:
+            saved = verbose_total - compact['prompt_tokens'] - compact['completion_tokens']
+            print(f"  The compact prompt saves {saved} tokens ({saved * 100 // verbose_total}%) "
+                  f"and {verbose['calls'] - compact['calls']} calls")
+        return plans
+
     def format_prompt_for_batch(self, batch: List[tuple]) -> str:
         """Generate the AI prompt for a batch of drugs."""
+        if self.prompt_template == 'compact':
+            drugs = ''.join(self.format_drug_line(idx, drug, position) for position, (idx, drug) in enumerate(batch))
+            return COMPACT_PROMPT.format(drugs=drugs)
+
         prompt = """You are a pharmaceutical packaging expert. For each drug listed below, determine the packaging hierarchy - specifically how many smaller units fit into each larger unit.
 
 For each drug, I'll provide:
@@ -87,9 +453,7 @@ Please return a JSON array with the packaging structure for each drug. Use stand
 """
 
         for idx, drug in batch:
-            units = [unit['name'] for unit in drug.get('units', [])]
-            prompt += f"{idx + 1}. {drug['name']}\n"
-            prompt += f"   Units: {' -> '.join(units)}\n\n"
+            prompt += self.format_drug_line(idx, drug)
 
         prompt += """
 **Return format (JSON):**
@@ -111,127 +475,626 @@ Return ONLY the JSON array, no additional text."""
 
         return prompt
 
-    def process_batch_with_ai(self, batch: List[tuple], api_key: str = None) -> List[Dict]:
-        """Process a batch using OpenAI API."""
-        if OpenAI is None:
-            raise ImportError("openai package is required. Install with: pip install openai")
+    def format_drug_line(self, idx: int, drug, position: int = 0) -> str:
+        """One drug's entry in a batch prompt; compact prompts number drugs by position in the batch."""
+        units = ' -> '.join(unit_chain(drug))
+        if self.prompt_template == 'compact':
+            return f"{position + 1}. {drug['name']}: {units}\n"
+        return f"{idx + 1}. {drug['name']}\n   Units: {units}\n\n"
 
+    @staticmethod
+    def _resolve_api_key(api_key: str = None) -> str:
         if not api_key:
             api_key = os.getenv('OPENAI_API_KEY')
             if not api_key:
                 raise ValueError("OpenAI API key not found. Set OPENAI_API_KEY environment variable or pass api_key parameter")
+        return api_key
+
+    def _completion_request(self, prompt: str) -> Dict[str, Any]:
+        """Keyword arguments for one chat completion request."""
+        return {
+            'model': MODEL,
+            'messages': [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            'temperature': 0.3,
+            'response_format': {"type": "json_object"} if "gpt-4" in MODEL else None,
+            'max_tokens': self.completion_budget,
+        }
 
-        client = OpenAI(api_key=api_key)
+    def _read_response(self, batch: List[tuple], response, latency: float, attempt: int) -> List[Dict]:
+        """
+        Parse a completion, record its metrics and feed how complete it was
+        back into the batch size.
+        """
+        usage = getattr(response, 'usage', None)
+        record = {
+            'drugs': len(batch),
+            'latency': latency,
+            'attempt': attempt,
+            'prompt_tokens': getattr(usage, 'prompt_tokens', None),
+            'completion_tokens': getattr(usage, 'completion_tokens', None),
+        }
+        choice = response.choices[0]
+        if choice.finish_reason == 'length':
+            self.metrics.record_call(outcome='truncated', **record)
+            self.sizer.record(len(batch), 0, truncated=True)
+            raise TruncatedResponseError(f"Response for {len(batch)} drugs was cut off at the output limit")
+        try:
+            results, parse_path = self.parse_reply(choice.message.content)
+        except Exception as e:
+            self.metrics.record_call(outcome=type(e).__name__, **record)
+            raise
+        matched = len(self.match_results(batch, results))
+        self.metrics.record_call(parse_path=parse_path, matched=matched, **record)
+        self.sizer.record(len(batch), matched)
+        return results
+
+    def process_batch_with_ai(self, batch: List[tuple], api_key: str = None, attempt: int = 0) -> List[Dict]:
+        """Process a batch using OpenAI API."""
+        if OpenAI is None:
+            raise ImportError("openai package is required. Install with: pip install openai")
+
+        api_key = self._resolve_api_key(api_key)
+        # One client for the whole run, so connections are reused across batches;
+        # retries are handled by settle_batch rather than the client
+        if self._client is None or self._client.api_key != api_key:
+            self._client = OpenAI(api_key=api_key, base_url=self.base_url, max_retries=0)
         prompt = self.format_prompt_for_batch(batch)
 
         print("Sending request to OpenAI...")
-        response = client.chat.completions.create(
-            model="gpt-4o",  # or "gpt-4" or "gpt-3.5-turbo"
-            messages=[
-                {"role": "system", "content": "You are a pharmaceutical packaging expert. Return only valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            response_format={"type": "json_object"} if "gpt-4" in "gpt-4o" else None
-        )
+        start = time.perf_counter()
+        try:
+            response = self._client.chat.completions.create(**self._completion_request(prompt))
+        except Exception as e:
+            self.metrics.record_call(len(batch), time.perf_counter() - start, attempt, type(e).__name__)
+            raise
+        return self._read_response(batch, response, time.perf_counter() - start, attempt)
+
+    def _call_with_retries(self, batch: List[tuple], api_key: str) -> List[Dict]:
+        """Send a batch, retrying failed calls (except cut-off responses) with backoff."""
+        for attempt in range(self.retry.attempts):
+            try:
+                return self.process_batch_with_ai(batch, api_key, attempt)
+            except TruncatedResponseError:
+                raise
+            except Exception as e:
+                if not self.retry.should_retry(e, attempt):
+                    raise
+                delay = self.retry.delay(attempt, e)
+                print(f"Attempt {attempt + 1} for {len(batch)} drugs failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def settle_batch(self, batch: List[tuple], api_key: str = None) -> tuple:
+        """
+        Send a batch until each drug has a result or has been given up on.
+
+        A batch that still fails after its retries, or comes back cut off,
+        is split in half and each half settled on its own, down to single
+        drugs. Drugs left out of a response are sent again, up to
+        max_requeues times each. Nothing is applied here.
+
+        Returns:
+            tuple: (list of (batch, results) responses to apply in order,
+            list of (index, drug) pairs given up on)
+
+        Raises:
+            Exception: Authentication or configuration errors such as a bad
+            API key or model name, which no retry or split fixes
+        """
+        try:
+            results = self._call_with_retries(batch, api_key)
+        except Exception as e:
+            if is_fatal(e):
+                raise
+            settled, failed = [], []
+            halves = self._split_failed(batch, e)
+            if not halves:
+                failed += batch
+            for half in halves:
+                half_settled, half_failed = self.settle_batch(half, api_key)
+                settled += half_settled
+                failed += half_failed
+            return settled, failed
+
+        settled = [(batch, results)]
+        requeue, failed = self._leftovers(batch, results)
+        if requeue:
+            requeue_settled, requeue_failed = self.settle_batch(requeue, api_key)
+            settled += requeue_settled
+            failed += requeue_failed
+        return settled, failed
+
+    @staticmethod
+    def _split_failed(batch: List[tuple], error: Exception) -> List[List[tuple]]:
+        """Halves of a batch that kept failing, or [] once it is down to one drug."""
+        if len(batch) == 1:
+            print(f"Giving up on {batch[0][1]['name']} for this run: {error}")
+            return []
+        print(f"Batch of {len(batch)} drugs failed ({error}); splitting it in half")
+        middle = len(batch) // 2
+        return [batch[:middle], batch[middle:]]
+
+    def _leftovers(self, batch: List[tuple], results: List[Dict]) -> tuple:
+        """Drugs a response left out: (ones to send again, ones given up on)."""
+        matched = self.match_results(batch, results)
+        requeue, given_up = [], []
+        for idx, drug in batch:
+            if idx in matched:
+                continue
+            self.requeues[idx] = self.requeues.get(idx, 0) + 1
+            if self.requeues[idx] <= self.max_requeues:
+                requeue.append((idx, drug))
+            else:
+                given_up.append((idx, drug))
+
+        if requeue:
+            print(f"{len(requeue)} drugs missing from the response; sending them again")
+        if given_up:
+            print(f"Giving up on {len(given_up)} drugs the model keeps leaving out")
+        return requeue, given_up
+
+    def process_batches(self, api_key: str = None) -> List[tuple]:
+        """
+        Process all pending drugs one batch at a time.
+
+        Each batch is packed just before it is sent, so its size follows the
+        latest responses, and is settled with retries and splitting before
+        the next one. Fatal client errors are raised, with progress
+        checkpointed.
+
+        Returns:
+            list: (index, drug) pairs that could not be processed
+        """
+        if OpenAI is None:
+            raise ImportError("openai package is required. Install with: pip install openai")
+        api_key = self._resolve_api_key(api_key)
+
+        pending = self.get_pending()
+        costs = self.token_costs(pending)
+        failed = []
+        start = 0
+        number = 0
+        while start < len(pending):
+            end = self.next_batch_end(costs, start)
+            batch = pending[start:end]
+            number += 1
+            print(f"\n--- Processing Batch {number} ({len(batch)} drugs, {start}/{len(pending)} sent) ---")
+            settled, given_up = self.settle_batch(batch, api_key)
+            for sent, results in settled:
+                self.update_drugs_with_results(sent, results)
+            self.save_checkpoint()
+            failed += given_up
+            if given_up:
+                print(f"Batch {number} completed, {len(given_up)} drugs left for the next run")
+            else:
+                print(f"Batch {number} completed successfully")
+            start = end
+        return failed
 
-        result_text = response.choices[0].message.content.strip()
+    async def process_batch_with_ai_async(self, batch: List[tuple], client, limiter: RateLimiter,
+                                          attempt: int = 0) -> List[Dict]:
+        """Process a batch through a shared AsyncOpenAI client, within the rate limits."""
+        prompt = self.format_prompt_for_batch(batch)
+        reserved = estimate_tokens(SYSTEM_PROMPT + prompt) + sum(self.completion_tokens(drug) for _, drug in batch)
+        await limiter.acquire(reserved)
+
+        start = time.perf_counter()
+        try:
+            response = await client.chat.completions.create(**self._completion_request(prompt))
+        except Exception as e:
+            self.metrics.record_call(len(batch), time.perf_counter() - start, attempt, type(e).__name__)
+            limiter.settle(reserved, 0)
+            raise
+        usage = getattr(response, 'usage', None)
+        limiter.settle(reserved, getattr(usage, 'total_tokens', None))
+        return self._read_response(batch, response, time.perf_counter() - start, attempt)
+
+    async def _call_with_retries_async(self, batch: List[tuple], client, limiter: RateLimiter) -> List[Dict]:
+        """Async version of _call_with_retries."""
+        for attempt in range(self.retry.attempts):
+            try:
+                return await self.process_batch_with_ai_async(batch, client, limiter, attempt)
+            except TruncatedResponseError:
+                raise
+            except Exception as e:
+                if not self.retry.should_retry(e, attempt):
+                    raise
+                delay = self.retry.delay(attempt, e)
+                print(f"Attempt {attempt + 1} for {len(batch)} drugs failed ({e}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def settle_batch_async(self, batch: List[tuple], client, limiter: RateLimiter) -> tuple:
+        """Async version of settle_batch; the halves and re-sends run one after another."""
+        try:
+            results = await self._call_with_retries_async(batch, client, limiter)
+        except Exception as e:
+            if is_fatal(e):
+                raise
+            settled, failed = [], []
+            halves = self._split_failed(batch, e)
+            if not halves:
+                failed += batch
+            for half in halves:
+                half_settled, half_failed = await self.settle_batch_async(half, client, limiter)
+                settled += half_settled
+                failed += half_failed
+            return settled, failed
+
+        settled = [(batch, results)]
+        requeue, failed = self._leftovers(batch, results)
+        if requeue:
+            requeue_settled, requeue_failed = await self.settle_batch_async(requeue, client, limiter)
+            settled += requeue_settled
+            failed += requeue_failed
+        return settled, failed
+
+    async def process_batches_async(self, api_key: str = None, concurrency: int = 8,
+                                    requests_per_minute: int = None, tokens_per_minute: int = None) -> List[tuple]:
+        """
+        Process all pending drugs concurrently with one pooled AsyncOpenAI client.
+
+        Up to `concurrency` requests are in flight at once. Each batch is
+        packed when a slot frees up, so its size reflects the latest
+        responses. Whatever order the responses arrive in, results are
+        applied and checkpointed in batch order, so a run's outcome does not
+        depend on network timing. Each batch is settled within its slot, with
+        retries, splitting and re-sending as in settle_batch. A fatal error
+        (bad API key, unknown model) cancels the batches still in flight and
+        is raised, as in process_batches.
+
+        Returns:
+            list: (index, drug) pairs that could not be processed
+        """
+        if AsyncOpenAI is None:
+            raise ImportError("openai package is required. Install with: pip install openai")
+
+        pending = self.get_pending()
+        costs = self.token_costs(pending)
+        client = AsyncOpenAI(api_key=self._resolve_api_key(api_key), base_url=self.base_url, max_retries=0)
+        limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        slots = asyncio.Semaphore(concurrency)
+        in_order = asyncio.Queue()
+
+        async def run(batch):
+            try:
+                return await self.settle_batch_async(batch, client, limiter)
+            finally:
+                slots.release()
+
+        async def plan():
+            start = 0
+            while start < len(pending):
+                await slots.acquire()
+                end = self.next_batch_end(costs, start)
+                batch = pending[start:end]
+                start = end
+                await in_order.put((batch, asyncio.ensure_future(run(batch))))
+            await in_order.put(None)
+
+        planner = asyncio.ensure_future(plan())
+        tasks = []
+        failed = []
+        try:
+            # Awaiting in batch order applies each result as soon as every
+            # earlier batch has been applied
+            while (entry := await in_order.get()) is not None:
+                batch, task = entry
+                tasks.append(task)
+                number = len(tasks)
+                try:
+                    settled, given_up = await task
+                except Exception as e:
+                    if is_fatal(e):
+                        raise
+                    print(f"Error processing batch {number} ({len(batch)} drugs): {e}")
+                    failed += batch
+                    continue
+                print(f"--- Batch {number} ({len(batch)} drugs, next size limit {self.sizer.limit}) ---")
+                for sent, results in settled:
+                    self.update_drugs_with_results(sent, results)
+                self.save_checkpoint()
+                failed += given_up
+        finally:
+            planner.cancel()
+            while not in_order.empty():
+                entry = in_order.get_nowait()
+                if entry is not None:
+                    tasks.append(entry[1])
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(planner, *tasks, return_exceptions=True)
+            await client.close()
+
+        return failed
+
+    def parse_ai_response(self, result_text: str) -> List[Dict]:
+        """Extract the results array from a model response."""
+        return self.parse_reply(result_text)[0]
+
+    @staticmethod
+    def parse_reply(result_text: str) -> tuple:
+        """
+        Extract the results array from a model response.
+
+        Returns:
+            tuple: (results, parse path), the path naming how the array was
+            found, e.g. "drugs" or "fenced json/array"
+        """
+        result_text = result_text.strip()
+        path = []
 
         # Try to extract JSON if wrapped in markdown
         if '```json' in result_text:
             result_text = result_text.split('```json')[1].split('```')[0].strip()
+            path.append('fenced json')
         elif '```' in result_text:
             result_text = result_text.split('```')[1].split('```')[0].strip()
+            path.append('fenced')
 
         # If the response is wrapped in an object with a key, extract the array
         parsed = json.loads(result_text)
         if isinstance(parsed, dict) and 'drugs' in parsed:
-            return parsed['drugs']
+            return parsed['drugs'], '/'.join(path + ['drugs'])
         elif isinstance(parsed, dict) and 'items' in parsed:
-            return parsed['items']
+            return parsed['items'], '/'.join(path + ['items'])
         elif isinstance(parsed, list):
-            return parsed
+            return parsed, '/'.join(path + ['array'])
         else:
             # If it's a dict with other structure, try to find the array
             for value in parsed.values():
                 if isinstance(value, list):
-                    return value
+                    return value, '/'.join(path + ['other key'])
             raise ValueError(f"Unexpected response structure: {parsed}")
 
-    def update_drugs_with_results(self, batch: List[tuple], results: List[Dict]):
-        """Update the drugs list with AI results."""
+    @staticmethod
+    def compact_structure(drug, counts) -> List[Dict]:
+        """Packaging structure from a compact reply's counts, or None if they do not fit the unit chain."""
+        units = unit_chain(drug)
+        if (not isinstance(counts, list) or len(counts) != max(0, len(units) - 1)
+                or not all(isinstance(count, int) and count > 0 for count in counts)):
+            return None
+        return [
+            {'unit': larger, 'contains': count, 'of': smaller}
+            for larger, count, smaller in zip(units, counts, units[1:])
+        ]
+
+    @staticmethod
+    def match_results(batch: List[tuple], results: List[Dict]) -> Dict[int, List[Dict]]:
+        """
+        Map AI results to the batch's drug indices, by name or else by position.
+
+        Compact replies ({"n": drug number, "contains": [counts]}) are matched
+        by their number and expanded using the drug's unit chain.
+        """
         # Create a mapping of indices for quick lookup
         batch_indices = {drug['name']: idx for idx, drug in batch}
 
-        updated_count = 0
+        matched = {}
         for result in results:
+            if 'n' in result and 'contains' in result:
+                number = result['n']
+                if isinstance(number, int) and 1 <= number <= len(batch):
+                    drug_idx, drug = batch[number - 1]
+                    packaging_structure = PackagingStructureAdder.compact_structure(drug, result['contains'])
+                    if packaging_structure is not None:
+                        matched[drug_idx] = packaging_structure
+                continue
+
             drug_name = result.get('name')
             packaging_structure = result.get('packagingStructure', [])
 
             # Find the drug in our batch
             if drug_name in batch_indices:
-                drug_idx = batch_indices[drug_name]
-                self.drugs[drug_idx]['packagingStructure'] = packaging_structure
-                self.processed_indices.add(drug_idx)
-                updated_count += 1
+                matched[batch_indices[drug_name]] = packaging_structure
             else:
                 # Try to match by index if name doesn't match
                 result_index = result.get('index')
                 if result_index is not None and result_index < len(batch):
                     drug_idx, _ = batch[result_index]
-                    self.drugs[drug_idx]['packagingStructure'] = packaging_structure
-                    self.processed_indices.add(drug_idx)
-                    updated_count += 1
+                    matched[drug_idx] = packaging_structure
+        return matched
+
+    def update_drugs_with_results(self, batch: List[tuple], results: List[Dict]):
+        """Update the drugs list with AI results."""
+        updated_count = 0
+        for drug_idx, packaging_structure in self.match_results(batch, results).items():
+            self._apply_result(drug_idx, packaging_structure)
+            updated_count += 1 + self._fan_out(drug_idx, packaging_structure)
 
+        if self.cache is not None:
+            self.cache.commit()
         print(f"Updated {updated_count} drugs with packaging structure")
         return updated_count
 
+    def _apply_result(self, drug_idx: int, packaging_structure: List[Dict], to_cache: bool = True):
+        self.drugs[drug_idx]['packagingStructure'] = packaging_structure
+        self.processed_indices.add(drug_idx)
+        self.journal.append(drug_idx, self.drugs[drug_idx]['name'], packaging_structure)
+        if to_cache and self.cache is not None:
+            self.cache.put(self.drugs[drug_idx], packaging_structure)
+
+    def _fan_out(self, drug_idx: int, packaging_structure: List[Dict]) -> int:
+        """Copy a group representative's result to the rest of its group, logging each copy."""
+        key, members = self.group_members.pop(drug_idx, (None, []))
+        if not members:
+            return 0
+
+        for idx, _ in members:
+            self._apply_result(idx, copy.deepcopy(packaging_structure))
+
+        with open(self.group_audit_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({
+                'timestamp': datetime.now().isoformat(),
+                'group': key,
+                'representative': {'index': drug_idx, 'name': self.drugs[drug_idx]['name']},
+                'members': [{'index': idx, 'name': drug['name']} for idx, drug in members],
+                'packagingStructure': packaging_structure,
+            }, ensure_ascii=False) + '\n')
+        return len(members)
+
     def save_checkpoint(self):
-        """Save progress checkpoint."""
-        checkpoint = {
-            'processed_indices': list(self.processed_indices),
-            'timestamp': datetime.now().isoformat(),
-            'total_drugs': len(self.drugs),
-            'processed_count': len(self.processed_indices)
-        }
-        with open(self.checkpoint_file, 'w') as f:
-            json.dump(checkpoint, f, indent=2)
+        """Commit results journaled since the last checkpoint."""
+        self.journal.commit()
         print(f"Checkpoint saved: {len(self.processed_indices)}/{len(self.drugs)} drugs processed")
 
     def save_final_results(self):
         """Save the updated drugs list to the original file."""
         print(f"Saving final results to {self.json_file_path}...")
-        with open(self.json_file_path, 'w', encoding='utf-8') as f:
-            json.dump(self.drugs, f, indent=2, ensure_ascii=False)
+        save_items(self.drugs, self.json_file_path)
         print("Results saved successfully")
 
-        # Clean up checkpoint file
-        if os.path.exists(self.checkpoint_file):
-            os.remove(self.checkpoint_file)
+        # Clean up the journal and any old-style checkpoint
+        if self.journal.exists() or os.path.exists(self.checkpoint_file):
+            self.journal.remove()
+            if os.path.exists(self.checkpoint_file):
+                os.remove(self.checkpoint_file)
             print("Checkpoint file removed")
 
+    def close(self):
+        """Write the run's metrics, compact the journal of an unfinished run and close the cache."""
+        if self.metrics.calls:
+            print(self.metrics.report())
+        self.metrics.close()
+        dropped = self.journal.compact()
+        if dropped:
+            print(f"Compacted journal: dropped {dropped} superseded entries")
+        if self.cache is not None:
+            self.cache.close()
+
     def generate_manual_prompts(self, output_file: str = None):
         """Generate prompts for manual processing (without API)."""
         if output_file is None:
-            output_file = self.json_file_path.replace('.json', '_prompts.txt')
+            output_file = self.base_path + '_prompts.txt'
 
         batches = self.get_batches()
+        manifest = build_manifest(batches, self.group_members, self.prompt_template, self.json_file_path)
+        save_manifest(manifest, self.manifest_file)
 
         with open(output_file, 'w', encoding='utf-8') as f:
             f.write(f"Generated {len(batches)} prompts for manual processing\n")
             f.write(f"Total drugs to process: {sum(len(b) for b in batches)}\n")
+            f.write(f"Save each response as {self.responses_dir}/<batch id>.json\n")
             f.write("=" * 80 + "\n\n")
 
-            for i, batch in enumerate(batches, 1):
-                f.write(f"BATCH {i}/{len(batches)}\n")
+            for i, (batch_id, batch) in enumerate(zip(manifest['batches'], batches), 1):
+                f.write(f"BATCH {batch_id} ({i}/{len(batches)})\n")
                 f.write("=" * 80 + "\n\n")
                 f.write(self.format_prompt_for_batch(batch))
                 f.write("\n\n" + "=" * 80 + "\n\n")
 
         print(f"Generated {len(batches)} prompts in {output_file}")
         print(f"Total drugs to process: {sum(len(b) for b in batches)}")
+        print(f"Batch IDs recorded in {self.manifest_file}")
         return output_file
 
+    def ingest_responses(self, directory: str = None, workers: int = None) -> Dict[str, int]:
+        """
+        Apply every saved response in a directory, by the batch IDs in the manifest.
+
+        Files are named <batch id>.json (or .txt/.md). Batches whose drugs
+        are all processed already are skipped; the rest are parsed and
+        validated in parallel, then applied in batch order with one
+        checkpoint at the end. Results for drugs whose name no longer matches
+        the manifest, or whose structure does not fit their units, are
+        rejected and listed.
+
+        Returns:
+            dict: Counts of batches and drugs applied, rejected and missing,
+            or None without a manifest or directory
+        """
+        manifest = load_manifest(self.manifest_file)
+        if manifest is None:
+            print(f"Error: No current batch manifest at {self.manifest_file}; "
+                  f"generate the prompts (option 2) first")
+            return None
+        directory = directory or self.responses_dir
+        if not os.path.isdir(directory):
+            print(f"Error: Responses directory not found: {directory}")
+            return None
+
+        responses, unknown = find_responses(directory, manifest)
+        for path in unknown:
+            print(f"  ✗ {path.name}: not a batch in the current manifest (saved for earlier prompts?), rejected")
+        pending = {
+            batch_id: path for batch_id, path in responses.items()
+            if any(drug['index'] not in self.processed_indices for drug in manifest['batches'][batch_id]['drugs'])
+        }
+        print(f"Ingesting {len(pending)} responses from {directory} "
+              f"({len(responses) - len(pending)} already applied, "
+              f"{len(manifest['batches']) - len(responses)} batches without a response)")
+
+        start = time.perf_counter()
+        counts = Counter(stale=len(unknown))
+        for batch_id, (path, outcome) in validate_responses(pending, manifest, workers).items():
+            self._apply_manifest_batch(batch_id, manifest['batches'][batch_id], outcome, counts, path.name)
+
+        if self.cache is not None:
+            self.cache.commit()
+        if counts['drugs']:
+            self.save_checkpoint()
+        print(f"Applied {counts['batches']} batches ({counts['drugs']} drugs) in {time.perf_counter() - start:.2f}s; "
+              f"{counts['rejected']} results rejected, {counts['missing']} drugs missing, "
+              f"{counts['unreadable']} responses unreadable, {counts['stale']} not in the manifest")
+        return dict(counts)
+
+    def ingest_response(self, batch_id: str, response_text: str) -> Dict[str, int]:
+        """Apply one pasted response by its batch ID from the manifest."""
+        manifest = load_manifest(self.manifest_file)
+        if manifest is None or batch_id not in manifest['batches'] \
+                or not entry_matches(batch_id, manifest['batches'][batch_id]):
+            print(f"Error: {batch_id} is not a batch in the current {self.manifest_file} "
+                  f"(saved for earlier prompts?)")
+            return None
+
+        counts = Counter()
+        entry = manifest['batches'][batch_id]
+        self._apply_manifest_batch(batch_id, entry, validate_response(response_text, entry), counts, batch_id)
+        if self.cache is not None:
+            self.cache.commit()
+        if counts['drugs']:
+            self.save_checkpoint()
+        return dict(counts)
+
+    def _apply_manifest_batch(self, batch_id: str, entry: Dict, outcome: Dict, counts: Counter, label: str):
+        """Apply a validated response to the drugs its manifest entry names, tallying into counts."""
+        if outcome['error']:
+            print(f"  ✗ {label}: {outcome['error']}")
+            counts['unreadable'] += 1
+            return
+
+        def current(idx, name):
+            return idx < len(self.drugs) and self.drugs[idx]['name'] == name
+
+        names = {drug['index']: drug['name'] for drug in entry['drugs']}
+        self.group_members = {
+            int(idx): (group['key'], [
+                (member['index'], self.drugs[member['index']]) for member in group['members']
+                if current(member['index'], member['name']) and member['index'] not in self.processed_indices
+            ])
+            for idx, group in entry['groups'].items()
+        }
+        problems = [f"{name}: {reason}" for _, name, reason in outcome['rejected']]
+        problems += [f"{name}: no usable answer in the response" for _, name in outcome['missing']]
+        applied = 0
+        for idx, packaging_structure in outcome['results'].items():
+            if not current(idx, names[idx]):
+                problems.append(f"{names[idx]}: no longer at index {idx} in the drugs file")
+                counts['rejected'] += 1
+            elif idx not in self.processed_indices:
+                self._apply_result(idx, packaging_structure)
+                applied += 1 + self._fan_out(idx, packaging_structure)
+        self.group_members = {}
+
+        counts['rejected'] += len(outcome['rejected'])
+        counts['missing'] += len(outcome['missing'])
+        counts['drugs'] += applied
+        if applied:
+            counts['batches'] += 1
+        for problem in problems:
+            print(f"  ✗ {label}: {problem}")
+
     def process_manual_response(self, batch_index: int, response_json: str):
         """Process a manual response for a specific batch."""
         batches = self.get_batches()
@@ -264,104 +1127,218 @@ Return ONLY the JSON array, no additional text."""
             print("Make sure the response is valid JSON")
 
 
+def finish_ingest(processor: PackagingStructureAdder):
+    """Report progress after ingesting responses, saving the results once every drug is done."""
+    remaining = len(processor.drugs) - len(processor.processed_indices)
+    print(f"\nProgress: {len(processor.processed_indices)}/{len(processor.drugs)} drugs processed")
+    print(f"Remaining: {remaining} drugs")
+    if remaining == 0:
+        processor.save_final_results()
+        print("\n✓ All drugs processed successfully!")
+
+
 def main():
     """Main execution function."""
+    parser = argparse.ArgumentParser(description="Add packaging structures to the drugs inventory")
+    parser.add_argument('json_file', nargs='?', default="apps/backend/seeds/inventory/drugs.json",
+                        help="Drugs file (.json or .jsonl, optionally .gz or .zst compressed)")
+    parser.add_argument('--compress-backup', action='store_true',
+                        help="Gzip the backup of an uncompressed drugs file")
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help="Batches in flight at once in automatic mode (above 1 uses the async client)")
+    parser.add_argument('--rpm', type=int, default=None,
+                        help="Requests-per-minute limit for the async client")
+    parser.add_argument('--tpm', type=int, default=None,
+                        help="Tokens-per-minute limit for the async client")
+    parser.add_argument('--cache', default=None,
+                        help=f"Response cache file (default: {DEFAULT_CACHE_NAME} next to the drugs file)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Neither use nor update the response cache")
+    parser.add_argument('--cache-max-entries', type=int, default=None,
+                        help="Keep at most this many cache entries (least recently used are dropped)")
+    parser.add_argument('--cache-max-age-days', type=float, default=None,
+                        help="Drop cache entries older than this")
+    parser.add_argument('--no-group', action='store_true',
+                        help="Send every drug to the model, even ones identical to another drug")
+    parser.add_argument('--no-rules', action='store_true',
+                        help="Send every drug to the model instead of inferring confident ones first")
+    parser.add_argument('--min-confidence', type=float, default=DEFAULT_MIN_CONFIDENCE,
+                        help=f"Lowest rule confidence accepted without the model (default: {DEFAULT_MIN_CONFIDENCE})")
+    parser.add_argument('--prompt-template', choices=PROMPT_TEMPLATES, default='compact',
+                        help="compact: one line per drug, counts-only replies; verbose: the original prompt (default: compact)")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Estimate calls, tokens, cost and time for each prompt template, then exit")
+    parser.add_argument('--prompt-price', type=float, default=PROMPT_PRICE_PER_MILLION,
+                        help=f"USD per million prompt tokens, for cost estimates (default: {PROMPT_PRICE_PER_MILLION})")
+    parser.add_argument('--completion-price', type=float, default=COMPLETION_PRICE_PER_MILLION,
+                        help=f"USD per million completion tokens (default: {COMPLETION_PRICE_PER_MILLION})")
+    parser.add_argument('--ingest', nargs='?', const='', default=None, metavar='DIR',
+                        help="Apply saved responses named <batch id>.json from DIR (default: <drugs>_responses) and exit")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Processes validating responses with --ingest (default: one per CPU)")
+    parser.add_argument('--base-url', default=None,
+                        help="Chat-completions API base URL, e.g. a local mock_model_server.py")
+    parser.add_argument('--retries', type=int, default=3,
+                        help="Retries per batch on API or response errors before splitting it (default: 3)")
+    parser.add_argument('--max-requeues', type=int, default=2,
+                        help="Times to re-send a drug left out of a response (default: 2)")
+    parser.add_argument('--batch-size', type=int, default=12,
+                        help="Drugs in the first batch (default: 12)")
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE,
+                        help=f"Most drugs per batch as batches grow (default: {DEFAULT_MAX_BATCH_SIZE})")
+    parser.add_argument('--fixed-batch-size', action='store_true',
+                        help="Keep every batch at --batch-size drugs (token budgets still apply)")
+    parser.add_argument('--prompt-budget', type=int, default=DEFAULT_PROMPT_BUDGET,
+                        help=f"Estimated prompt tokens per batch (default: {DEFAULT_PROMPT_BUDGET})")
+    parser.add_argument('--completion-budget', type=int, default=DEFAULT_COMPLETION_BUDGET,
+                        help=f"Estimated reply tokens per batch, also sent as max_tokens (default: {DEFAULT_COMPLETION_BUDGET})")
+    args = parser.parse_args()
+
     print("=" * 80)
     print("PACKAGING STRUCTURE ADDER")
     print("=" * 80)
     print()
 
     # Configuration
-    json_file = "apps/backend/seeds/inventory/drugs.json"
+    json_file = args.json_file
 
     if not os.path.exists(json_file):
         print(f"Error: File not found: {json_file}")
         print("Please run this script from the project root directory")
         return
 
-    processor = PackagingStructureAdder(json_file, batch_size=12)
-    processor.load_data()
-    processor.create_backup()
+    cache = None
+    if not args.no_cache:
+        cache_path = args.cache or os.path.join(os.path.dirname(json_file), DEFAULT_CACHE_NAME)
+        cache = PackagingCache(cache_path, args.cache_max_entries, args.cache_max_age_days)
+
+    processor = PackagingStructureAdder(json_file, batch_size=args.batch_size, compress_backup=args.compress_backup,
+                                        cache=cache, group_identical=not args.no_group,
+                                        prompt_budget=args.prompt_budget, completion_budget=args.completion_budget,
+                                        max_batch_size=args.max_batch_size, adaptive=not args.fixed_batch_size,
+                                        retry=RetryPolicy(attempts=args.retries + 1), max_requeues=args.max_requeues,
+                                        base_url=args.base_url, use_rules=not args.no_rules,
+                                        min_confidence=args.min_confidence, prompt_template=args.prompt_template,
+                                        prompt_price=args.prompt_price, completion_price=args.completion_price)
+    try:
+        processor.load_data()
+        if args.dry_run:
+            processor.plan_run(args.concurrency, args.rpm, args.tpm)
+            return
+        if args.ingest is not None:
+            # Drugs the rules or cache answer were never in a prompt, so fill them in first
+            processor.apply_inferred_results()
+            processor.apply_cached_results()
+            processor.create_backup()
+            if processor.ingest_responses(args.ingest or None, args.workers) is not None:
+                finish_ingest(processor)
+            return
 
-    print()
-    print("Choose processing mode:")
-    print("1. Automatic (using OpenAI API)")
-    print("2. Manual (generate prompts for manual processing)")
-    print("3. Process manual response for a specific batch")
-    print("4. Exit")
-    print()
+        processor.apply_inferred_results()
+        processor.apply_cached_results()
+        processor.create_backup()
 
-    choice = input("Enter choice (1-4): ").strip()
+        print()
+        print("Choose processing mode:")
+        print("1. Automatic (using OpenAI API)")
+        print("2. Manual (generate prompts for manual processing)")
+        print("3. Process manual response for a specific batch")
+        print("4. Ingest a directory of saved responses")
+        print("5. Exit")
+        print()
 
-    if choice == "1":
-        # Automatic processing with API
-        api_key = input("Enter OpenAI API key (or press Enter to use OPENAI_API_KEY env var): ").strip()
-        if not api_key:
-            api_key = os.getenv('OPENAI_API_KEY')
+        choice = input("Enter choice (1-5): ").strip()
 
-        if not api_key:
-            print("Error: No API key provided")
-            return
+        if choice == "1":
+            # Automatic processing with API
+            api_key = input("Enter OpenAI API key (or press Enter to use OPENAI_API_KEY env var): ").strip()
+            if not api_key:
+                api_key = os.getenv('OPENAI_API_KEY')
+
+            if not api_key:
+                print("Error: No API key provided")
+                return
 
-        batches = processor.get_batches()
-        print(f"\nProcessing {len(batches)} batches ({sum(len(b) for b in batches)} drugs)...")
+            batches = processor.get_batches()
+            print(f"\nProcessing about {len(batches)} batches ({sum(len(b) for b in batches)} drugs)...")
+            grouped = sum(len(members) for _, members in processor.group_members.values())
+            if grouped:
+                print(f"{grouped} more drugs are identical to one of these and will share its result")
 
-        for i, batch in enumerate(batches, 1):
-            print(f"\n--- Processing Batch {i}/{len(batches)} ({len(batch)} drugs) ---")
+            if args.concurrency > 1:
+                print(f"Running up to {args.concurrency} batches concurrently")
             try:
-                results = processor.process_batch_with_ai(batch, api_key)
-                processor.update_drugs_with_results(batch, results)
-                processor.save_checkpoint()
-                print(f"Batch {i} completed successfully")
-
+                if args.concurrency > 1:
+                    failed = asyncio.run(processor.process_batches_async(
+                        api_key, args.concurrency, args.rpm, args.tpm
+                    ))
+                else:
+                    failed = processor.process_batches(api_key)
             except Exception as e:
-                print(f"Error processing batch {i}: {e}")
+                print(f"Error processing batch: {e}")
                 print("Progress saved. You can resume by running the script again.")
                 return
 
-        processor.save_final_results()
-        print("\n✓ All drugs processed successfully!")
+            if failed:
+                print(f"\n{len(failed)} drugs could not be processed:")
+                for idx, drug in failed:
+                    print(f"  {idx}: {drug['name']}")
+                print("Progress saved. Run the script again to retry them.")
+                return
 
-    elif choice == "2":
-        # Manual prompt generation
-        output_file = processor.generate_manual_prompts()
-        print(f"\n✓ Prompts saved to: {output_file}")
-        print("\nNext steps:")
-        print("1. Open the prompts file")
-        print("2. Copy each batch prompt to your AI assistant")
-        print("3. Save the JSON response")
-        print("4. Run this script again and choose option 3 to process each response")
-
-    elif choice == "3":
-        # Process manual response
-        batches = processor.get_batches()
-        print(f"\nTotal batches available: {len(batches)}")
-        batch_index = int(input("Enter batch number to process (0-based index): ").strip())
-
-        print("\nPaste the JSON response from the AI (paste and press Ctrl+D or Ctrl+Z when done):")
-        response_lines = []
-        try:
-            while True:
-                line = input()
-                response_lines.append(line)
-        except EOFError:
-            pass
-
-        response_json = '\n'.join(response_lines)
-        processor.process_manual_response(batch_index, response_json)
-
-        remaining = len(processor.drugs) - len(processor.processed_indices)
-        print(f"\nProgress: {len(processor.processed_indices)}/{len(processor.drugs)} drugs processed")
-        print(f"Remaining: {remaining} drugs")
-
-        if remaining == 0:
-            save = input("\nAll drugs processed! Save final results? (y/n): ").strip().lower()
-            if save == 'y':
-                processor.save_final_results()
-                print("\n✓ All done!")
-
-    else:
-        print("Exiting...")
+            processor.save_final_results()
+            print("\n✓ All drugs processed successfully!")
+
+        elif choice == "2":
+            # Manual prompt generation
+            output_file = processor.generate_manual_prompts()
+            print(f"\n✓ Prompts saved to: {output_file}")
+            print("\nNext steps:")
+            print("1. Open the prompts file")
+            print("2. Copy each batch prompt to your AI assistant")
+            print(f"3. Save each JSON response as {processor.responses_dir}/<batch id>.json")
+            print("4. Run this script again with --ingest (or choose option 4) to apply them all at once")
+
+        elif choice == "3":
+            # Process manual response, by 0-based index or by batch ID from the manifest
+            batches = processor.get_batches()
+            print(f"\nTotal batches available: {len(batches)}")
+            batch_ref = input("Enter batch number to process (0-based index) or batch ID: ").strip()
+
+            print("\nPaste the JSON response from the AI (paste and press Ctrl+D or Ctrl+Z when done):")
+            response_lines = []
+            try:
+                while True:
+                    line = input()
+                    response_lines.append(line)
+            except EOFError:
+                pass
+
+            response_json = '\n'.join(response_lines)
+            if batch_ref.startswith(BATCH_ID_PREFIX):
+                processor.ingest_response(batch_ref, response_json)
+            else:
+                processor.process_manual_response(int(batch_ref), response_json)
+
+            remaining = len(processor.drugs) - len(processor.processed_indices)
+            print(f"\nProgress: {len(processor.processed_indices)}/{len(processor.drugs)} drugs processed")
+            print(f"Remaining: {remaining} drugs")
+
+            if remaining == 0:
+                save = input("\nAll drugs processed! Save final results? (y/n): ").strip().lower()
+                if save == 'y':
+                    processor.save_final_results()
+                    print("\n✓ All done!")
+
+        elif choice == "4":
+            directory = input(f"Responses directory (Enter for {processor.responses_dir}): ").strip()
+            if processor.ingest_responses(directory or None, args.workers) is not None:
+                finish_ingest(processor)
+
+        else:
+            print("Exiting...")
+    finally:
+        processor.close()
 
 
 if __name__ == "__main__":
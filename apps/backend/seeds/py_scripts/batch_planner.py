@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Token-budget batching for packaging-structure requests.
+
+Batches are packed drug by drug until the estimated prompt or completion
+tokens would exceed their budgets, or the batch reaches the current size
+limit. The limit adapts to how responses come back: it is halved when a
+response is cut off at the output limit or leaves out most of a full-size
+batch, and grows by a quarter after a full batch comes back complete. A
+reply missing only a few drugs leaves the limit alone; those drugs are just
+sent again.
+"""
+
+from rate_limiter import estimate_tokens
+
+DEFAULT_PROMPT_BUDGET = 6000
+DEFAULT_COMPLETION_BUDGET = 4000
+DEFAULT_MAX_BATCH_SIZE = 60
+
+# Reply tokens per drug: the result object plus one entry per packaging level
+COMPLETION_BASE_TOKENS = 24
+COMPLETION_TOKENS_PER_LEVEL = 20
+# Compact replies: {"n": 3, "contains": [10, 10]}, no names or unit labels
+COMPACT_BASE_TOKENS = 8
+COMPACT_TOKENS_PER_LEVEL = 3
+
+# Share of a full-size batch a reply must leave out before the limit shrinks
+MISSING_SHRINK_SHARE = 0.5
+
+
+def estimate_completion_tokens(drug, compact=False):
+    """Estimated reply tokens for one drug's result object, verbose or compact."""
+    levels = max(0, len(drug.get('units', [])) - 1)
+    if compact:
+        return COMPACT_BASE_TOKENS + COMPACT_TOKENS_PER_LEVEL * levels
+    return COMPLETION_BASE_TOKENS + estimate_tokens(drug['name']) + COMPLETION_TOKENS_PER_LEVEL * levels
+
+
+class BatchSizer:
+    """
+    Additive-increase, multiplicative-decrease limit on drugs per batch.
+
+    With minimum == maximum the limit is fixed.
+    """
+
+    def __init__(self, initial, minimum=1, maximum=DEFAULT_MAX_BATCH_SIZE):
+        self.minimum = minimum
+        self.maximum = max(maximum, minimum)
+        self.limit = min(max(initial, minimum), self.maximum)
+        # The limit after every change, starting with the initial one
+        self.history = [self.limit]
+
+    def record(self, batch_size, matched, truncated=False):
+        """
+        Adjust the limit after a response for a batch of batch_size drugs.
+
+        A cut-off reply caps the limit at half the batch. A reply leaving
+        out more than MISSING_SHRINK_SHARE of a full-size batch (at least
+        half the limit) does too; smaller gaps, and gaps in re-sends and
+        split halves, are left to re-sending. Batches larger than the
+        current limit were sized under an older one, which has already
+        dropped, so their responses are ignored: concurrent in-flight
+        failures do not shrink the limit again and again.
+        """
+        if batch_size > self.limit:
+            return
+        missing = batch_size - matched
+        if truncated or (missing > batch_size * MISSING_SHRINK_SHARE and 2 * batch_size >= self.limit):
+            self._set(max(self.minimum, min(self.limit, batch_size // 2)))
+        elif missing == 0 and batch_size == self.limit:
+            self._set(min(self.maximum, self.limit + max(1, self.limit // 4)))
+
+    def _set(self, limit):
+        if limit != self.limit:
+            self.limit = limit
+            self.history.append(limit)
+
+
+def next_batch_end(costs, start, limit, prompt_budget, completion_budget, prompt_overhead=0):
+    """
+    Return the end index of the batch starting at start.
+
+    Args:
+        costs: (prompt_tokens, completion_tokens) per pending drug
+        start: Index of the batch's first drug
+        limit: Most drugs allowed in the batch
+        prompt_budget: Prompt token budget, including prompt_overhead
+        completion_budget: Completion token budget
+        prompt_overhead: Tokens of the prompt template around the drug list
+
+    A batch always holds at least one drug, even one over budget.
+    """
+    prompt_tokens = prompt_overhead
+    completion_tokens = 0
+    end = start
+    while end < len(costs) and end - start < limit:
+        drug_prompt, drug_completion = costs[end]
+        if end > start and (prompt_tokens + drug_prompt > prompt_budget
+                            or completion_tokens + drug_completion > completion_budget):
+            break
+        prompt_tokens += drug_prompt
+        completion_tokens += drug_completion
+        end += 1
+    return end
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Throughput and memory benchmarks for the seed converters.
+
+Synthetic CSVs are generated for every category in column_mappings.json,
+modeled on the real seeds/inventory/*.json contents (Pack -> Card -> Tablet
+stock chains, "-" for zero, MM/YY expiry dates). Each converter then runs in
+a fresh process so peak RSS is measured in isolation, and the results are
+written as JSON for comparison across runs.
+
+Every category is benchmarked through convert_csv ("serial"), the default
+path of its converter script. The pills sheet, whose script defaults to the
+checkpointing convert_csv_resumable, is benchmarked through that
+("resumable") as well as the serial, mmap, parallel and columnar modes.
+
+With --serializers, the real seeds/inventory/*.json files are instead
+written with every available JSON serializer backend, pretty and compact.
+
+Usage: python bench_converters.py [--sizes 10000 100000 1000000] [--output results.json]
+       python bench_converters.py --serializers [--repeat 5]
+Example: python bench_converters.py --sizes 10000 --categories Drug
+"""
+
+import argparse
+import csv
+import importlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from column_specs import get_spec, load_specs
+from conversion_engine import convert_csv, convert_csv_parallel
+from inventory_io import SERIALIZERS, load_items, set_serializer, write_json_array
+from resumable_conversion import convert_csv_resumable
+
+INVENTORY_DIR = Path(__file__).parent.parent / 'inventory'
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+# Modes run for every category; the pills sheet also gets the extra modes,
+# starting with its converter's default path
+BASE_MODES = ['serial']
+PILLS_MODES = ['resumable', 'serial', 'mmap', 'parallel', 'columnar']
+
+QUANTITY_FIELDS = {
+    'pack', 'units', 'ampoule_vial', 'carton', 'pieces', 'quantity',
+}
+EXPIRY_FIELDS = {'expiry_date', 'expiry_date2', 'exp_date1', 'exp_date2'}
+
+
+class SyntheticSheet:
+    """Generates realistic rows for one category spec."""
+
+    def __init__(self, spec, seed=0):
+        self.spec = spec
+        self.random = random.Random(seed)
+        self.items = self._load_reference_items()
+        self.names = [item['name'] for item in self.items] or ['Paracetamol 500mg']
+
+    def _load_reference_items(self):
+        """Load the real inventory items this sheet is modeled on."""
+        path = INVENTORY_DIR / self.spec['output']
+        if not path.exists():
+            return []
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def expiry(self):
+        """An expiry cell in one of the spellings the stock sheets use."""
+        roll = self.random.random()
+        if roll < 0.08:
+            return self.random.choice(['', '-', 'N/A'])
+        month = self.random.randint(1, 12)
+        year = self.random.randint(25, 32)
+        if roll < 0.2:
+            return f"{month:02d}/20{year}"
+        if roll < 0.5:
+            return f"{month}/{year}"
+        return f"{month:02d}/{year}"
+
+    def quantity(self):
+        """A stock quantity cell, sometimes "-" or blank."""
+        roll = self.random.random()
+        if roll < 0.1:
+            return '-'
+        if roll < 0.15:
+            return ''
+        return str(self.random.choice([1, 2, 3, 5, 10, 12, 20, 24, 50, 100]))
+
+    def pills_chain(self):
+        """Pack/Container, Card and Tablets cells from a real stock chain."""
+        item = self.random.choice(self.items) if self.items else {}
+        stock = {q['name']: q['quantity'] for q in item.get('quantities', [])}
+        scale = self.random.randint(1, 5)
+
+        def cell(value):
+            if value is None or value == 0:
+                return '-' if self.random.random() < 0.7 else ''
+            return str(value * scale)
+
+        pack = stock.get('Pack', stock.get('Container'))
+        return cell(pack), cell(stock.get('Card')), cell(stock.get('Tablet'))
+
+    def row(self, index):
+        """One CSV row, ordered like the header."""
+        values = {}
+        if 'pack_container' in self.spec['columns']:
+            values['pack_container'], values['card'], values['tablets'] = self.pills_chain()
+
+        for field in self.spec['columns']:
+            if field in values:
+                continue
+            if field == 'name':
+                values[field] = f"{self.random.choice(self.names)} #{index}"
+            elif field in EXPIRY_FIELDS:
+                values[field] = self.expiry()
+            elif field in QUANTITY_FIELDS:
+                values[field] = self.quantity()
+            else:
+                values[field] = ''
+
+        return [values[field] for field in self.spec['columns']]
+
+    def write(self, csv_path, rows):
+        """Write a sheet with the given number of data rows."""
+        with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(list(self.spec['columns'].values()))
+            for index in range(rows):
+                writer.writerow(self.row(index))
+
+
+def peak_rss_bytes():
+    """Peak RSS of this process and any finished children, in bytes."""
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_converter(category, mode, csv_path, output_path, workers):
+    """Run one converter mode. Executes in a fresh process."""
+    spec = get_spec(category)
+    module = importlib.import_module(spec['converter'])
+
+    start = time.perf_counter()
+    if mode == 'parallel':
+        count = convert_csv_parallel(csv_path, output_path, module.build_item, spec, workers)
+    elif mode == 'columnar':
+        from pills_columnar import iter_columnar_items
+        count = write_json_array(iter_columnar_items(csv_path, spec), output_path)
+    elif mode == 'mmap':
+        count = convert_csv(csv_path, output_path, module.build_item, spec, use_mmap=True)
+    elif mode == 'resumable':
+        count = convert_csv_resumable(csv_path, output_path, module.build_item, spec, restart=True)['items']
+    else:
+        count = convert_csv(csv_path, output_path, module.build_item, spec)
+    elapsed = time.perf_counter() - start
+
+    return {'items': count, 'seconds': elapsed, 'peak_rss_bytes': peak_rss_bytes()}
+
+
+def columnar_available():
+    """Whether numpy is installed for the columnar mode."""
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def run_benchmarks(sizes, categories=None, work_dir=None, workers=None):
+    """
+    Generate sheets and benchmark every converter mode on them.
+
+    Returns:
+        dict: Machine-readable results
+    """
+    work_dir = Path(work_dir or tempfile.mkdtemp(prefix='seed_bench_'))
+    work_dir.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    context = multiprocessing.get_context('spawn')
+
+    results = []
+    for spec in load_specs():
+        if categories and spec['category'] not in categories:
+            continue
+
+        modes = PILLS_MODES if 'pack_container' in spec['columns'] else BASE_MODES
+        if not columnar_available():
+            modes = [mode for mode in modes if mode != 'columnar']
+
+        for size in sizes:
+            csv_path = work_dir / f"{Path(spec['csv']).stem}_{size}.csv"
+            if not csv_path.exists():
+                print(f"Generating {csv_path.name}...", file=sys.stderr)
+                SyntheticSheet(spec).write(csv_path, size)
+
+            for mode in modes:
+                output_path = work_dir / f"{Path(spec['output']).stem}_{size}_{mode}.json"
+                # A fresh (non-daemonic) process per run keeps peak RSS isolated
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    run = executor.submit(
+                        run_converter, spec['category'], mode, str(csv_path), str(output_path), workers
+                    ).result()
+                output_path.unlink(missing_ok=True)
+
+                result = {
+                    'category': spec['category'],
+                    'converter': spec['converter'],
+                    'mode': mode,
+                    'rows': size,
+                    'csv_bytes': csv_path.stat().st_size,
+                    'items': run['items'],
+                    'wall_seconds': round(run['seconds'], 4),
+                    'rows_per_second': round(size / run['seconds']) if run['seconds'] else None,
+                    'peak_rss_bytes': run['peak_rss_bytes'],
+                }
+                results.append(result)
+                print(f"  {spec['category']:<20} {mode:<9} {size:>9} rows  "
+                      f"{result['wall_seconds']:>8.2f}s  {result['rows_per_second'] or 0:>9} rows/s  "
+                      f"{result['peak_rss_bytes'] / 1e6:>7.1f} MB", file=sys.stderr)
+
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'workers': workers,
+        'results': results,
+    }
+
+
+def run_serializer_benchmarks(repeat=3, work_dir=None):
+    """
+    Write the real inventory files with each serializer backend.
+
+    Each file is written `repeat` times per backend and output style and the
+    best time is kept. Pretty output is compared byte for byte against the
+    stdlib backend's.
+
+    Returns:
+        dict: Machine-readable results
+    """
+    work_dir = Path(work_dir or tempfile.mkdtemp(prefix='seed_bench_'))
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    results = []
+    for source in sorted(INVENTORY_DIR.glob('*.json')):
+        items = load_items(source)
+        reference = None
+        for backend in SERIALIZERS:
+            previous = set_serializer(backend)
+            try:
+                for compact in (False, True):
+                    output_path = work_dir / f"{source.stem}_{backend}_{'compact' if compact else 'pretty'}.json"
+                    best = None
+                    for _ in range(repeat):
+                        start = time.perf_counter()
+                        write_json_array(items, output_path, compact)
+                        elapsed = time.perf_counter() - start
+                        best = elapsed if best is None else min(best, elapsed)
+
+                    output = output_path.read_bytes()
+                    output_path.unlink()
+                    if not compact and backend == 'stdlib':
+                        reference = output
+
+                    result = {
+                        'file': source.name,
+                        'serializer': backend,
+                        'style': 'compact' if compact else 'pretty',
+                        'items': len(items),
+                        'output_bytes': len(output),
+                        'wall_seconds': round(best, 4),
+                        'items_per_second': round(len(items) / best) if best else None,
+                        'matches_stdlib': None if compact else output == reference,
+                    }
+                    results.append(result)
+                    print(f"  {source.name:<32} {backend:<7} {result['style']:<8} "
+                          f"{result['wall_seconds']:>8.4f}s  {result['output_bytes']:>10} bytes", file=sys.stderr)
+            finally:
+                set_serializer(previous)
+
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'serializers': list(SERIALIZERS),
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the seed converters on synthetic sheets")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="Row counts to generate (default: 10k 100k 1M)")
+    parser.add_argument('--categories', nargs='+', default=None,
+                        help="Only benchmark these categories (e.g. Drug Consumable)")
+    parser.add_argument('--work-dir', default=None,
+                        help="Where to keep generated sheets (reused between runs)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Worker processes for the parallel mode")
+    parser.add_argument('--output', default=None,
+                        help="Write results JSON here instead of stdout")
+    parser.add_argument('--serializers', action='store_true',
+                        help="Benchmark the JSON serializer backends on seeds/inventory instead")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="Writes per file and backend in --serializers mode (best is kept)")
+    args = parser.parse_args()
+
+    if args.serializers:
+        report = run_serializer_benchmarks(args.repeat, args.work_dir)
+    else:
+        report = run_benchmarks(args.sizes, args.categories, args.work_dir, args.workers)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to: {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+End-to-end throughput benchmark for add_packaging_structure.py, run offline
+against mock_model_server.py.
+
+The mock server is started in its own process with the given latency and
+failure rates. For every combination of --concurrency and --batch-sizes a
+fresh copy of the drugs file is processed through PackagingStructureAdder,
+exactly as a run of the script would. When drugs are left unprocessed the
+run is resumed with a new adder replaying the journal, as a person rerunning
+the script would, up to --max-resumes times.
+
+Reported per run: drugs per minute, latency percentiles per model call
+(each retry is its own call), tokens as the adder's run metrics recorded
+them, model calls per drug, every batch size limit the adaptive sizer went
+through, what the server saw (requests, injected failures), resumes needed
+and drugs still unprocessed at the end. With --max-calls-per-drug the
+benchmark exits with status 1 when any run needs more calls per drug, as a
+regression check for adaptive batching.
+
+Usage: python bench_packaging.py [--concurrency 1 4 8] [--batch-sizes 12 24] [--output results.json]
+Example: python bench_packaging.py --drugs 2000 --latency 0.5 --error-rate 0.05 --drop-rate 0.1
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+
+from add_packaging_structure import PROMPT_TEMPLATES, PackagingStructureAdder
+from inventory_io import load_items, save_items
+from inventory_model import to_plain
+from mock_model_server import SHAPES
+from run_metrics import RunMetrics, distribution
+
+INVENTORY_DIR = Path(__file__).parent.parent / 'inventory'
+MOCK_SERVER = Path(__file__).parent / 'mock_model_server.py'
+
+DEFAULT_CONCURRENCY = [1, 4, 8]
+DEFAULT_BATCH_SIZES = [12]
+
+
+def synthetic_drugs(items, count):
+    """
+    count drugs modeled on items: the real drugs first, then numbered copies.
+
+    packagingStructure is dropped so every drug needs an answer.
+    """
+    drugs = []
+    for i in range(count):
+        drug = {key: value for key, value in to_plain(items[i % len(items)]).items() if key != 'packagingStructure'}
+        if i >= len(items):
+            drug['name'] = f"{drug['name']} #{i // len(items)}"
+        drugs.append(drug)
+    return drugs
+
+
+class MockServer:
+    """mock_model_server.py running in a child process."""
+
+    def __init__(self, options):
+        self.process = subprocess.Popen(
+            [sys.executable, str(MOCK_SERVER), '--port', '0', *options],
+            stdout=subprocess.PIPE, text=True,
+        )
+        line = self.process.stdout.readline()
+        if 'http://' not in line:
+            self.stop()
+            raise RuntimeError(f"Mock model server did not start: {line!r}")
+        self.base_url = line[line.index('http://'):].strip()
+
+    def stats(self):
+        with urllib.request.urlopen(self.base_url.rsplit('/v1', 1)[0] + '/stats') as response:
+            return json.load(response)
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait()
+
+
+def run_pipeline(drugs, drugs_path, base_url, concurrency, batch_size, adaptive=True,
+                 group_identical=True, max_resumes=3, prompt_template='compact'):
+    """
+    Process a fresh copy of drugs against base_url, resuming until done.
+
+    Returns:
+        dict: Wall time, the run's metrics (all resumes), batch size limits
+        over time, resumes and drugs left unprocessed
+    """
+    save_items(drugs, drugs_path)
+    # In memory and shared by the resumes, so the whole run is summarised together
+    metrics = RunMetrics()
+    limits = []
+    resumes = 0
+    log = io.StringIO()
+
+    start = time.perf_counter()
+    with redirect_stdout(log):
+        while True:
+            adder = PackagingStructureAdder(str(drugs_path), batch_size=batch_size, adaptive=adaptive,
+                                            group_identical=group_identical, base_url=base_url,
+                                            prompt_template=prompt_template, metrics=metrics)
+            try:
+                adder.load_data()
+                if concurrency > 1:
+                    failed = asyncio.run(adder.process_batches_async('mock', concurrency))
+                else:
+                    failed = adder.process_batches('mock')
+                if not failed:
+                    adder.save_final_results()
+            finally:
+                adder.close()
+                limits += adder.sizer.history
+            if not failed or resumes == max_resumes:
+                break
+            resumes += 1
+    elapsed = time.perf_counter() - start
+
+    return {'seconds': elapsed, 'metrics': metrics, 'limits': limits, 'resumes': resumes,
+            'unprocessed': len(failed)}
+
+
+def format_limits(limits, shown=8):
+    """Batch size limits over time, eliding the middle of long histories."""
+    if len(limits) > shown:
+        limits = limits[:shown // 2] + ['...'] + limits[-(shown // 2):]
+    return '>'.join(str(limit) for limit in limits)
+
+
+def run_benchmarks(drugs, server, concurrency_levels, batch_sizes, work_dir=None, adaptive=True,
+                   group_identical=True, max_resumes=3, prompt_template='compact'):
+    """
+    Benchmark every concurrency and batch size combination.
+
+    Returns:
+        list: Machine-readable result per run
+    """
+    work_dir = Path(work_dir or tempfile.mkdtemp(prefix='packaging_bench_'))
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    results = []
+    for concurrency in concurrency_levels:
+        for batch_size in batch_sizes:
+            drugs_path = work_dir / f"drugs_c{concurrency}_b{batch_size}.json"
+            before = server.stats()
+            run = run_pipeline(drugs, drugs_path, server.base_url, concurrency, batch_size,
+                               adaptive, group_identical, max_resumes, prompt_template)
+            after = server.stats()
+
+            summary = run['metrics'].summary()
+            processed = len(drugs) - run['unprocessed']
+            result = {
+                'concurrency': concurrency,
+                'batch_size': batch_size,
+                'adaptive': adaptive,
+                'prompt_template': prompt_template,
+                'drugs': len(drugs),
+                'unprocessed': run['unprocessed'],
+                'resumes': run['resumes'],
+                'wall_seconds': round(run['seconds'], 3),
+                'drugs_per_minute': round(processed * 60 / run['seconds']) if run['seconds'] else None,
+                'calls': summary['calls'],
+                'calls_per_drug': round(summary['calls'] / len(drugs), 3) if drugs else None,
+                'batch_limits': run['limits'],
+                'prompt_tokens': summary['prompt_tokens'],
+                'completion_tokens': summary['completion_tokens'],
+                'tokens_per_drug': summary['tokens_per_drug'],
+                'server': {key: after[key] - before[key] for key in after if key not in ('in_flight', 'peak_in_flight')},
+                'latency_seconds': distribution(run['metrics'].latencies()),
+            }
+            results.append(result)
+            p95 = result['latency_seconds']['p95']
+            print(f"  concurrency {concurrency:>3}  batch {batch_size:>3}  "
+                  f"{result['wall_seconds']:>8.2f}s  {result['drugs_per_minute'] or 0:>7} drugs/min  "
+                  f"p95 {p95 or 0:>6.2f}s  {result['calls_per_drug'] or 0:.3f} calls/drug  "
+                  f"limit {format_limits(run['limits'])}  {run['resumes']} resumes  "
+                  f"{run['unprocessed']} left", file=sys.stderr)
+
+            for path in (drugs_path, drugs_path.with_name(drugs_path.name + '.snap'),
+                         drugs_path.with_name(drugs_path.stem + '_groups.jsonl'),
+                         drugs_path.with_name(drugs_path.stem + '_inference.jsonl')):
+                path.unlink(missing_ok=True)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the packaging pipeline against a local mock API")
+    parser.add_argument('--input', default=str(INVENTORY_DIR / 'drugs.json'),
+                        help="Drugs file the synthetic drugs are modeled on (default: seeds/inventory/drugs.json)")
+    parser.add_argument('--drugs', type=int, default=None,
+                        help="Number of drugs to process (default: as many as in --input)")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=DEFAULT_CONCURRENCY,
+                        help="Concurrency levels to run (default: 1 4 8)")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=DEFAULT_BATCH_SIZES,
+                        help="Starting batch sizes to run (default: 12)")
+    parser.add_argument('--fixed-batch-size', action='store_true',
+                        help="Keep batch sizes fixed instead of adapting")
+    parser.add_argument('--no-group', action='store_true',
+                        help="Send every drug, even ones identical to another")
+    parser.add_argument('--prompt-template', choices=PROMPT_TEMPLATES, default='compact',
+                        help="Prompt template the adder uses (default: compact)")
+    parser.add_argument('--max-resumes', type=int, default=3,
+                        help="Reruns allowed per benchmark run to finish leftover drugs (default: 3)")
+    parser.add_argument('--latency', type=float, default=0.2,
+                        help="Mock seconds per request (default: 0.2)")
+    parser.add_argument('--latency-per-drug', type=float, default=0.01,
+                        help="Mock extra seconds per drug (default: 0.01)")
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help="Fraction of mock requests failing with 503")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0,
+                        help="Fraction of mock requests failing with 429")
+    parser.add_argument('--drop-rate', type=float, default=0.0,
+                        help="Fraction of mock replies leaving a drug out")
+    parser.add_argument('--shapes', nargs='+', choices=SHAPES, default=['drugs'],
+                        help="Mock reply shapes to pick from (default: drugs)")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="Seed for the mock's random failures (default: 0)")
+    parser.add_argument('--work-dir', default=None,
+                        help="Where to write the drugs copies")
+    parser.add_argument('--output', default=None,
+                        help="Write results JSON here instead of stdout")
+    parser.add_argument('--max-calls-per-drug', type=float, default=None,
+                        help="Exit with status 1 if any run needs more model calls per drug")
+    args = parser.parse_args()
+
+    items = load_items(args.input)
+    drugs = synthetic_drugs(items, args.drugs or len(items))
+
+    mock_options = [
+        '--latency', str(args.latency), '--latency-per-drug', str(args.latency_per_drug),
+        '--error-rate', str(args.error_rate), '--rate-limit-rate', str(args.rate_limit_rate),
+        '--drop-rate', str(args.drop_rate), '--seed', str(args.seed), '--shapes', *args.shapes,
+    ]
+    server = MockServer(mock_options)
+    try:
+        print(f"Benchmarking {len(drugs)} drugs against {server.base_url}", file=sys.stderr)
+        results = run_benchmarks(drugs, server, args.concurrency, args.batch_sizes, args.work_dir,
+                                 not args.fixed_batch_size, not args.no_group, args.max_resumes,
+                                 args.prompt_template)
+    finally:
+        server.stop()
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'mock': {
+            'latency': args.latency,
+            'latency_per_drug': args.latency_per_drug,
+            'error_rate': args.error_rate,
+            'rate_limit_rate': args.rate_limit_rate,
+            'drop_rate': args.drop_rate,
+            'shapes': args.shapes,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to: {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.max_calls_per_drug is not None:
+        over = [result for result in results if result['calls_per_drug'] > args.max_calls_per_drug]
+        for result in over:
+            print(f"Too many calls: {result['calls_per_drug']} per drug at concurrency {result['concurrency']}, "
+                  f"batch {result['batch_size']} (limit {args.max_calls_per_drug})", file=sys.stderr)
+        if over:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
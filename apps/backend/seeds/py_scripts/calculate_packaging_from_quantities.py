@@ -4,10 +4,15 @@ Calculate packaging structure from actual quantities.
 The quantities tell us the real relationships!
 """
 
-import json
+import os
+import sys
 from math import gcd
 from functools import reduce
 
+from inventory_io import iter_items, temporary_path, write_items
+
+DRUGS_FILE = "apps/backend/seeds/inventory/drugs.json"
+
 def calculate_packaging_structure(units):
     """
     Calculate packaging structure by analyzing the quantity ratios.
@@ -42,40 +47,49 @@ def calculate_packaging_structure(units):
     return structure
 
 
-def process_all_drugs():
-    """Process all drugs and add calculated packaging structures."""
+def process_all_drugs(file_path=DRUGS_FILE):
+    """
+    Process all drugs and add calculated packaging structures.
 
-    file_path = "apps/backend/seeds/inventory/drugs.json"
+    Drugs are streamed one at a time into a temporary file in the same format
+    (.json or .jsonl), which then replaces the original.
+    """
     print(f"Loading {file_path}...")
-
-    with open(file_path, 'r', encoding='utf-8') as f:
-        drugs = json.load(f)
-
-    print(f"Loaded {len(drugs)} drugs\n")
     print("Calculating packaging structures from quantities...\n")
 
     # Track different structure patterns
     structure_patterns = {}
+    # One example of each unique pattern
+    examples = {}
+    processed = 0
+
+    def add_structures():
+        nonlocal processed
+        for drug in iter_items(file_path):
+            structure = calculate_packaging_structure(drug.get('units', []))
+            drug['packagingStructure'] = structure
+            processed += 1
 
-    for i, drug in enumerate(drugs):
-        structure = calculate_packaging_structure(drug.get('units', []))
-        drug['packagingStructure'] = structure
+            # Track patterns for summary
+            pattern_key = " -> ".join([f"{s['unit']}({s['contains']})" for s in structure]) if structure else "single-unit"
+            structure_patterns[pattern_key] = structure_patterns.get(pattern_key, 0) + 1
 
-        # Track patterns for summary
-        pattern_key = " -> ".join([f"{s['unit']}({s['contains']})" for s in structure]) if structure else "single-unit"
-        structure_patterns[pattern_key] = structure_patterns.get(pattern_key, 0) + 1
+            pattern = " -> ".join([f"{s['contains']}" for s in structure]) if structure else "none"
+            if pattern not in examples and len(examples) < 10:
+                examples[pattern] = drug
 
-        if (i + 1) % 30 == 0:
-            print(f"  Processed {i + 1}/{len(drugs)} drugs...")
+            if processed % 30 == 0:
+                print(f"  Processed {processed} drugs...")
 
-    print(f"\n✓ Processed all {len(drugs)} drugs\n")
+            yield drug
 
     # Save the updated data
-    print(f"Saving to {file_path}...")
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(drugs, f, indent=2, ensure_ascii=False)
+    tmp_path = temporary_path(file_path)
+    write_items(add_structures(), tmp_path)
+    os.replace(tmp_path, file_path)
 
-    print("✓ File updated!\n")
+    print(f"\n✓ Processed all {processed} drugs\n")
+    print(f"✓ Saved to {file_path}\n")
 
     # Show summary
     print("=" * 80)
@@ -89,31 +103,19 @@ def process_all_drugs():
     print("EXAMPLES OF CALCULATED STRUCTURES:")
     print("=" * 80)
 
-    examples_shown = set()
-    for drug in drugs:
-        # Create pattern key
+    for drug in examples.values():
         structure = drug['packagingStructure']
-        if structure:
-            pattern = " -> ".join([f"{s['contains']}" for s in structure])
-        else:
-            pattern = "none"
-
-        # Show one example of each unique pattern
-        if pattern not in examples_shown and len(examples_shown) < 10:
-            examples_shown.add(pattern)
+        qtys = [f"{u['quantity']} {u['name']}" for u in drug['units']]
 
-            units = [u['name'] for u in drug['units']]
-            qtys = [f"{u['quantity']} {u['name']}" for u in drug['units']]
+        print(f"\n{drug['name']}")
+        print(f"  Current stock: {', '.join(qtys)}")
 
-            print(f"\n{drug['name']}")
-            print(f"  Current stock: {', '.join(qtys)}")
-
-            if structure:
-                print(f"  Packaging:")
-                for level in structure:
-                    print(f"    • 1 {level['unit']} = {level['contains']} {level['of']}(s)")
-            else:
-                print(f"  Packaging: Single unit (no hierarchy)")
+        if structure:
+            print(f"  Packaging:")
+            for level in structure:
+                print(f"    • 1 {level['unit']} = {level['contains']} {level['of']}(s)")
+        else:
+            print(f"  Packaging: Single unit (no hierarchy)")
 
     print("\n" + "=" * 80)
     print("✓ All packaging structures calculated from actual quantities!")
@@ -121,5 +123,6 @@ def process_all_drugs():
 
 
 if __name__ == "__main__":
-    process_all_drugs()
+    # Drugs file can be passed as the first argument (.json or .jsonl)
+    process_all_drugs(sys.argv[1] if len(sys.argv) > 1 else DRUGS_FILE)
 
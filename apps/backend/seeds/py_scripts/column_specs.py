@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Declarative column mappings for the converter scripts.
+
+Each category's CSV header names live in column_mappings.json, next to
+categories.json. A spec is compiled once per file into a row transformer that
+pulls the mapped fields out of plain csv.reader rows by position, so no dict
+is built per row and a new sheet layout is a config change.
+
+A converter plug-in provides a build function whose parameters, after the
+category, are the spec's column keys:
+
+    def build_item(category, name, pack, units, expiry_date):
+        return {...}  # inventory item, or None to skip the row
+"""
+
+import inspect
+import json
+from functools import lru_cache
+from operator import itemgetter
+from pathlib import Path
+
+SPECS_PATH = Path(__file__).parent.parent / 'column_mappings.json'
+
+
+@lru_cache(maxsize=None)
+def load_specs(specs_path=SPECS_PATH):
+    """
+    Load all column mapping specs.
+
+    Returns:
+        tuple: Spec dicts, in file order
+    """
+    with open(specs_path, 'r', encoding='utf-8') as f:
+        return tuple(json.load(f))
+
+
+def get_spec(category, specs_path=SPECS_PATH):
+    """Return the column mapping spec for a category name."""
+    for spec in load_specs(specs_path):
+        if spec['category'] == category:
+            return spec
+    raise KeyError(f"No column mapping for category '{category}' in {specs_path}")
+
+
+def spec_fields(build_item):
+    """Return the column keys a build function takes, in parameter order."""
+    return list(inspect.signature(build_item).parameters)[1:]
+
+
+def compile_row_transformer(spec, header, build_item):
+    """
+    Compile a spec against a CSV header into a positional row transformer.
+
+    Columns missing from the header read as ''. Short rows are padded with ''.
+    Later duplicate header names win, matching csv.DictReader.
+
+    Args:
+        spec: Column mapping spec
+        header: CSV header row
+        build_item: Plug-in build function
+
+    Returns:
+        Callable taking a csv.reader row list and returning an item or None
+    """
+    header_index = {name: i for i, name in enumerate(header)}
+
+    indices = []
+    for field in spec_fields(build_item):
+        if field not in spec['columns']:
+            raise ValueError(f"Column mapping for '{spec['category']}' has no '{field}' column")
+        # -1 points at the '' appended to every row
+        indices.append(header_index.get(spec['columns'][field], -1))
+
+    if len(indices) == 1:
+        index = indices[0]
+        getter = lambda row: (row[index],)
+    else:
+        getter = itemgetter(*indices)
+
+    category = spec['category']
+    width = len(header)
+
+    def transform(row):
+        if len(row) < width:
+            row.extend([''] * (width - len(row)))
+        row.append('')
+        return build_item(category, *getter(row))
+
+    return transform
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Transparent gzip and Zstandard streams for the seed tooling.
+
+Any CSV export, inventory file or backup can be stored compressed: a path
+ending in .gz or .zst is decompressed or compressed on the fly, and every
+other path is opened as a plain file. Compression is picked by the last
+suffix, so drugs.json.gz is still a JSON array and drugs.jsonl.zst still
+JSON Lines.
+
+Compressed input is decompressed by a background thread that reads a few
+chunks ahead of the parser. zlib and zstd release the GIL while they work,
+so decompression runs alongside CSV/JSON parsing instead of in between.
+"""
+
+import gzip
+import io
+import queue
+import threading
+from pathlib import Path
+
+# You'll need to install: pip install zstandard (optional, for .zst files)
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Compressed file suffix -> codec name
+COMPRESSION_SUFFIXES = {'.gz': 'gzip', '.zst': 'zstd'}
+
+# Decompressed bytes handed over per chunk, and chunks buffered ahead
+READ_CHUNK_SIZE = 1 << 20
+READ_AHEAD_CHUNKS = 4
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def compression_for(path):
+    """Return 'gzip', 'zstd' or None for a path."""
+    return COMPRESSION_SUFFIXES.get(Path(path).suffix.lower())
+
+
+def is_compressed(path):
+    """Whether a path names a compressed file."""
+    return compression_for(path) is not None
+
+
+def strip_compression(path):
+    """Return the path without its compression suffix, e.g. drugs.json."""
+    path = Path(path)
+    return path.with_suffix('') if is_compressed(path) else path
+
+
+def format_suffixes(path):
+    """
+    Return the suffixes that determine a file's format, e.g. '.json.gz'.
+
+    Used to build sibling names (backups, temporary files) that keep both
+    the data format and the compression of the original.
+    """
+    path = Path(path)
+    suffix = strip_compression(path).suffix
+    if is_compressed(path):
+        suffix += path.suffix
+    return suffix
+
+
+def _require_zstandard():
+    if zstandard is None:
+        raise ImportError("zstandard is required for .zst files. Install with: pip install zstandard")
+
+
+class _ClosingReader(io.RawIOBase):
+    """Decompressing stream that also closes the underlying file."""
+
+    def __init__(self, source, raw):
+        super().__init__()
+        self._source = source
+        self._raw = raw
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        return self._source.read(size)
+
+    def readinto(self, buffer):
+        data = self._source.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self._source.close()
+            self._raw.close()
+        super().close()
+
+
+class ReadAheadReader(io.RawIOBase):
+    """
+    Raw byte stream fed by a thread that reads a source stream ahead.
+
+    The thread keeps up to `depth` chunks queued, so the consumer rarely
+    waits on the source. Errors raised by the source are re-raised in the
+    consumer on the next read.
+    """
+
+    def __init__(self, source, chunk_size=READ_CHUNK_SIZE, depth=READ_AHEAD_CHUNKS):
+        super().__init__()
+        self._source = source
+        self._chunk_size = chunk_size
+        self._chunks = queue.Queue(depth)
+        self._stop = threading.Event()
+        self._chunk = b''
+        self._offset = 0
+        self._eof = False
+        self._thread = threading.Thread(target=self._fill, daemon=True)
+        self._thread.start()
+
+    def _put(self, value):
+        while not self._stop.is_set():
+            try:
+                self._chunks.put(value, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _fill(self):
+        try:
+            while True:
+                chunk = self._source.read(self._chunk_size)
+                if not self._put(chunk) or not chunk:
+                    return
+        except Exception as e:
+            self._put(e)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while self._offset >= len(self._chunk):
+            if self._eof:
+                return 0
+            chunk = self._chunks.get()
+            if isinstance(chunk, Exception):
+                self._eof = True
+                raise chunk
+            if not chunk:
+                self._eof = True
+                return 0
+            self._chunk = chunk
+            self._offset = 0
+
+        size = min(len(buffer), len(self._chunk) - self._offset)
+        buffer[:size] = self._chunk[self._offset:self._offset + size]
+        self._offset += size
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._stop.set()
+            self._thread.join()
+            self._source.close()
+        super().close()
+
+
+def open_decompressed(path, read_ahead=True):
+    """
+    Open a file for reading bytes, decompressing it if its suffix says so.
+
+    Args:
+        path: Path to a plain, .gz or .zst file
+        read_ahead: Decompress in a background thread ahead of the reader
+
+    Returns:
+        A binary file object
+    """
+    compression = compression_for(path)
+    if compression is None:
+        return open(path, 'rb')
+
+    raw = open(path, 'rb')
+    try:
+        if compression == 'gzip':
+            source = gzip.GzipFile(fileobj=raw, mode='rb')
+        else:
+            _require_zstandard()
+            # Appended JSON Lines are stored as one frame per append
+            source = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+    except BaseException:
+        raw.close()
+        raise
+
+    stream = _ClosingReader(source, raw)
+    if read_ahead:
+        stream = ReadAheadReader(stream)
+    return io.BufferedReader(stream, READ_CHUNK_SIZE)
+
+
+def open_compressed(path, append=False):
+    """
+    Open a file for writing bytes, compressing it if its suffix says so.
+
+    Appending to a compressed file adds a new gzip member or zstd frame,
+    which readers see as one continuous stream.
+    """
+    compression = compression_for(path)
+    mode = 'ab' if append else 'wb'
+    if compression is None:
+        return open(path, mode)
+    if compression == 'gzip':
+        return gzip.open(path, mode, compresslevel=GZIP_LEVEL)
+
+    _require_zstandard()
+    raw = open(path, mode)
+    try:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw, closefd=True)
+    except BaseException:
+        raw.close()
+        raise
+
+
+def open_text(path, mode='r', encoding='utf-8', newline=None, read_ahead=True):
+    """
+    Open a plain or compressed file in text mode.
+
+    Args:
+        path: Path to a plain, .gz or .zst file
+        mode: 'r', 'w' or 'a'
+        encoding: Text encoding
+        newline: As for open(); pass '' for CSV files
+        read_ahead: Decompress compressed input in a background thread
+
+    Returns:
+        A text file object
+    """
+    if not is_compressed(path):
+        return open(path, mode, encoding=encoding, newline=newline)
+    if mode == 'r':
+        stream = open_decompressed(path, read_ahead)
+    elif mode in ('w', 'a'):
+        stream = open_compressed(path, append=mode == 'a')
+    else:
+        raise ValueError(f"Unsupported mode for compressed files: {mode!r}")
+    return io.TextIOWrapper(stream, encoding=encoding, newline=newline)
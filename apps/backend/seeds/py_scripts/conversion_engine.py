@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Streaming CSV -> inventory conversion engine shared by the converter scripts.
+
+Rows are read one at a time, turned into inventory items by a per-category
+build function and written straight into the output JSON array, so peak
+memory stays flat no matter how large the stock sheet is.
+
+A converter plug-in provides a build function plus a column mapping spec
+(see column_specs.py); the spec is compiled once per file into a positional
+row transformer that works on plain csv.reader rows.
+
+Large sheets can also be split into line-aligned byte ranges and transformed
+across a process pool with convert_csv_parallel, which produces exactly the
+same output as convert_csv. Input can be read straight from a memory-mapped
+buffer instead of a Python file object.
+
+CSVs and outputs may be gzip or Zstandard compressed (see compressed_io.py).
+Compressed CSVs are decompressed by a read-ahead thread while rows are parsed;
+they cannot be memory-mapped or split into byte ranges, so those options
+fall back to the streaming path.
+"""
+
+import csv
+import io
+import mmap
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from column_specs import compile_row_transformer
+from compressed_io import is_compressed, open_text
+from inventory_io import ARRAY_PUNCTUATION, format_item, format_line, is_json_lines, write_items
+
+# Bytes of the mapped file decoded at a time
+MMAP_BLOCK_SIZE = 1 << 20
+
+
+def iter_mapped_lines(csv_path, start=0, end=None, block_size=MMAP_BLOCK_SIZE):
+    """
+    Yield decoded lines from a memory-mapped file between two byte offsets.
+
+    The mapping is decoded one newline-aligned block at a time, so there is
+    no read call per line, and worker processes mapping the same file share
+    its pages through the OS page cache instead of each buffering a copy.
+    Lines that start before end are yielded whole.
+    """
+    with open(csv_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            end = size if end is None else min(end, size)
+            position = start
+            while position < end:
+                block_end = min(position + block_size, end)
+                # Extend the block to the end of the line it stops in
+                if block_end < size:
+                    newline = buf.find(b'\n', block_end - 1)
+                    block_end = size if newline < 0 else newline + 1
+                yield from io.StringIO(buf[position:block_end].decode('utf-8'), newline='')
+                position = block_end
+
+
+def iter_csv_rows(csv_path, use_mmap=False):
+    """
+    Yield the CSV header row, then each non-empty data row, as lists.
+
+    Args:
+        csv_path: Path to input CSV file
+        use_mmap: Scan records from a memory-mapped buffer (ignored for
+            compressed files)
+    """
+    if use_mmap and not is_compressed(csv_path):
+        reader = csv.reader(iter_mapped_lines(csv_path))
+        yield next(reader, [])
+        for row in reader:
+            if row:
+                yield row
+        return
+
+    with open_text(csv_path, newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        yield next(reader, [])
+        for row in reader:
+            if row:
+                yield row
+
+
+def iter_inventory_items(rows, transform):
+    """
+    Lazily transform rows into inventory items, dropping skipped rows.
+
+    Args:
+        rows: Iterable of csv.reader rows
+        transform: Compiled row transformer returning an item dict or None
+    """
+    for row in rows:
+        item = transform(row)
+        if item is not None:
+            yield item
+
+
+def iter_csv_items(csv_path, build_item, spec, use_mmap=False):
+    """
+    Yield inventory items from a CSV using a plug-in build function and spec.
+
+    Args:
+        csv_path: Path to input CSV file
+        build_item: Plug-in build function
+        spec: Column mapping spec for the sheet
+        use_mmap: Scan records from a memory-mapped buffer
+    """
+    rows = iter_csv_rows(csv_path, use_mmap)
+    transform = compile_row_transformer(spec, next(rows), build_item)
+    yield from iter_inventory_items(rows, transform)
+
+
+def convert_csv(csv_path, output_path, build_item, spec, use_mmap=False, compact=False):
+    """
+    Stream a CSV file through a converter plug-in into an inventory file.
+
+    The output is a JSON array, or JSON Lines for a .jsonl/.ndjson path.
+
+    Args:
+        csv_path: Path to input CSV file
+        output_path: Path to output JSON or JSON Lines file
+        build_item: Plug-in build function
+        spec: Column mapping spec for the sheet
+        use_mmap: Scan records from a memory-mapped buffer
+        compact: Write a JSON array without indentation
+
+    Returns:
+        Number of items written
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    items = iter_csv_items(csv_path, build_item, spec, use_mmap)
+    return write_items(items, output_path, compact=compact)
+
+
+def read_header(csv_path):
+    """
+    Read the CSV header row.
+
+    Returns:
+        tuple: (header, data_start) where data_start is the byte offset
+        of the first data row
+    """
+    with open(csv_path, 'rb') as f:
+        header_line = f.readline()
+        data_start = f.tell()
+
+    header = next(csv.reader([header_line.decode('utf-8')]), [])
+    return header, data_start
+
+
+def find_chunk_ranges(csv_path, chunk_count, data_start):
+    """
+    Split the data section of a CSV into byte ranges aligned to line starts.
+
+    Every boundary is moved forward to just after the next newline, so each
+    range holds whole records. Quoted fields containing newlines would be cut
+    in half, which the stock sheet exports never have.
+
+    Returns:
+        list: (start, end) byte offset tuples, in file order
+    """
+    file_size = os.path.getsize(csv_path)
+    chunk_size = max(1, (file_size - data_start) // max(1, chunk_count))
+
+    boundaries = [data_start]
+    with open(csv_path, 'rb') as f:
+        position = data_start + chunk_size
+        while position < file_size:
+            f.seek(position)
+            f.readline()
+            aligned = f.tell()
+            if aligned >= file_size:
+                break
+            if aligned > boundaries[-1]:
+                boundaries.append(aligned)
+            position = aligned + chunk_size
+    boundaries.append(file_size)
+
+    return [
+        (start, end)
+        for start, end in zip(boundaries, boundaries[1:])
+        if end > start
+    ]
+
+
+def transform_byte_range(csv_path, start, end, header, build_item, spec, fragment_path, json_lines=False,
+                         compact=False):
+    """
+    Transform one byte range of a CSV into an output fragment file.
+
+    Runs inside a worker process. The range is scanned from a memory map of
+    the CSV shared with the other workers. The fragment holds the formatted
+    items joined by the array separator with no surrounding brackets, or
+    newline-terminated JSON Lines records, ready to be merged.
+
+    Returns:
+        int: Number of items written
+    """
+    transform = compile_row_transformer(spec, header, build_item)
+    separator = ARRAY_PUNCTUATION[compact][1]
+    rows = (row for row in csv.reader(iter_mapped_lines(csv_path, start, end)) if row)
+
+    count = 0
+    with open(fragment_path, 'w', encoding='utf-8') as f:
+        for item in iter_inventory_items(rows, transform):
+            if json_lines:
+                f.write(format_line(item))
+                f.write('\n')
+            else:
+                if count:
+                    f.write(separator)
+                f.write(format_item(item, compact))
+            count += 1
+    return count
+
+
+def merge_fragments(fragments, output_path, json_lines=False, compact=False):
+    """
+    Concatenate ordered (fragment_path, count) pairs into one output file.
+
+    Returns:
+        int: Total number of items written
+    """
+    opening, separator, closing = ARRAY_PUNCTUATION[compact]
+    total = 0
+    with open_text(output_path, 'w') as out:
+        for fragment_path, count in fragments:
+            if not count:
+                continue
+            if not json_lines:
+                out.write(opening if total == 0 else separator)
+            with open(fragment_path, 'r', encoding='utf-8') as fragment:
+                shutil.copyfileobj(fragment, out)
+            total += count
+        if not json_lines:
+            out.write(closing if total else '[]')
+    return total
+
+
+def convert_csv_parallel(csv_path, output_path, build_item, spec, workers=None, chunks_per_worker=4,
+                         compact=False):
+    """
+    Convert one large CSV by transforming line-aligned byte ranges in parallel.
+
+    The header is read once and handed to every worker. Each range is written
+    to its own fragment file, and the fragments are merged back in file order,
+    so the result is byte-identical to convert_csv. Compressed CSVs are
+    converted with convert_csv instead.
+
+    Args:
+        csv_path: Path to input CSV file
+        output_path: Path to output JSON or JSON Lines file
+        build_item: Module-level plug-in build function
+        spec: Column mapping spec for the sheet
+        workers: Number of worker processes (defaults to CPU count)
+        chunks_per_worker: Ranges per worker, to even out uneven chunks
+        compact: Write a JSON array without indentation
+
+    Returns:
+        Number of items written
+    """
+    if is_compressed(csv_path):
+        # Compressed input has no seekable line boundaries to split on
+        return convert_csv(csv_path, output_path, build_item, spec, compact=compact)
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    json_lines = is_json_lines(output_path)
+    header, data_start = read_header(csv_path)
+    ranges = find_chunk_ranges(csv_path, workers * chunks_per_worker, data_start)
+
+    fragment_dir = tempfile.mkdtemp(prefix='.fragments_', dir=output_path.parent)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            for i, (start, end) in enumerate(ranges):
+                fragment_path = os.path.join(fragment_dir, f'{i:06d}.part')
+                future = executor.submit(
+                    transform_byte_range, csv_path, start, end,
+                    header, build_item, spec, fragment_path, json_lines, compact
+                )
+                futures.append((fragment_path, future))
+
+            fragments = [(path, future.result()) for path, future in futures]
+
+        return merge_fragments(fragments, output_path, json_lines, compact)
+    finally:
+        shutil.rmtree(fragment_dir, ignore_errors=True)
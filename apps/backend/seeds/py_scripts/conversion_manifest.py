@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Incremental re-conversion support for the converter scripts.
+
+A manifest stored next to the inventory JSON files records, for every output
+file, a hash of the source CSV and, keyed by item name, a hash of each
+source row and the position of its item in the output. On a re-run,
+untouched CSVs are skipped entirely and only changed rows go through the
+converter again; unchanged rows reuse the item from the previous output,
+which is read in step with the CSV, so memory stays flat however large the
+sheet is. A row that moved above rows before it in the sheet is converted
+again rather than reused.
+
+A converter's fingerprint covers its own source, the source of every module
+in this directory it imports (directly or through other local modules, e.g.
+expiry_dates.py and inventory_model.py) and its column mapping, so editing a
+shared helper re-converts everything that uses it.
+"""
+
+import ast
+import hashlib
+import inspect
+import json
+import os
+from itertools import islice
+from pathlib import Path
+
+from column_specs import compile_row_transformer
+from conversion_engine import iter_csv_rows
+from inventory_io import iter_items, temporary_path, write_items
+
+MANIFEST_NAME = '.conversion_manifest.json'
+MANIFEST_VERSION = 2
+
+
+def manifest_path_for(output_dir):
+    """Return the manifest path for an inventory output directory."""
+    return Path(output_dir) / MANIFEST_NAME
+
+
+def load_manifest(manifest_path):
+    """Load the manifest, or return an empty one if missing or outdated."""
+    manifest_path = Path(manifest_path)
+    if manifest_path.exists():
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest
+    return {'version': MANIFEST_VERSION, 'files': {}}
+
+
+def save_manifest(manifest, manifest_path):
+    """Atomically write the manifest."""
+    manifest_path = Path(manifest_path)
+    tmp_path = manifest_path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, manifest_path)
+
+
+def hash_file(path, block_size=1 << 20):
+    """Return the hex digest of a file's contents."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_row(row):
+    """Return the hex digest of a csv.reader row's values."""
+    return hashlib.blake2b('\x1f'.join(row).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def local_dependencies(source_path):
+    """
+    Source files of the modules next to source_path that it imports, directly
+    or through each other, including source_path itself, sorted by name.
+
+    Imports inside functions count too; modules from elsewhere (the standard
+    library, installed packages) are left out.
+    """
+    source_path = Path(source_path).resolve()
+    root = source_path.parent
+    found = {}
+    pending = [source_path]
+    while pending:
+        path = pending.pop()
+        if path.name in found:
+            continue
+        found[path.name] = path
+        for node in ast.walk(ast.parse(path.read_text(encoding='utf-8'), str(path))):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                candidate = root / f"{name.split('.')[0]}.py"
+                if candidate.exists():
+                    pending.append(candidate)
+    return [found[name] for name in sorted(found)]
+
+
+def converter_fingerprint(module, spec):
+    """
+    Identify a converter plug-in by name, source hashes and column mapping.
+
+    The sources are the converter's and those of the local modules it
+    depends on, plus this module's (it builds the rows it reuses). Editing
+    any of them, or the mapping, invalidates every row the converter
+    produced, so stale items are never reused.
+    """
+    spec_hash = hashlib.blake2b(
+        json.dumps(spec, sort_keys=True).encode('utf-8'), digest_size=8
+    ).hexdigest()
+    sources = hashlib.blake2b(digest_size=16)
+    dependencies = {path.name: path for path in local_dependencies(inspect.getsourcefile(module))}
+    dependencies.update((path.name, path) for path in local_dependencies(__file__))
+    for name in sorted(dependencies):
+        sources.update(f"{name}:{hash_file(dependencies[name])}\n".encode('utf-8'))
+    return f"{module.__name__}:{sources.hexdigest()}:{spec_hash}"
+
+
+class PreviousOutput:
+    """
+    The previous output's items, read forward in step with the new rows.
+
+    take(position) skips the items before position, so only the item being
+    reused is held in memory. Items behind the current position can no
+    longer be taken.
+    """
+
+    def __init__(self, output_path):
+        self._items = iter_items(output_path)
+        self._position = 0
+
+    def take(self, position):
+        """The item at position in the previous output, or None if already passed or missing."""
+        if position < self._position:
+            return None
+        item = next(islice(self._items, position - self._position, None), None)
+        self._position = position + 1
+        return item
+
+    def close(self):
+        self._items.close()
+
+
+def convert_csv_incremental(csv_path, output_path, build_item, spec, fingerprint, previous_entry=None,
+                            use_mmap=False, compact=False):
+    """
+    Convert a CSV, reusing whatever the previous run already produced.
+
+    Args:
+        csv_path: Path to input CSV file
+        output_path: Path to output JSON or JSON Lines file
+        build_item: Plug-in build function
+        spec: Column mapping spec for the sheet
+        fingerprint: converter_fingerprint() of the plug-in and spec
+        previous_entry: This output's manifest entry from the last run
+        use_mmap: Scan the CSV from a memory-mapped buffer
+        compact: Write a JSON array without indentation
+
+    Returns:
+        tuple: (manifest_entry, stats) where stats holds the item count and
+        how many rows were skipped, reused and transformed
+    """
+    output_path = Path(output_path)
+    source_hash = hash_file(csv_path)
+
+    previous_entry = previous_entry or {}
+    reusable = (
+        previous_entry.get('converter') == fingerprint
+        and previous_entry.get('compact', False) == compact
+        and output_path.exists()
+    )
+
+    if reusable and previous_entry.get('source_hash') == source_hash:
+        stats = {'items': previous_entry.get('items', 0), 'skipped': True, 'reused': 0, 'transformed': 0}
+        return previous_entry, stats
+
+    csv_rows = iter_csv_rows(csv_path, use_mmap)
+    header = next(csv_rows)
+    transform = compile_row_transformer(spec, header, build_item)
+    reusable = reusable and previous_entry.get('header') == header
+
+    previous = PreviousOutput(output_path) if reusable else None
+    previous_rows = {
+        row_hash: (name, position)
+        for name, (row_hash, position) in previous_entry.get('rows', {}).items()
+    } if reusable else {}
+
+    rows = {}
+    # Names written more than once; a row hash cannot tell which item it made
+    duplicates = set()
+    stats = {'items': 0, 'skipped': False, 'reused': 0, 'transformed': 0}
+
+    def iter_output_items():
+        position = 0
+        for row in csv_rows:
+            row_hash = hash_row(row)
+            name, previous_position = previous_rows.get(row_hash, (None, None))
+            item = previous.take(previous_position) if name is not None else None
+            if item is not None and item.get('name') == name:
+                stats['reused'] += 1
+            else:
+                item = transform(row)
+                stats['transformed'] += 1
+            if item is not None:
+                if item['name'] in rows:
+                    duplicates.add(item['name'])
+                rows[item['name']] = [row_hash, position]
+                position += 1
+                yield item
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = temporary_path(output_path)
+    try:
+        stats['items'] = write_items(iter_output_items(), tmp_path, compact=compact)
+    finally:
+        if previous is not None:
+            previous.close()
+    os.replace(tmp_path, output_path)
+    for name in duplicates:
+        del rows[name]
+
+    entry = {
+        'source': str(csv_path),
+        'source_hash': source_hash,
+        'converter': fingerprint,
+        'header': header,
+        'compact': compact,
+        'items': stats['items'],
+        'rows': rows,
+    }
+    return entry, stats
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Convert every category CSV in a directory to inventory JSON in parallel.
+
+Sheets are matched to categories through column_mappings.json, and each
+category sheet is handed to its converter plug-in in a separate worker
+process, so a full refresh takes about as long as the slowest sheet. A
+manifest next to the outputs lets re-runs skip unchanged sheets and only
+re-transform changed rows. Sheets may be exported gzip or Zstandard
+compressed (Pills.csv.gz), and outputs can be written compressed too.
+
+Usage: python convert_all.py <csv_dir> [output_dir] [--workers N] [--force] [--mmap] [--format json|json-compact|jsonl]
+                             [--compress gz|zst]
+Example: python convert_all.py ~/Downloads
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from column_specs import load_specs
+from compressed_io import COMPRESSION_SUFFIXES, is_compressed, strip_compression
+from conversion_manifest import (
+    convert_csv_incremental,
+    converter_fingerprint,
+    load_manifest,
+    manifest_path_for,
+    save_manifest,
+)
+
+DEFAULT_OUTPUT_DIR = Path(__file__).parent.parent / 'inventory'
+
+# Output format -> file extension
+OUTPUT_SUFFIXES = {'json': '.json', 'json-compact': '.json', 'jsonl': '.jsonl'}
+
+
+def find_category_csvs(csv_dir):
+    """
+    Match the CSV files in a directory to column mapping specs.
+
+    File names are matched case-insensitively against each spec's "csv",
+    ignoring a .gz or .zst suffix. An uncompressed export wins over a
+    compressed one of the same sheet.
+
+    Returns:
+        list: (spec, csv_path) tuples, in column_mappings.json order
+    """
+    available = {}
+    paths = sorted(Path(csv_dir).iterdir(), key=lambda path: (is_compressed(path), path.name))
+    for path in paths:
+        if path.is_file():
+            available.setdefault(strip_compression(path).name.lower(), path)
+
+    jobs = []
+    for spec in load_specs():
+        csv_path = available.get(spec['csv'].lower())
+        if csv_path is not None:
+            jobs.append((spec, csv_path))
+
+    return jobs
+
+
+def output_name(spec, output_format='json', compression=None):
+    """Return a spec's output file name for an output format and compression."""
+    name = Path(spec['output']).with_suffix(OUTPUT_SUFFIXES[output_format]).name
+    return f"{name}.{compression}" if compression else name
+
+
+def convert_category(spec, csv_path, output_dir, previous_entry=None, use_mmap=False, output_format='json',
+                     compression=None):
+    """
+    Convert one category sheet. Runs inside a worker process.
+
+    Returns:
+        dict: Summary with item counts, output path, timing and the new
+        manifest entry
+    """
+    module = importlib.import_module(spec['converter'])
+    output_path = Path(output_dir) / output_name(spec, output_format, compression)
+
+    start = time.perf_counter()
+    entry, stats = convert_csv_incremental(
+        csv_path, output_path, module.build_item, spec,
+        converter_fingerprint(module, spec), previous_entry, use_mmap,
+        compact=output_format == 'json-compact'
+    )
+    elapsed = time.perf_counter() - start
+
+    return {
+        'category': spec['category'],
+        'csv': str(csv_path),
+        'output': str(output_path),
+        'seconds': elapsed,
+        'entry': entry,
+        **stats,
+    }
+
+
+def convert_all(csv_dir, output_dir=DEFAULT_OUTPUT_DIR, workers=None, force=False, use_mmap=False,
+                output_format='json', compression=None):
+    """
+    Convert all recognised category CSVs in csv_dir across a process pool.
+
+    Args:
+        csv_dir: Directory containing the category CSV exports
+        output_dir: Directory to write <category>.json/.jsonl files into
+        workers: Number of worker processes (defaults to one per sheet)
+        force: Ignore the manifest and rebuild every output from scratch
+        use_mmap: Scan the CSVs from memory-mapped buffers
+        output_format: 'json' for indented JSON arrays, 'json-compact' for
+            unindented ones, or 'jsonl' for JSON Lines
+        compression: 'gz' or 'zst' to compress the outputs (optional)
+
+    Returns:
+        list: Per-category summaries, in column_mappings.json order
+    """
+    jobs = find_category_csvs(csv_dir)
+    if not jobs:
+        print(f"No category CSVs found in {csv_dir}")
+        return []
+
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+
+    manifest_path = manifest_path_for(output_dir)
+    manifest = load_manifest(manifest_path)
+    if force:
+        manifest['files'] = {}
+
+    print(f"Converting {len(jobs)} category sheets with {workers} workers...")
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                convert_category, spec, csv_path, output_dir,
+                manifest['files'].get(output_name(spec, output_format, compression)), use_mmap, output_format,
+                compression
+            ): spec['category']
+            for spec, csv_path in jobs
+        }
+
+        for future in as_completed(futures):
+            category = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                print(f"  ✗ {category}: {e}")
+                continue
+            results[category] = summary
+            manifest['files'][Path(summary['output']).name] = summary.pop('entry')
+            if summary['skipped']:
+                print(f"  - {category}: unchanged, skipped")
+            else:
+                print(f"  ✓ {category}: {summary['items']} items in {summary['seconds']:.2f}s "
+                      f"({summary['transformed']} transformed, {summary['reused']} reused)")
+
+    save_manifest(manifest, manifest_path)
+
+    return [results[spec['category']] for spec, _ in jobs if spec['category'] in results]
+
+
+def print_summary(summaries, wall_time):
+    """Print a combined summary of a convert_all run."""
+    print()
+    print("=" * 80)
+    print("CONVERSION SUMMARY")
+    print("=" * 80)
+    for summary in summaries:
+        status = 'skipped' if summary['skipped'] else f"{summary['transformed']} changed"
+        print(f"  {Path(summary['output']).name:<32} {summary['items']:>8} items  "
+              f"{summary['seconds']:>7.2f}s  {status}")
+
+    total_items = sum(s['items'] for s in summaries)
+    slowest = max((s['seconds'] for s in summaries), default=0.0)
+    print("-" * 80)
+    print(f"  {'Total':<32} {total_items:>8} items")
+    print(f"  Wall time: {wall_time:.2f}s (slowest sheet: {slowest:.2f}s)")
+    print("=" * 80)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert all category CSVs to inventory JSON")
+    parser.add_argument('csv_dir', help="Directory containing the category CSV exports")
+    parser.add_argument('output_dir', nargs='?', default=str(DEFAULT_OUTPUT_DIR),
+                        help="Directory to write inventory JSON files into")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Number of worker processes (default: one per sheet)")
+    parser.add_argument('--force', action='store_true',
+                        help="Ignore the manifest and rebuild every output")
+    parser.add_argument('--mmap', action='store_true',
+                        help="Scan the CSVs from memory-mapped buffers")
+    parser.add_argument('--format', choices=sorted(OUTPUT_SUFFIXES), default='json',
+                        help="Write indented JSON arrays (default), compact JSON arrays or JSON Lines")
+    parser.add_argument('--compress', choices=sorted(suffix.lstrip('.') for suffix in COMPRESSION_SUFFIXES),
+                        default=None, help="Compress the outputs with gzip (gz) or Zstandard (zst)")
+    args = parser.parse_args()
+
+    if not Path(args.csv_dir).is_dir():
+        print(f"Error: Directory not found: {args.csv_dir}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    summaries = convert_all(args.csv_dir, args.output_dir, args.workers, args.force, args.mmap, args.format,
+                            args.compress)
+    print_summary(summaries, time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    main()
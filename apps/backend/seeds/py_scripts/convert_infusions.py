@@ -3,95 +3,95 @@
 Script to convert Infusions.csv to JSON format matching drugs.json structure
 """
 
-import csv
-import json
-import os
+import sys
 from pathlib import Path
 
+from column_specs import get_spec
+from conversion_engine import convert_csv
+from expiry_dates import expiry_to_iso
+from inventory_model import InventoryItem, Unit
+
+# Column mapping for this category lives in column_mappings.json
+CATEGORY = "Infusion"
+
+def build_item(category, name, carton, pieces, expiry_date):
+    """
+    Build an infusion inventory item from one row's mapped columns
+
+    Args:
+        category: Category name from the column mapping
+        name, carton, pieces, expiry_date: Raw cell values
+
+    Returns:
+        InventoryItem, or None to skip the row
+    """
+    # Skip empty rows
+    name = name.strip()
+    if not name:
+        return None
+
+    carton_quantity = carton.strip()
+    pieces_quantity = pieces.strip()
+    expiry_date = expiry_date.strip()
+
+    # Parse carton quantity - convert to int if possible, default to 0 if empty
+    try:
+        carton_qty = int(carton_quantity) if carton_quantity else 0
+    except ValueError:
+        carton_qty = 0
+
+    # Parse pieces quantity - convert to int if possible, default to 0 if empty
+    try:
+        pieces_qty = int(pieces_quantity) if pieces_quantity else 0
+    except ValueError:
+        pieces_qty = 0
+
+    # Build units array with both Carton and Unit
+    units = []
+
+    # Always include Carton (even if quantity is 0)
+    units.append(Unit("Carton", "Cartons", carton_qty))
+
+    # Always include Unit
+    units.append(Unit("Unit", "Units", pieces_qty))
+
+    # Parse expiry date
+    parsed_expiry = expiry_to_iso(expiry_date)
+
+    # Build the JSON object
+    return InventoryItem(
+        name=name,
+        category=category,
+        units=units,
+        earliestExpiryDate=parsed_expiry if parsed_expiry else "",
+        laterExpiryDates=[]
+    )
+
 def convert_csv_to_json(csv_path, output_path):
     """
     Convert CSV file to JSON format matching drugs.json structure
 
     Args:
         csv_path: Path to input CSV file
-        output_path: Path to output JSON file
+        output_path: Path to output JSON file (.jsonl/.ndjson for JSON Lines)
     """
-    infusions = []
-
-    with open(csv_path, 'r', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-
-        for row in reader:
-            # Skip empty rows
-            if not row.get('Intravenous Fluids', '').strip():
-                continue
-
-            name = row['Intravenous Fluids'].strip()
-            carton_quantity = row.get('Carton', '').strip()
-            pieces_quantity = row.get('Pieces', '').strip()
-            expiry_date = row.get('Expiry Date', '').strip()
-
-            # Skip if name is empty
-            if not name:
-                continue
-
-            # Parse carton quantity - convert to int if possible, default to 0 if empty
-            try:
-                carton_qty = int(carton_quantity) if carton_quantity else 0
-            except ValueError:
-                carton_qty = 0
-
-            # Parse pieces quantity - convert to int if possible, default to 0 if empty
-            try:
-                pieces_qty = int(pieces_quantity) if pieces_quantity else 0
-            except ValueError:
-                pieces_qty = 0
-
-            # Build units array with both Carton and Unit
-            units = []
-
-            # Always include Carton (even if quantity is 0)
-            units.append({
-                "name": "Carton",
-                "plural": "Cartons",
-                "quantity": carton_qty
-            })
-
-            # Always include Unit
-            units.append({
-                "name": "Unit",
-                "plural": "Units",
-                "quantity": pieces_qty
-            })
-
-            # Build the JSON object
-            infusion_obj = {
-                "name": name,
-                "category": "Infusion",
-                "units": units,
-                "earliestExpiryDate": expiry_date if expiry_date else "",
-                "laterExpiryDates": []
-            }
-
-            infusions.append(infusion_obj)
-
-    # Write to JSON file
-    with open(output_path, 'w', encoding='utf-8') as jsonfile:
-        json.dump(infusions, jsonfile, indent=2, ensure_ascii=False)
-
-    print(f"Successfully converted {len(infusions)} items to {output_path}")
+    count = convert_csv(csv_path, output_path, build_item, get_spec(CATEGORY))
+
+    print(f"Successfully converted {count} items to {output_path}")
 
 if __name__ == "__main__":
     # Get the script directory
     script_dir = Path(__file__).parent
 
-    # Define paths
-    csv_path = Path("/Users/chidiebereekennia/Downloads/Infusions.csv")
-    output_path = script_dir.parent / "inventory" / "infusions.json"
+    # Define paths (CSV and output paths can be passed as arguments)
+    spec = get_spec(CATEGORY)
+    default_csv = Path("/Users/chidiebereekennia/Downloads") / spec["csv"]
+    csv_path = Path(sys.argv[1]) if len(sys.argv) > 1 else default_csv
+    default_output = script_dir.parent / "inventory" / spec["output"]
+    output_path = Path(sys.argv[2]) if len(sys.argv) > 2 else default_output
 
     # Ensure output directory exists
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
     # Convert
     convert_csv_to_json(csv_path, output_path)
-
@@ -3,47 +3,16 @@
 Script to convert Injections.csv to JSON format matching drugs.json structure
 """
 
-import csv
-import json
-import os
+import sys
 from pathlib import Path
-from datetime import datetime
 
-def parse_expiry_date(date_str):
-    """
-    Parse expiry date from MM/YY format to YYYY-MM-DD format
-    Handles formats like: 1/28, 05/27, 7/25, 6/28
-
-    Args:
-        date_str: Date string in MM/YY format
-
-    Returns:
-        String in YYYY-MM-DD format, or None if invalid/empty
-    """
-    if not date_str or not date_str.strip():
-        return None
-
-    date_str = date_str.strip()
-
-    try:
-        # Handle MM/YY format (e.g., "1/28", "05/27", "7/25")
-        if '/' in date_str:
-            parts = date_str.split('/')
-            if len(parts) == 2:
-                month = int(parts[0])
-                year = int(parts[1])
-
-                # If year is 2 digits, assume 2000s
-                if year < 100:
-                    year = 2000 + year
-
-                # Use first day of the month as the expiry date
-                return f"{year:04d}-{month:02d}-01"
+from column_specs import get_spec
+from conversion_engine import convert_csv
+from expiry_dates import earliest_and_later
+from inventory_model import InventoryItem, Unit
 
-    except (ValueError, IndexError):
-        pass
-
-    return None
+# Column mapping for this category lives in column_mappings.json
+CATEGORY = "Injection"
 
 def parse_quantity(value):
     """
@@ -66,105 +35,79 @@ def parse_quantity(value):
     except ValueError:
         return 0
 
+def build_item(category, name, pack, ampoule_vial, expiry_date, expiry_date2):
+    """
+    Build an injection inventory item from one row's mapped columns
+
+    Args:
+        category: Category name from the column mapping
+        name, pack, ampoule_vial, expiry_date, expiry_date2: Raw cell values
+
+    Returns:
+        InventoryItem, or None to skip the row
+    """
+    # Skip empty rows
+    name = name.strip()
+    if not name:
+        return None
+
+    pack_str = pack.strip()
+    ampoule_vial_str = ampoule_vial.strip()
+    expiry_date_str = expiry_date.strip()
+    expiry_date2_str = expiry_date2.strip()
+
+    # Parse quantities
+    pack_qty = parse_quantity(pack_str)
+    ampoule_vial_qty = parse_quantity(ampoule_vial_str)
+
+    # Build units array
+    units = []
+
+    # If both pack and Ampoule/Vial have values (non-zero), include both
+    if pack_qty > 0 and ampoule_vial_qty > 0:
+        units.append(Unit("Pack", "Packs", pack_qty))
+        units.append(Unit("Ampoule/Vial", "Ampoules/Vials", ampoule_vial_qty))
+    # If only Ampoule/Vial has a value, only include that
+    elif ampoule_vial_qty > 0:
+        units.append(Unit("Ampoule/Vial", "Ampoules/Vials", ampoule_vial_qty))
+    # If only pack has a value, include only that
+    elif pack_qty > 0:
+        units.append(Unit("Pack", "Packs", pack_qty))
+
+    # Determine earliest and later dates
+    earliest_expiry, later_expiry_dates = earliest_and_later(expiry_date_str, expiry_date2_str)
+
+    # Build the JSON object
+    return InventoryItem(
+        name=name,
+        category=category,
+        units=units,
+        earliestExpiryDate=earliest_expiry if earliest_expiry else "",
+        laterExpiryDates=later_expiry_dates
+    )
+
 def convert_csv_to_json(csv_path, output_path):
     """
     Convert CSV file to JSON format matching drugs.json structure
 
     Args:
         csv_path: Path to input CSV file
-        output_path: Path to output JSON file
+        output_path: Path to output JSON file (.jsonl/.ndjson for JSON Lines)
     """
-    injections = []
-
-    with open(csv_path, 'r', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-
-        for row in reader:
-            # Skip empty rows
-            name = row.get('Name', '').strip()
-            if not name:
-                continue
-
-            pack_str = row.get('pack', '').strip()
-            ampoule_vial_str = row.get('Ampoule/Vial', '').strip()
-            expiry_date_str = row.get('Expiry date', '').strip()
-            expiry_date2_str = row.get('Exp. date 2', '').strip()
-
-            # Parse quantities
-            pack_qty = parse_quantity(pack_str)
-            ampoule_vial_qty = parse_quantity(ampoule_vial_str)
-
-            # Build units array
-            units = []
-
-            # If both pack and Ampoule/Vial have values (non-zero), include both
-            if pack_qty > 0 and ampoule_vial_qty > 0:
-                units.append({
-                    "name": "Pack",
-                    "plural": "Packs",
-                    "quantity": pack_qty
-                })
-                units.append({
-                    "name": "Ampoule/Vial",
-                    "plural": "Ampoules/Vials",
-                    "quantity": ampoule_vial_qty
-                })
-            # If only Ampoule/Vial has a value, only include that
-            elif ampoule_vial_qty > 0:
-                units.append({
-                    "name": "Ampoule/Vial",
-                    "plural": "Ampoules/Vials",
-                    "quantity": ampoule_vial_qty
-                })
-            # If only pack has a value, include only that
-            elif pack_qty > 0:
-                units.append({
-                    "name": "Pack",
-                    "plural": "Packs",
-                    "quantity": pack_qty
-                })
-
-            # Parse expiry dates
-            earliest_expiry = parse_expiry_date(expiry_date_str)
-            later_expiry = parse_expiry_date(expiry_date2_str) if expiry_date2_str else None
-
-            # Determine earliest and later dates
-            later_expiry_dates = []
-            if earliest_expiry and later_expiry:
-                if later_expiry > earliest_expiry:
-                    later_expiry_dates = [later_expiry]
-                else:
-                    # If later_expiry is earlier or equal, swap them
-                    later_expiry_dates = [earliest_expiry]
-                    earliest_expiry = later_expiry
-            elif later_expiry:
-                # Only later_expiry exists, use it as earliest
-                earliest_expiry = later_expiry
-
-            # Build the JSON object
-            injection_obj = {
-                "name": name,
-                "category": "Injection",
-                "units": units,
-                "earliestExpiryDate": earliest_expiry if earliest_expiry else "",
-                "laterExpiryDates": later_expiry_dates
-            }
-
-            injections.append(injection_obj)
-
-    # Write to JSON file
-    with open(output_path, 'w', encoding='utf-8') as jsonfile:
-        json.dump(injections, jsonfile, indent=2, ensure_ascii=False)
-
-    print(f"Successfully converted {len(injections)} items to {output_path}")
+    count = convert_csv(csv_path, output_path, build_item, get_spec(CATEGORY))
+
+    print(f"Successfully converted {count} items to {output_path}")
 
 if __name__ == "__main__":
     # Get the script directory
     script_dir = Path(__file__).parent
 
-    # Define paths
-    csv_path = Path("/Users/chidiebereekennia/Downloads/Injections.csv")
-    output_path = script_dir.parent / "inventory" / "injections.json"
+    # Define paths (CSV and output paths can be passed as arguments)
+    spec = get_spec(CATEGORY)
+    default_csv = Path("/Users/chidiebereekennia/Downloads") / spec["csv"]
+    csv_path = Path(sys.argv[1]) if len(sys.argv) > 1 else default_csv
+    default_output = script_dir.parent / "inventory" / spec["output"]
+    output_path = Path(sys.argv[2]) if len(sys.argv) > 2 else default_output
 
     # Ensure output directory exists
     output_path.parent.mkdir(parents=True, exist_ok=True)
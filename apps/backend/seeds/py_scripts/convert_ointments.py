@@ -3,46 +3,53 @@
 Script to convert Ointments.csv to JSON format matching drugs.json structure
 """
 
-import csv
-import json
-import os
+import sys
 from pathlib import Path
 
-def parse_expiry_date(date_str):
+from column_specs import get_spec
+from conversion_engine import convert_csv
+from expiry_dates import expiry_to_iso
+from inventory_model import InventoryItem, Unit
+
+# Column mapping for this category lives in column_mappings.json
+CATEGORY = "Ointment"
+
+def build_item(category, name, units, expiry_date):
     """
-    Parse expiry date from MM/YY format to YYYY-MM-DD format
-    Handles formats like: 11/26, 02/27, 05/25
+    Build an ointment inventory item from one row's mapped columns
 
     Args:
-        date_str: Date string in MM/YY format
+        category: Category name from the column mapping
+        name, units, expiry_date: Raw cell values
 
     Returns:
-        String in YYYY-MM-DD format, or None if invalid/empty
+        InventoryItem, or None to skip the row
     """
-    if not date_str or not date_str.strip():
+    # Skip empty rows
+    name = name.strip()
+    if not name:
         return None
 
-    date_str = date_str.strip()
+    units_quantity = units.strip()
+    expiry_date = expiry_date.strip()
 
+    # Parse quantity - convert to int if possible
     try:
-        # Handle MM/YY format (e.g., "11/26", "02/27")
-        if '/' in date_str:
-            parts = date_str.split('/')
-            if len(parts) == 2:
-                month = int(parts[0])
-                year = int(parts[1])
-
-                # If year is 2 digits, assume 2000s
-                if year < 100:
-                    year = 2000 + year
-
-                # Use first day of the month as the expiry date
-                return f"{year:04d}-{month:02d}-01"
-
-    except (ValueError, IndexError):
-        pass
-
-    return None
+        quantity = int(units_quantity) if units_quantity else 0
+    except ValueError:
+        quantity = 0
+
+    # Parse expiry date
+    parsed_expiry = expiry_to_iso(expiry_date)
+
+    # Build the JSON object
+    return InventoryItem(
+        name=name,
+        category=category,
+        units=[Unit("Unit", "Units", quantity)],
+        earliestExpiryDate=parsed_expiry if parsed_expiry else "",
+        laterExpiryDates=[]
+    )
 
 def convert_csv_to_json(csv_path, output_path):
     """
@@ -50,65 +57,22 @@ def convert_csv_to_json(csv_path, output_path):
 
     Args:
         csv_path: Path to input CSV file
-        output_path: Path to output JSON file
+        output_path: Path to output JSON file (.jsonl/.ndjson for JSON Lines)
     """
-    ointments = []
-
-    with open(csv_path, 'r', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-
-        for row in reader:
-            # Skip empty rows
-            if not row.get('Ointments', '').strip():
-                continue
-
-            name = row['Ointments'].strip()
-            units_quantity = row.get('units', '').strip()
-            expiry_date = row.get('Expiry date', '').strip()
-
-            # Skip if name is empty
-            if not name:
-                continue
-
-            # Parse quantity - convert to int if possible
-            try:
-                quantity = int(units_quantity) if units_quantity else 0
-            except ValueError:
-                quantity = 0
-
-            # Parse expiry date
-            parsed_expiry = parse_expiry_date(expiry_date)
-
-            # Build the JSON object
-            ointment_obj = {
-                "name": name,
-                "category": "Ointment",
-                "units": [
-                    {
-                        "name": "Unit",
-                        "plural": "Units",
-                        "quantity": quantity
-                    }
-                ],
-                "earliestExpiryDate": parsed_expiry if parsed_expiry else "",
-                "laterExpiryDates": []
-            }
-
-            ointments.append(ointment_obj)
-
-    # Write to JSON file
-    with open(output_path, 'w', encoding='utf-8') as jsonfile:
-        json.dump(ointments, jsonfile, indent=2, ensure_ascii=False)
-
-    print(f"Successfully converted {len(ointments)} items to {output_path}")
+    count = convert_csv(csv_path, output_path, build_item, get_spec(CATEGORY))
+
+    print(f"Successfully converted {count} items to {output_path}")
 
 if __name__ == "__main__":
     # Get the script directory
     script_dir = Path(__file__).parent
 
-    # Define paths
-    csv_path = Path("/Users/chidiebereekennia/Downloads/Ointments.csv")
-    output_path = script_dir / "inventory" / "ointments.json"
+    # Define paths (CSV and output paths can be passed as arguments)
+    spec = get_spec(CATEGORY)
+    default_csv = Path("/Users/chidiebereekennia/Downloads") / spec["csv"]
+    csv_path = Path(sys.argv[1]) if len(sys.argv) > 1 else default_csv
+    default_output = script_dir.parent / "inventory" / spec["output"]
+    output_path = Path(sys.argv[2]) if len(sys.argv) > 2 else default_output
 
     # Ensure output directory exists
     output_path.parent.mkdir(parents=True, exist_ok=True)
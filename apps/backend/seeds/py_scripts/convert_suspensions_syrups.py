@@ -3,53 +3,53 @@
 Script to convert Suspensions and syrups.csv to JSON format matching drugs.json structure
 """
 
-import csv
-import json
-import os
+import sys
 from pathlib import Path
-from datetime import datetime
 
-def parse_expiry_date(date_str):
+from column_specs import get_spec
+from conversion_engine import convert_csv
+from expiry_dates import expiry_to_iso
+from inventory_model import InventoryItem, Unit
+
+# Column mapping for this category lives in column_mappings.json
+CATEGORY = "Suspension or Syrup"
+
+def build_item(category, name, quantity, expiry_date):
     """
-    Parse expiry date from MM/YY format to YYYY-MM-DD format
-    Handles formats like: 1/28, 05/27, 06/2026, N/A
+    Build a suspension/syrup inventory item from one row's mapped columns
 
     Args:
-        date_str: Date string in MM/YY or MM/YYYY format
+        category: Category name from the column mapping
+        name, quantity, expiry_date: Raw cell values
 
     Returns:
-        String in YYYY-MM-DD format, or None if invalid/N/A
+        InventoryItem, or None to skip the row
     """
-    if not date_str or date_str.strip().upper() == 'N/A':
+    # Skip empty rows
+    name = name.strip()
+    if not name:
         return None
 
-    date_str = date_str.strip()
+    quantity_str = quantity.strip()
+    expiry_date_str = expiry_date.strip()
 
+    # Parse quantity - convert to int if possible
     try:
-        # Handle MM/YY format (e.g., "1/28", "05/27")
-        if len(date_str.split('/')) == 2:
-            parts = date_str.split('/')
-            month = int(parts[0])
-            year = int(parts[1])
-
-            # If year is 2 digits, assume 2000s
-            if year < 100:
-                year = 2000 + year
-
-            # Use first day of the month as the expiry date
-            return f"{year:04d}-{month:02d}-01"
-
-        # Handle MM/YYYY format (e.g., "06/2026")
-        elif len(date_str.split('/')) == 2:
-            parts = date_str.split('/')
-            month = int(parts[0])
-            year = int(parts[1])
-            return f"{year:04d}-{month:02d}-01"
-
-    except (ValueError, IndexError):
-        pass
-
-    return None
+        quantity = int(quantity_str) if quantity_str else 0
+    except ValueError:
+        quantity = 0
+
+    # Parse expiry date
+    expiry_date = expiry_to_iso(expiry_date_str)
+
+    # Build the JSON object
+    return InventoryItem(
+        name=name,
+        category=category,
+        units=[Unit("Sachet or Bottle", "Sachets or Bottles", quantity)],
+        earliestExpiryDate=expiry_date if expiry_date else "",
+        laterExpiryDates=[]
+    )
 
 def convert_csv_to_json(csv_path, output_path):
     """
@@ -57,69 +57,25 @@ def convert_csv_to_json(csv_path, output_path):
 
     Args:
         csv_path: Path to input CSV file
-        output_path: Path to output JSON file
+        output_path: Path to output JSON file (.jsonl/.ndjson for JSON Lines)
     """
-    items = []
-
-    with open(csv_path, 'r', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-
-        for row in reader:
-            # Skip empty rows
-            if not row.get('Name', '').strip():
-                continue
-
-            name = row['Name'].strip()
-            quantity_str = row.get('Qty (Sachet or Bottle)', '').strip()
-            expiry_date_str = row.get('Expiry Date', '').strip()
-
-            # Skip if name is empty
-            if not name:
-                continue
-
-            # Parse quantity - convert to int if possible
-            try:
-                quantity = int(quantity_str) if quantity_str else 0
-            except ValueError:
-                quantity = 0
-
-            # Parse expiry date
-            expiry_date = parse_expiry_date(expiry_date_str)
-
-            # Build the JSON object
-            item_obj = {
-                "name": name,
-                "category": "Suspension or Syrup",
-                "units": [
-                    {
-                        "name": "Sachet or Bottle",
-                        "plural": "Sachets or Bottles",
-                        "quantity": quantity
-                    }
-                ],
-                "earliestExpiryDate": expiry_date if expiry_date else "",
-                "laterExpiryDates": []
-            }
-
-            items.append(item_obj)
-
-    # Write to JSON file
-    with open(output_path, 'w', encoding='utf-8') as jsonfile:
-        json.dump(items, jsonfile, indent=2, ensure_ascii=False)
-
-    print(f"Successfully converted {len(items)} items to {output_path}")
+    count = convert_csv(csv_path, output_path, build_item, get_spec(CATEGORY))
+
+    print(f"Successfully converted {count} items to {output_path}")
 
 if __name__ == "__main__":
     # Get the script directory
     script_dir = Path(__file__).parent
 
-    # Define paths
-    csv_path = Path("/Users/chidiebereekennia/Downloads/Suspensions and syrups.csv")
-    output_path = script_dir / "inventory" / "suspensions-and-syrups.json"
+    # Define paths (CSV and output paths can be passed as arguments)
+    spec = get_spec(CATEGORY)
+    default_csv = Path("/Users/chidiebereekennia/Downloads") / spec["csv"]
+    csv_path = Path(sys.argv[1]) if len(sys.argv) > 1 else default_csv
+    default_output = script_dir.parent / "inventory" / spec["output"]
+    output_path = Path(sys.argv[2]) if len(sys.argv) > 2 else default_output
 
     # Ensure output directory exists
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
     # Convert
     convert_csv_to_json(csv_path, output_path)
-
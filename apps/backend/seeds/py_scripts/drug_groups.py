@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Group drugs that should get the same packaging structure.
+
+Many stock entries are the same product under a different brand, e.g.
+"Diamet (metformin 500mg)" and "Metformin 500mg tabs" with the same Pack ->
+Card -> Tablet chain. group_key reduces a drug to its active ingredient,
+strength and unit chain:
+
+- A bracketed part of the name is taken as the active ingredient (and
+  strength), since that is how the stock sheets write brand names, but only
+  when it looks like one: it has a strength, lists several ingredients
+  ("+" or ","), or has a word ending like a generic drug name (-ine, -ole,
+  -cin, ...). Brackets holding a maker or a form, e.g. "(Emzor)" or
+  "(Lozenges)", stay part of the full name instead.
+- Dosage-form words (tabs, capsules, ...) and punctuation are dropped, and
+  strengths are written without spaces ("500 mg" -> "500mg").
+
+Brand-only names with no bracketed ingredient only group with exact
+(normalized) duplicates.
+"""
+
+import re
+
+from packaging_cache import normalize_name, unit_chain
+
+DOSAGE_FORMS = {
+    'tab', 'tabs', 'tablet', 'tablets', 'cap', 'caps', 'capsule', 'capsules',
+    'caplet', 'caplets', 'softgel', 'softgels',
+}
+
+_BRACKETED = re.compile(r'[(\[]([^)\]]*)[)\]]?')
+_UNIT_SPACE = re.compile(r'(\d)\s+(mg|mcg|µg|g|iu|ml|%)(?![a-z])')
+_STRENGTH = re.compile(r'^\d[\d.,/]*(mg|mcg|µg|g|iu|ml|%)?$')
+_PUNCTUATION = re.compile(r'[^\w\s/.+%-]')
+# Common endings of generic (INN) drug names
+_INGREDIENT_SUFFIXES = (
+    'ine', 'ole', 'cin', 'rin', 'min', 'lin', 'tin', 'xin', 'ol', 'ide', 'ate', 'one', 'il',
+    'ium', 'ac', 'urea', 'pril', 'sartan', 'vir', 'mab', 'fen', 'pam', 'lam',
+)
+
+
+def _tokens(text):
+    text = _UNIT_SPACE.sub(r'\1\2', text)
+    text = _PUNCTUATION.sub(' ', text.replace('+', ' + '))
+    return [token for token in text.split() if token not in DOSAGE_FORMS]
+
+
+def _names_ingredient(text):
+    """Whether bracketed text reads as an active ingredient rather than a maker or form."""
+    words = _tokens(text)
+    if not any(not _STRENGTH.match(word) for word in words):
+        return False
+    return (re.search(r'[+,]', text) is not None
+            or any(_STRENGTH.match(word) or word.endswith(_INGREDIENT_SUFFIXES) for word in words))
+
+
+def group_key(drug):
+    """Grouping key for a drug: active ingredient, strength and unit chain."""
+    name = normalize_name(drug['name'])
+    bracketed = ' '.join(_BRACKETED.findall(name))
+    outside = _BRACKETED.sub(' ', name)
+
+    words = _tokens(bracketed) if _names_ingredient(bracketed) else _tokens(name)
+    ingredient = [token for token in words if not _STRENGTH.match(token)]
+    strengths = [token for token in words if _STRENGTH.match(token)]
+    if not strengths:
+        strengths = [token for token in _tokens(outside) if _STRENGTH.match(token)]
+
+    return f"{' '.join(ingredient)} {' '.join(strengths)}".strip() + f"|{' -> '.join(unit_chain(drug))}"
+
+
+def group_drugs(indexed_drugs):
+    """
+    Group (index, drug) pairs by group_key, in order of first appearance.
+
+    Returns:
+        list: (key, members) tuples; members[0] is the group's representative
+    """
+    groups = {}
+    for idx, drug in indexed_drugs:
+        groups.setdefault(group_key(drug), []).append((idx, drug))
+    return list(groups.items())
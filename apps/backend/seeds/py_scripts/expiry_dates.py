@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Shared expiry date normalization for the converter scripts.
+
+Stock sheets record expiry as MM/YY or MM/YYYY (e.g. "03/30", "5/26",
+"06/2026"). Each cell is parsed once into both the ISO date stored in MongoDB
+and an integer sort key, and results are memoized because expiry columns
+repeat the same few hundred values across thousands of rows.
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+
+# iso: "YYYY-MM-01" string; sort_key: months since year 0, for comparisons
+ExpiryDate = namedtuple('ExpiryDate', ['iso', 'sort_key'])
+
+EMPTY_VALUES = {'', '-', 'n/a'}
+
+CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def normalize_expiry(value):
+    """
+    Parse an MM/YY or MM/YYYY expiry cell.
+
+    Two-digit (and one-digit) years are taken as 20xx. Empty cells, "-",
+    "N/A", invalid months and anything else unparseable return None.
+
+    Args:
+        value: Raw cell value
+
+    Returns:
+        ExpiryDate or None
+    """
+    if value is None:
+        return None
+
+    value = str(value).strip()
+    if value.lower() in EMPTY_VALUES:
+        return None
+
+    parts = value.split('/')
+    if len(parts) != 2:
+        return None
+
+    month_str, year_str = parts[0].strip(), parts[1].strip()
+    # isdigit() also accepts superscripts and other digits int() rejects
+    if not month_str.isdecimal() or not year_str.isdecimal():
+        return None
+
+    month = int(month_str)
+    if month < 1 or month > 12:
+        return None
+
+    if len(year_str) <= 2:
+        year = 2000 + int(year_str)
+    elif len(year_str) == 4:
+        year = int(year_str)
+    else:
+        return None
+
+    return ExpiryDate(f"{year:04d}-{month:02d}-01", year * 12 + month - 1)
+
+
+def expiry_to_iso(value):
+    """Return the ISO date (YYYY-MM-DD) for an expiry cell, or None."""
+    parsed = normalize_expiry(value)
+    return parsed.iso if parsed else None
+
+
+def normalize_expiry_column(values):
+    """
+    Normalize a whole expiry column in one call.
+
+    Args:
+        values: Iterable of raw cell values
+
+    Returns:
+        list: ExpiryDate or None for each value, in input order
+    """
+    seen = {}
+    results = []
+    for value in values:
+        if value not in seen:
+            seen[value] = normalize_expiry(value)
+        results.append(seen[value])
+    return results
+
+
+def earliest_and_later(*values):
+    """
+    Determine earliest and later expiry dates from several expiry cells.
+
+    Returns:
+        tuple: (earliestExpiryDate, laterExpiryDates)
+        - earliestExpiryDate: ISO date string or None
+        - laterExpiryDates: sorted list of distinct later ISO dates
+    """
+    dates = [parsed for parsed in map(normalize_expiry, values) if parsed]
+    if not dates:
+        return None, []
+    if len(dates) > 1:
+        dates = sorted(set(dates), key=lambda parsed: parsed.sort_key)
+    return dates[0].iso, [parsed.iso for parsed in dates[1:]]
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Reading and writing inventory files for the seed scripts.
+
+Two formats are supported, picked by file extension:
+
+- .json: a single indented JSON array, as stored in seeds/inventory/
+- .jsonl / .ndjson: JSON Lines, one item object per line
+
+Either can be gzip or Zstandard compressed (drugs.json.gz, drugs.jsonl.zst);
+see compressed_io.py. Both are written and read one item at a time, so tools
+can stream through an inventory without loading all of it; JSON Lines files
+can also be tailed and appended to. JSON arrays can also be written compact (no indentation)
+for machine-consumed outputs.
+
+Items are encoded by a pluggable serializer: orjson when it is installed,
+the stdlib json module otherwise. Set SEED_JSON_SERIALIZER=stdlib (or call
+set_serializer) to choose one explicitly. Pretty output is byte-identical to
+json.dump(indent=2, ensure_ascii=False) with either backend for inventory
+data (strings, integers, booleans, null); floats are the one place orjson's
+formatting can differ (e.g. 1e16 vs 1e+16).
+"""
+
+import json
+import os
+import re
+from collections import namedtuple
+from pathlib import Path
+
+from compressed_io import format_suffixes, open_text, strip_compression
+from inventory_model import InventoryItem, to_plain
+
+# You'll need to install: pip install orjson (optional, faster output)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_LINES_SUFFIXES = {'.jsonl', '.ndjson'}
+
+# Characters read at a time when parsing a JSON array item by item
+ARRAY_READ_SIZE = 1 << 16
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# Opening, separator and closing text of a JSON array, pretty or compact
+ARRAY_PUNCTUATION = {
+    False: ('[\n', ',\n', '\n]'),
+    True: ('[', ',', ']'),
+}
+
+# name; pretty(obj) -> indent=2 text; compact(obj) -> single-line text
+Serializer = namedtuple('Serializer', ['name', 'pretty', 'compact'])
+
+
+def _stdlib_pretty(obj):
+    return json.dumps(obj, indent=2, ensure_ascii=False)
+
+
+def _stdlib_compact(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+def _orjson_pretty(obj):
+    try:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode('utf-8')
+    except TypeError:
+        # e.g. integers beyond 64 bits, which orjson refuses
+        return _stdlib_pretty(obj)
+
+
+def _orjson_compact(obj):
+    try:
+        return orjson.dumps(obj).decode('utf-8')
+    except TypeError:
+        return _stdlib_compact(obj)
+
+
+SERIALIZERS = {'stdlib': Serializer('stdlib', _stdlib_pretty, _stdlib_compact)}
+if orjson is not None:
+    SERIALIZERS['orjson'] = Serializer('orjson', _orjson_pretty, _orjson_compact)
+
+
+def get_serializer(name=None):
+    """
+    Return a serializer by name, or the best available one.
+
+    Raises:
+        ValueError: If the named backend is unknown or not installed
+    """
+    name = name or os.environ.get('SEED_JSON_SERIALIZER')
+    if not name:
+        return SERIALIZERS['orjson' if 'orjson' in SERIALIZERS else 'stdlib']
+    if name not in SERIALIZERS:
+        raise ValueError(f"JSON serializer '{name}' is not available (have: {', '.join(SERIALIZERS)})")
+    return SERIALIZERS[name]
+
+
+_serializer = get_serializer()
+
+
+def set_serializer(name):
+    """
+    Switch the serializer used by this process; returns the previous name.
+
+    Worker processes started with spawn pick the backend up from
+    SEED_JSON_SERIALIZER instead.
+    """
+    global _serializer
+    previous = _serializer.name
+    _serializer = get_serializer(name)
+    return previous
+
+
+def serializer_name():
+    """Name of the serializer currently in use."""
+    return _serializer.name
+
+
+def is_json_lines(path):
+    """Whether a path names a JSON Lines file, compressed or not."""
+    return strip_compression(path).suffix.lower() in JSON_LINES_SUFFIXES
+
+
+def temporary_path(path):
+    """
+    Sibling path for writing a file before renaming it into place.
+
+    The format and compression suffixes are kept (drugs.json.gz ->
+    drugs.tmp.json.gz), so the temporary file is written the same way.
+    """
+    path = Path(path)
+    suffixes = format_suffixes(path)
+    stem = path.name[:len(path.name) - len(suffixes)]
+    return path.with_name(f"{stem}.tmp{suffixes}")
+
+
+def format_item(item, compact=False):
+    """
+    Serialize one item exactly as json.dump(indent=2) would inside an array,
+    or on one line with no whitespace when compact.
+
+    InventoryItems are converted to plain dicts here, at the output boundary.
+    JSON escapes newlines inside strings, so every raw newline in the
+    output is structural and can safely be re-indented one level.
+    """
+    if compact:
+        return _serializer.compact(to_plain(item))
+    return '  ' + _serializer.pretty(to_plain(item)).replace('\n', '\n  ')
+
+
+def format_line(item):
+    """Serialize one item as a JSON Lines record, without the newline."""
+    return _serializer.compact(to_plain(item))
+
+
+def write_json_array(items, output_path, compact=False):
+    """
+    Write items to a JSON array file as they are produced.
+
+    The pretty output is byte-identical to json.dump(items, f, indent=2,
+    ensure_ascii=False), but only one item is held in memory at a time.
+
+    Args:
+        items: Iterable of items
+        output_path: Path to output JSON file
+        compact: Write without indentation or spaces
+
+    Returns:
+        Number of items written
+    """
+    opening, separator, closing = ARRAY_PUNCTUATION[compact]
+    count = 0
+    with open_text(output_path, 'w') as f:
+        for item in items:
+            f.write(opening if count == 0 else separator)
+            f.write(format_item(item, compact))
+            count += 1
+        f.write(closing if count else '[]')
+    return count
+
+
+def write_json_lines(items, output_path, append=False):
+    """
+    Write items to a JSON Lines file as they are produced.
+
+    Args:
+        items: Iterable of items
+        output_path: Path to output JSON Lines file
+        append: Add to the end of an existing file instead of replacing it
+
+    Returns:
+        Number of items written
+    """
+    count = 0
+    with open_text(output_path, 'a' if append else 'w') as f:
+        for item in items:
+            f.write(format_line(item))
+            f.write('\n')
+            count += 1
+    return count
+
+
+def write_items(items, output_path, json_lines=None, compact=False):
+    """
+    Write items in the format named by the output file's extension.
+
+    Args:
+        items: Iterable of items
+        output_path: Path to output file
+        json_lines: Force JSON Lines (True) or a JSON array (False), e.g. when
+            writing to a temporary file name
+        compact: Write JSON arrays without indentation
+
+    Returns:
+        Number of items written
+    """
+    if json_lines is None:
+        json_lines = is_json_lines(output_path)
+    if json_lines:
+        return write_json_lines(items, output_path)
+    return write_json_array(items, output_path, compact)
+
+
+def iter_json_array(f, read_size=ARRAY_READ_SIZE):
+    """
+    Yield the elements of the JSON array in a text file one at a time.
+
+    Accepts exactly what json.load would for an array, but only holds the
+    element being parsed (and the rest of the read buffer) in memory.
+
+    Raises:
+        json.JSONDecodeError: If the file is not a well-formed JSON array
+    """
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+    # 'open': before '['; 'first': after '['; 'value': after ','; 'next': after an element
+    state = 'open'
+    while True:
+        pos = _WHITESPACE.match(buf, pos).end()
+        if pos == len(buf):
+            if eof:
+                raise json.JSONDecodeError("Unexpected end of JSON array", buf, pos)
+            chunk = f.read(read_size)
+            buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+            continue
+
+        char = buf[pos]
+        if state == 'open':
+            if char != '[':
+                raise json.JSONDecodeError("Expecting a JSON array", buf, pos)
+            pos += 1
+            state = 'first'
+        elif state in ('first', 'next') and char == ']':
+            rest = buf[pos + 1:] + f.read()
+            if rest.strip(' \t\n\r'):
+                raise json.JSONDecodeError("Extra data after JSON array", rest, 0)
+            return
+        elif state == 'next':
+            if char != ',':
+                raise json.JSONDecodeError("Expecting ',' delimiter", buf, pos)
+            pos += 1
+            state = 'value'
+        else:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+                # A number or literal at the end of the buffer may be cut short
+                complete = eof or (end < len(buf) and buf[end] in ' \t\n\r,]')
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+            if not complete:
+                # Read at least as much again, so a large element is not re-parsed many times
+                chunk = f.read(max(read_size, len(buf) - pos))
+                buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+                continue
+            yield value
+            pos = end
+            state = 'next'
+
+
+def iter_records(path):
+    """
+    Yield the plain item dicts stored in an inventory file, one at a time.
+
+    JSON arrays are parsed element by element and JSON Lines files one line
+    at a time; blank lines are skipped. Compressed files are decompressed
+    while they are parsed.
+    """
+    with open_text(path) as f:
+        if not is_json_lines(path):
+            yield from iter_json_array(f)
+            return
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON Lines record: {e}") from e
+
+
+def iter_items(path):
+    """Yield the items in an inventory file as compact InventoryItems."""
+    for data in iter_records(path):
+        yield InventoryItem.from_dict(data)
+
+
+def load_items(path):
+    """
+    Load an inventory file as compact items.
+
+    Args:
+        path: Path to an inventory .json, .jsonl or .ndjson file, optionally
+            .gz or .zst compressed
+
+    Returns:
+        list: InventoryItem objects, in file order
+    """
+    return list(iter_items(path))
+
+
+def save_items(items, path):
+    """Write items back out in the format named by the file's extension."""
+    return write_items(items, path)
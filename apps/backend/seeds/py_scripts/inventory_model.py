@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Compact in-memory model for inventory items in the seed scripts.
+
+Items, units, stock quantities and packaging levels are __slots__ objects
+instead of dicts, and the strings that repeat on every item (unit names,
+plurals, categories, expiry dates, key layouts) are interned, so a large
+inventory held in memory costs a fraction of the equivalent nested dicts.
+
+The objects support the dict-style access the scripts already use
+(item['units'], unit['name'], item.get(...), 'key' in item, item[key] = ...),
+and are turned back into the inventory JSON shape only at the output
+boundary with to_dict(), keeping key order and any keys the model does not
+know about. Reading and writing files lives in inventory_io.py.
+"""
+
+import sys
+from operator import attrgetter
+
+# Inventory JSON key -> InventoryItem slot
+ITEM_FIELDS = {
+    'name': 'name',
+    'category': 'category',
+    'units': 'units',
+    'quantities': 'quantities',
+    'earliestExpiryDate': 'earliest_expiry_date',
+    'laterExpiryDates': 'later_expiry_dates',
+    'packagingStructure': 'packaging_structure',
+}
+
+# Key order tuples shared by every item with the same layout
+_layouts = {}
+
+
+def intern_layout(keys):
+    """Return the shared tuple for an item key order."""
+    keys = tuple(keys)
+    return _layouts.setdefault(keys, keys)
+
+
+def intern_str(value):
+    """Intern strings that repeat across items; pass anything else through."""
+    return sys.intern(value) if type(value) is str else value
+
+
+class Record:
+    """Base for the small fixed-shape records nested inside an item."""
+
+    __slots__ = ()
+    FIELDS = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._values = attrgetter(*cls.FIELDS)
+
+    @classmethod
+    def coerce(cls, value):
+        """
+        Return a record for a dict with exactly this record's keys.
+
+        Records pass through, and anything else (extra keys, other key order)
+        is kept as-is so it round-trips unchanged. Strings read from JSON are
+        interned here; the literals converters pass in already are.
+        """
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, dict) and tuple(value) == cls.FIELDS:
+            return cls(*map(intern_str, value.values()))
+        return value
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def to_dict(self):
+        return dict(zip(self.FIELDS, self._values(self)))
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __repr__(self):
+        values = ', '.join(f"{field}={getattr(self, field)!r}" for field in self.FIELDS)
+        return f"{type(self).__name__}({values})"
+
+
+class Unit(Record):
+    """One unit in an item's unit chain, e.g. Pack -> Card -> Tablet."""
+
+    __slots__ = FIELDS = ('name', 'plural', 'quantity')
+
+    def __init__(self, name, plural, quantity):
+        self.name = name
+        self.plural = plural
+        self.quantity = quantity
+
+
+class Quantity(Record):
+    """Stock held in one unit."""
+
+    __slots__ = FIELDS = ('name', 'quantity')
+
+    def __init__(self, name, quantity):
+        self.name = name
+        self.quantity = quantity
+
+
+class PackagingLevel(Record):
+    """How many of one unit fit in the next larger unit."""
+
+    __slots__ = FIELDS = ('unit', 'contains', 'of')
+
+    def __init__(self, unit, contains, of):
+        self.unit = unit
+        self.contains = contains
+        self.of = of
+
+
+# Item keys holding lists of records
+RECORD_LISTS = {
+    'units': Unit,
+    'quantities': Quantity,
+    'packagingStructure': PackagingLevel,
+}
+
+
+def _compact(key, value):
+    """Convert one item value to its compact form."""
+    record = RECORD_LISTS.get(key)
+    if record is not None and isinstance(value, list):
+        return [record.coerce(entry) for entry in value]
+    if key == 'laterExpiryDates' and isinstance(value, list):
+        return [intern_str(date) for date in value]
+    if key in ('category', 'earliestExpiryDate'):
+        return intern_str(value)
+    return value
+
+
+class InventoryItem:
+    """
+    One inventory item, created with the inventory JSON keys in output order:
+
+        InventoryItem(name=..., category=..., units=[Unit(...)], laterExpiryDates=[])
+
+    Values are stored as given, so callers pass Unit records and strings that
+    are already shared (literals, cached expiry dates). from_dict() and
+    item[key] = value convert plain JSON values. Keys outside ITEM_FIELDS are
+    kept in a side dict.
+    """
+
+    __slots__ = tuple(ITEM_FIELDS.values()) + ('layout', 'extra')
+
+    def __init__(self, **fields):
+        self.layout = intern_layout(fields)
+        self.extra = None
+        for key, value in fields.items():
+            attr = ITEM_FIELDS.get(key)
+            if attr is not None:
+                setattr(self, attr, value)
+            else:
+                self._store(key, value)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build an item from a parsed inventory JSON object."""
+        return cls(**{key: _compact(key, value) for key, value in data.items()})
+
+    def _store(self, key, value):
+        attr = ITEM_FIELDS.get(key)
+        if attr is not None:
+            setattr(self, attr, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __getitem__(self, key):
+        if key not in self.layout:
+            raise KeyError(key)
+        attr = ITEM_FIELDS.get(key)
+        return getattr(self, attr) if attr is not None else self.extra[key]
+
+    def __setitem__(self, key, value):
+        self._store(key, _compact(key, value))
+        if key not in self.layout:
+            self.layout = intern_layout(self.layout + (key,))
+
+    def __delitem__(self, key):
+        if key not in self.layout:
+            raise KeyError(key)
+        attr = ITEM_FIELDS.get(key)
+        if attr is not None:
+            delattr(self, attr)
+        else:
+            del self.extra[key]
+        self.layout = intern_layout(k for k in self.layout if k != key)
+
+    def __contains__(self, key):
+        return key in self.layout
+
+    def __iter__(self):
+        return iter(self.layout)
+
+    def __len__(self):
+        return len(self.layout)
+
+    def keys(self):
+        return self.layout
+
+    def get(self, key, default=None):
+        return self[key] if key in self.layout else default
+
+    def to_dict(self):
+        """Return the inventory JSON object, in the item's key order."""
+        result = {}
+        for key in self.layout:
+            attr = ITEM_FIELDS.get(key)
+            value = getattr(self, attr) if attr is not None else self.extra[key]
+            if key in RECORD_LISTS and type(value) is list:
+                value = [entry.to_dict() if isinstance(entry, Record) else entry for entry in value]
+            elif type(value) is list:
+                value = list(value)
+            result[key] = value
+        return result
+
+    def __eq__(self, other):
+        if isinstance(other, InventoryItem):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __repr__(self):
+        return f"InventoryItem({self.to_dict()!r})"
+
+
+def to_plain(item):
+    """Return the JSON-ready form of an item (dicts pass through)."""
+    return item.to_dict() if isinstance(item, InventoryItem) else item
+
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Binary snapshots of inventory files for fast, lazy loading.
+
+A snapshot (<inventory file>.snap, next to the source) holds the same items
+as an inventory .json/.jsonl file in a compact binary layout:
+
+- a string table: every distinct string (names, unit names, plurals,
+  categories, expiry dates, key layouts) stored once in a UTF-8 heap
+- a fixed-width record per item pointing into the string table and into
+- fixed-width unit, stock quantity, later expiry date and packaging level
+  arrays (string indices and int64 quantities)
+
+The file is read through mmap and items are decoded only when accessed, so
+opening a snapshot costs a header read regardless of inventory size. The
+header records the source file's size, mtime and hash; open_snapshot()
+rebuilds the snapshot whenever the source has changed.
+
+Items that do not fit the fixed layout (unknown keys, non-integer quantities,
+unusual unit shapes) are stored as JSON text in the string table, so every
+item round-trips exactly.
+
+Usage: python inventory_snapshot.py <inventory_file> [<inventory_file> ...]
+Example: python inventory_snapshot.py apps/backend/seeds/inventory/drugs.json
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from pathlib import Path
+
+from inventory_io import iter_records
+from inventory_model import (
+    ITEM_FIELDS,
+    InventoryItem,
+    PackagingLevel,
+    Quantity,
+    RECORD_LISTS,
+    Unit,
+)
+
+SNAPSHOT_SUFFIX = '.snap'
+MAGIC = b'INVSNAP\x00'
+VERSION = 1
+
+# Marks an absent string / a natively encoded item
+NO_INDEX = 0xFFFFFFFF
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+
+# magic, version, item count, source size, source mtime_ns, source hash,
+# string count, then the byte offsets of each section
+HEADER = struct.Struct('<8sIIQq32sI7Q')
+STRING_OFFSET = struct.Struct('<I')
+# json fallback, layout, name, category, earliest expiry,
+# then (start, count) into the units, quantities, dates and packaging arrays
+ITEM = struct.Struct('<IIIIIIHIHIHIH')
+UNIT = struct.Struct('<IIq')
+QUANTITY = struct.Struct('<Iq')
+DATE = struct.Struct('<I')
+PACKAGING = struct.Struct('<IqI')
+
+MAX_COUNT = 0xFFFF
+
+
+def snapshot_path_for(source_path):
+    """Return the default snapshot path for an inventory file."""
+    source_path = Path(source_path)
+    return source_path.with_name(source_path.name + SNAPSHOT_SUFFIX)
+
+
+class _SnapshotBuilder:
+    """Accumulates the sections of a snapshot while items are added."""
+
+    def __init__(self):
+        self.strings = {}
+        self.layouts = {}
+        self.items = bytearray()
+        self.units = bytearray()
+        self.quantities = bytearray()
+        self.dates = bytearray()
+        self.packaging = bytearray()
+        self.unit_count = 0
+        self.quantity_count = 0
+        self.date_count = 0
+        self.packaging_count = 0
+        self.item_count = 0
+
+    def string(self, value):
+        index = self.strings.get(value)
+        if index is None:
+            index = self.strings[value] = len(self.strings)
+        return index
+
+    def layout(self, keys):
+        index = self.layouts.get(keys)
+        if index is None:
+            index = self.layouts[keys] = len(self.layouts)
+        return index
+
+    def add(self, data):
+        """Add one plain item dict, natively if it fits the fixed layout."""
+        record = self._encode(data) if isinstance(data, dict) else None
+        if record is None:
+            text = json.dumps(data, ensure_ascii=False)
+            record = (self.string(text),) + (NO_INDEX,) * 4 + (0, 0) * 4
+        self.items += ITEM.pack(*record)
+        self.item_count += 1
+
+    def _encode(self, data):
+        keys = tuple(data)
+        if any(key not in ITEM_FIELDS for key in keys):
+            return None
+
+        strings = {}
+        for key in ('name', 'category', 'earliestExpiryDate'):
+            if key in data:
+                if not isinstance(data[key], str):
+                    return None
+                strings[key] = data[key]
+
+        lists = {}
+        for key, record in RECORD_LISTS.items():
+            if key in data:
+                entries = data[key]
+                if not isinstance(entries, list) or len(entries) > MAX_COUNT:
+                    return None
+                if not all(_fits(entry, record) for entry in entries):
+                    return None
+                lists[key] = entries
+
+        dates = data.get('laterExpiryDates', [])
+        if 'laterExpiryDates' in data:
+            if not isinstance(dates, list) or len(dates) > MAX_COUNT:
+                return None
+            if not all(isinstance(date, str) for date in dates):
+                return None
+
+        # The item fits; append its array entries
+        units_start = self.unit_count
+        for unit in lists.get('units', []):
+            self.units += UNIT.pack(self.string(unit['name']), self.string(unit['plural']), unit['quantity'])
+        self.unit_count += len(lists.get('units', []))
+
+        quantities_start = self.quantity_count
+        for quantity in lists.get('quantities', []):
+            self.quantities += QUANTITY.pack(self.string(quantity['name']), quantity['quantity'])
+        self.quantity_count += len(lists.get('quantities', []))
+
+        dates_start = self.date_count
+        for date in dates:
+            self.dates += DATE.pack(self.string(date))
+        self.date_count += len(dates)
+
+        packaging_start = self.packaging_count
+        for level in lists.get('packagingStructure', []):
+            self.packaging += PACKAGING.pack(self.string(level['unit']), level['contains'], self.string(level['of']))
+        self.packaging_count += len(lists.get('packagingStructure', []))
+
+        def string_or_none(key):
+            return self.string(strings[key]) if key in strings else NO_INDEX
+
+        return (
+            NO_INDEX,
+            self.layout(keys),
+            string_or_none('name'),
+            string_or_none('category'),
+            string_or_none('earliestExpiryDate'),
+            units_start, len(lists.get('units', [])),
+            quantities_start, len(lists.get('quantities', [])),
+            dates_start, len(dates),
+            packaging_start, len(lists.get('packagingStructure', [])),
+        )
+
+    def write(self, f, source_stat, source_hash):
+        layouts_text = json.dumps([list(keys) for keys in self.layouts], ensure_ascii=False)
+        layouts_index = self.string(layouts_text)
+
+        heap = bytearray()
+        offsets = bytearray()
+        for text in self.strings:
+            offsets += STRING_OFFSET.pack(len(heap))
+            heap += text.encode('utf-8')
+        offsets += STRING_OFFSET.pack(len(heap))
+
+        sections = [offsets, heap, self.items, self.units, self.quantities, self.dates, self.packaging]
+        positions = []
+        position = HEADER.size
+        for section in sections:
+            positions.append(position)
+            position += len(section)
+
+        f.write(HEADER.pack(
+            MAGIC, VERSION, self.item_count,
+            source_stat.st_size, source_stat.st_mtime_ns, source_hash.encode('ascii'),
+            len(self.strings), *positions
+        ))
+        for section in sections:
+            f.write(section)
+        return layouts_index
+
+
+def _fits(entry, record):
+    """Whether a record-list entry can be stored in its fixed-width array."""
+    if not isinstance(entry, dict) or tuple(entry) != record.FIELDS:
+        return False
+    for field, value in entry.items():
+        if field in ('quantity', 'contains'):
+            if type(value) is not int or not INT64_MIN <= value <= INT64_MAX:
+                return False
+        elif not isinstance(value, str):
+            return False
+    return True
+
+
+def build_snapshot(source_path, snapshot_path=None):
+    """
+    Build a snapshot of an inventory file.
+
+    The snapshot is written to a temporary file and moved into place, so
+    readers never see a partial snapshot.
+
+    Returns:
+        Path: The snapshot path
+    """
+    # Imported here so opening a current snapshot stays cheap
+    from conversion_manifest import hash_file
+
+    source_path = Path(source_path)
+    snapshot_path = Path(snapshot_path) if snapshot_path else snapshot_path_for(source_path)
+
+    source_stat = source_path.stat()
+    source_hash = hash_file(source_path)
+
+    builder = _SnapshotBuilder()
+    for data in iter_records(source_path):
+        builder.add(data)
+
+    tmp_path = snapshot_path.with_name(snapshot_path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        layouts_index = builder.write(f, source_stat, source_hash)
+        # The layouts string index goes last so readers can find it
+        f.write(STRING_OFFSET.pack(layouts_index))
+    os.replace(tmp_path, snapshot_path)
+    return snapshot_path
+
+
+class InventorySnapshot:
+    """
+    Read-only, lazily decoded view of a snapshot file.
+
+    Supports len(), indexing, slicing and iteration; each access decodes a
+    fresh InventoryItem straight from the mapped file.
+    """
+
+    def __init__(self, snapshot_path):
+        self.path = Path(snapshot_path)
+        with open(self.path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, self.item_count, self.source_size, self.source_mtime_ns,
+         source_hash, self.string_count, self._offsets_pos, self._heap_pos, self._items_pos,
+         self._units_pos, self._quantities_pos, self._dates_pos,
+         self._packaging_pos) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"{self.path} is not a version {VERSION} inventory snapshot")
+        self.source_hash = source_hash.decode('ascii')
+
+        self._strings = {}
+        layouts_index, = STRING_OFFSET.unpack_from(self._map, len(self._map) - STRING_OFFSET.size)
+        self._layouts = [tuple(keys) for keys in json.loads(self.string(layouts_index))]
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def string(self, index):
+        """Decode one string from the string table (cached)."""
+        value = self._strings.get(index)
+        if value is None:
+            start, = STRING_OFFSET.unpack_from(self._map, self._offsets_pos + index * STRING_OFFSET.size)
+            end, = STRING_OFFSET.unpack_from(self._map, self._offsets_pos + (index + 1) * STRING_OFFSET.size)
+            value = self._map[self._heap_pos + start:self._heap_pos + end].decode('utf-8')
+            # Repeated strings come back as the same object
+            value = self._strings[index] = sys.intern(value) if len(value) < 64 else value
+        return value
+
+    def __len__(self):
+        return self.item_count
+
+    def __iter__(self):
+        for i in range(self.item_count):
+            yield self._decode(i)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._decode(i) for i in range(*index.indices(self.item_count))]
+        if index < 0:
+            index += self.item_count
+        if not 0 <= index < self.item_count:
+            raise IndexError('snapshot index out of range')
+        return self._decode(index)
+
+    def name(self, index):
+        """Return just an item's name, without decoding the rest of it."""
+        record = ITEM.unpack_from(self._map, self._items_pos + index * ITEM.size)
+        if record[0] != NO_INDEX:
+            return json.loads(self.string(record[0])).get('name')
+        return self.string(record[2]) if record[2] != NO_INDEX else None
+
+    def _decode(self, index):
+        (json_index, layout, name, category, earliest,
+         units_start, units_count, quantities_start, quantities_count,
+         dates_start, dates_count, packaging_start, packaging_count) = ITEM.unpack_from(
+            self._map, self._items_pos + index * ITEM.size)
+
+        if json_index != NO_INDEX:
+            return InventoryItem.from_dict(json.loads(self.string(json_index)))
+
+        string = self.string
+        buf = self._map
+        values = {}
+        for key in self._layouts[layout]:
+            if key == 'name':
+                values[key] = string(name)
+            elif key == 'category':
+                values[key] = string(category)
+            elif key == 'earliestExpiryDate':
+                values[key] = string(earliest)
+            elif key == 'units':
+                values[key] = [
+                    Unit(string(unit_name), string(plural), quantity)
+                    for unit_name, plural, quantity in UNIT.iter_unpack(
+                        buf[self._units_pos + units_start * UNIT.size:
+                            self._units_pos + (units_start + units_count) * UNIT.size])
+                ]
+            elif key == 'quantities':
+                values[key] = [
+                    Quantity(string(unit_name), quantity)
+                    for unit_name, quantity in QUANTITY.iter_unpack(
+                        buf[self._quantities_pos + quantities_start * QUANTITY.size:
+                            self._quantities_pos + (quantities_start + quantities_count) * QUANTITY.size])
+                ]
+            elif key == 'laterExpiryDates':
+                values[key] = [
+                    string(date)
+                    for date, in DATE.iter_unpack(
+                        buf[self._dates_pos + dates_start * DATE.size:
+                            self._dates_pos + (dates_start + dates_count) * DATE.size])
+                ]
+            elif key == 'packagingStructure':
+                values[key] = [
+                    PackagingLevel(string(unit), contains, string(of))
+                    for unit, contains, of in PACKAGING.iter_unpack(
+                        buf[self._packaging_pos + packaging_start * PACKAGING.size:
+                            self._packaging_pos + (packaging_start + packaging_count) * PACKAGING.size])
+                ]
+        return InventoryItem(**values)
+
+
+def is_current(snapshot, source_path):
+    """
+    Whether an open snapshot still matches its source file.
+
+    A matching size and mtime is trusted; otherwise the source is hashed, so
+    touching a file without changing it does not force a rebuild.
+    """
+    stat = Path(source_path).stat()
+    if stat.st_size == snapshot.source_size and stat.st_mtime_ns == snapshot.source_mtime_ns:
+        return True
+
+    # Imported here so opening a current snapshot stays cheap
+    from conversion_manifest import hash_file
+    return stat.st_size == snapshot.source_size and hash_file(source_path) == snapshot.source_hash
+
+
+def open_snapshot(source_path, snapshot_path=None):
+    """
+    Open the snapshot of an inventory file, (re)building it if needed.
+
+    Args:
+        source_path: Inventory .json/.jsonl file the snapshot mirrors
+        snapshot_path: Snapshot location (defaults to <source>.snap)
+
+    Returns:
+        InventorySnapshot
+    """
+    snapshot_path = Path(snapshot_path) if snapshot_path else snapshot_path_for(source_path)
+
+    if snapshot_path.exists():
+        try:
+            snapshot = InventorySnapshot(snapshot_path)
+        except (ValueError, struct.error):
+            snapshot = None
+        if snapshot is not None:
+            if is_current(snapshot, source_path):
+                return snapshot
+            snapshot.close()
+
+    build_snapshot(source_path, snapshot_path)
+    return InventorySnapshot(snapshot_path)
+
+
+def load_snapshot_items(source_path):
+    """Load all items of an inventory file through its snapshot."""
+    with open_snapshot(source_path) as snapshot:
+        return list(snapshot)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    for source_path in sys.argv[1:]:
+        start = time.perf_counter()
+        path = build_snapshot(source_path)
+        built = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with open_snapshot(source_path) as snapshot:
+            count = len(snapshot)
+        opened = time.perf_counter() - start
+
+        print(f"✓ {path}: {count} items, {path.stat().st_size} bytes "
+              f"(built in {built * 1000:.1f} ms, opens in {opened * 1000:.2f} ms)")
+
+
+if __name__ == '__main__':
+    main()
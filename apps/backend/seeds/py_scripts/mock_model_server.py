@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI chat-completions API, for testing and
+benchmarking add_packaging_structure.py without an API key or spend.
+
+POST /v1/chat/completions reads the drugs out of a packaging prompt (the
+verbose "N. name / Units: A -> B -> C" lines or the compact
+"N. name: A -> B -> C" ones) and answers with a plausible packaging
+structure for each, e.g. 10 Cards per Pack and 10 Tablets per Card, in the
+reply format the prompt asked for. Answers depend only on the drug name and
+units, so reruns agree.
+
+The server can be made to misbehave in the ways the real API does:
+
+- latency: a fixed delay per request plus a delay per drug, with jitter
+- error rate: 503 server errors; rate-limit rate: 429 with Retry-After
+- drop rate: leave one drug out of a reply
+- max_tokens: replies longer than the request's max_tokens are cut off
+  with finish_reason "length"
+- shapes: the reply is a bare array, {"drugs": [...]}, {"items": [...]} or
+  a fenced ```json block, picked at random from the allowed shapes
+
+GET /stats returns request, error and in-flight counts.
+
+Usage: python mock_model_server.py [--port 8765] [--latency 0.2] [--error-rate 0.05]
+Example: python mock_model_server.py --port 8765 --shapes drugs fenced --drop-rate 0.1
+         OPENAI_API_KEY=mock python add_packaging_structure.py --base-url http://127.0.0.1:8765/v1
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SHAPES = ['array', 'drugs', 'items', 'fenced']
+
+# How many of the smaller unit usually go in the larger one; first is most common
+CONTAINS = {
+    ('Carton', 'Pack'): [10, 5, 20],
+    ('Pack', 'Card'): [10, 3, 5, 2],
+    ('Pack', 'Tablet'): [30, 28, 100],
+    ('Pack', 'Capsule'): [30, 28, 100],
+    ('Card', 'Tablet'): [10, 14, 6, 4],
+    ('Card', 'Capsule'): [10, 14, 6],
+    ('Container', 'Tablet'): [100, 500, 1000, 30],
+    ('Container', 'Capsule'): [100, 500, 30],
+}
+DEFAULT_CONTAINS = [10, 5, 20]
+
+# Reply tokens are estimated from the reply's length, like prompt tokens
+CHARS_PER_TOKEN = 4
+
+_DRUG_LINE = re.compile(r'^(\d+)\. (.*)\n   Units: (.*)$', re.M)
+_COMPACT_DRUG_LINE = re.compile(r'^(\d+)\. (.*): (.*)$', re.M)
+
+
+def prompt_drugs(prompt):
+    """(name, units) for each drug in a packaging prompt, and whether the prompt is compact."""
+    lines = _DRUG_LINE.findall(prompt)
+    if lines:
+        return [(name, units.split(' -> ')) for _, name, units in lines], False
+    lines = _COMPACT_DRUG_LINE.findall(prompt)
+    return [(name, units.split(' -> ')) for _, name, units in lines], True
+
+
+def packaging_structure(name, units):
+    """A plausible structure for a drug, the same every time for the same drug."""
+    seed = int.from_bytes(hashlib.sha1(f"{name}|{' -> '.join(units)}".encode('utf-8')).digest()[:8], 'big')
+    choose = random.Random(seed)
+    structure = []
+    for larger, smaller in zip(units, units[1:]):
+        options = CONTAINS.get((larger, smaller), DEFAULT_CONTAINS)
+        # Mostly the usual count, sometimes one of the alternatives
+        contains = options[0] if choose.random() < 0.7 else choose.choice(options)
+        structure.append({'unit': larger, 'contains': contains, 'of': smaller})
+    return structure
+
+
+class MockConfig:
+    """How the mock server behaves; shared by all its request handlers."""
+
+    def __init__(self, latency=0.2, latency_per_drug=0.01, jitter=0.5, error_rate=0.0,
+                 rate_limit_rate=0.0, retry_after=1, drop_rate=0.0, shapes=None, seed=None):
+        self.latency = latency
+        self.latency_per_drug = latency_per_drug
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.drop_rate = drop_rate
+        self.shapes = shapes or ['drugs']
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'errors': 0, 'rate_limited': 0, 'truncated': 0,
+                      'dropped': 0, 'drugs': 0, 'in_flight': 0, 'peak_in_flight': 0}
+
+    def roll(self):
+        with self.lock:
+            return self.random.random()
+
+    def count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+            if key == 'in_flight':
+                self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self.stats['in_flight'])
+
+
+def format_reply(results, shape):
+    """The reply text for a list of result objects in one of SHAPES."""
+    if shape == 'array':
+        return json.dumps(results, indent=2)
+    if shape == 'items':
+        return json.dumps({'items': results}, indent=2)
+    if shape == 'fenced':
+        return f"Here is the packaging structure:\n\n```json\n{json.dumps(results, indent=2)}\n```"
+    return json.dumps({'drugs': results}, indent=2)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip('/') in ('', '/stats'):
+            with self.config.lock:
+                self.send_json(200, dict(self.config.stats))
+        else:
+            self.send_json(404, {'error': {'message': f"Unknown path {self.path}", 'type': 'invalid_request_error'}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            request = json.loads(self.rfile.read(length))
+        except ValueError:
+            self.send_json(400, {'error': {'message': 'Request body is not JSON', 'type': 'invalid_request_error'}})
+            return
+        if not self.path.endswith('/chat/completions'):
+            self.send_json(404, {'error': {'message': f"Unknown path {self.path}", 'type': 'invalid_request_error'}})
+            return
+
+        config = self.config
+        config.count('requests')
+        config.count('in_flight')
+        try:
+            self.complete(request)
+        finally:
+            config.count('in_flight', -1)
+
+    def complete(self, request):
+        config = self.config
+        prompt = request['messages'][-1]['content']
+        drugs, compact = prompt_drugs(prompt)
+
+        delay = config.latency + config.latency_per_drug * len(drugs)
+        time.sleep(delay * (1 + config.jitter * (2 * config.roll() - 1)))
+
+        if config.roll() < config.rate_limit_rate:
+            config.count('rate_limited')
+            self.send_json(429, {'error': {'message': 'Rate limit reached', 'type': 'rate_limit_error'}},
+                           {'Retry-After': str(config.retry_after)})
+            return
+        if config.roll() < config.error_rate:
+            config.count('errors')
+            self.send_json(503, {'error': {'message': 'The server is overloaded', 'type': 'server_error'}})
+            return
+
+        if compact:
+            results = [
+                {'n': i + 1, 'contains': [level['contains'] for level in packaging_structure(name, units)]}
+                for i, (name, units) in enumerate(drugs)
+            ]
+        else:
+            results = [
+                {'index': i, 'name': name, 'packagingStructure': packaging_structure(name, units)}
+                for i, (name, units) in enumerate(drugs)
+            ]
+        if len(results) > 1 and config.roll() < config.drop_rate:
+            config.count('dropped')
+            with config.lock:
+                results.pop(config.random.randrange(len(results)))
+        config.count('drugs', len(results))
+
+        with config.lock:
+            shape = config.random.choice(config.shapes)
+        content = format_reply(results, shape)
+
+        prompt_tokens = len(prompt) // CHARS_PER_TOKEN + 1
+        completion_tokens = len(content) // CHARS_PER_TOKEN + 1
+        finish_reason = 'stop'
+        max_tokens = request.get('max_tokens')
+        if max_tokens and completion_tokens > max_tokens:
+            # Cut the reply off part way, as the real API does
+            config.count('truncated')
+            content = content[:len(content) * max_tokens // completion_tokens]
+            completion_tokens = max_tokens
+            finish_reason = 'length'
+
+        self.send_json(200, {
+            'id': f"chatcmpl-mock-{config.stats['requests']}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'mock'),
+            'choices': [{
+                'index': 0,
+                'finish_reason': finish_reason,
+                'message': {'role': 'assistant', 'content': content},
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+            },
+        })
+
+
+def make_server(config, host='127.0.0.1', port=0):
+    """A mock server bound to host:port (0 picks a free port); call serve_forever() to run it."""
+    server = ThreadingHTTPServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.config = config
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the chat-completions API for packaging prompts")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765,
+                        help="Port to listen on; 0 picks a free one (default: 8765)")
+    parser.add_argument('--latency', type=float, default=0.2,
+                        help="Seconds per request before the per-drug delay (default: 0.2)")
+    parser.add_argument('--latency-per-drug', type=float, default=0.01,
+                        help="Extra seconds per drug in the prompt (default: 0.01)")
+    parser.add_argument('--jitter', type=float, default=0.5,
+                        help="Random +/- fraction applied to the delay (default: 0.5)")
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help="Fraction of requests answered with 503 (default: 0)")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0,
+                        help="Fraction of requests answered with 429 (default: 0)")
+    parser.add_argument('--retry-after', type=int, default=1,
+                        help="Retry-After seconds sent with 429s (default: 1)")
+    parser.add_argument('--drop-rate', type=float, default=0.0,
+                        help="Fraction of replies with one drug left out (default: 0)")
+    parser.add_argument('--shapes', nargs='+', choices=SHAPES, default=['drugs'],
+                        help="Reply shapes to pick from (default: drugs)")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="Seed for the random failures and shapes")
+    args = parser.parse_args()
+
+    config = MockConfig(args.latency, args.latency_per_drug, args.jitter, args.error_rate,
+                        args.rate_limit_rate, args.retry_after, args.drop_rate, args.shapes, args.seed)
+    server = make_server(config, args.host, args.port)
+    host, port = server.server_address[:2]
+    # The benchmark reads this line to find the port
+    print(f"Mock model server listening on http://{host}:{port}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
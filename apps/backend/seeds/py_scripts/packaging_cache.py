@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Persistent cache of packaging structures returned by the model.
+
+The same drug turns up again and again across stock sheets, branches and
+reruns with the same unit chain, e.g. Co-Trimoxazole as Pack -> Card ->
+Tablet. Each answer is stored in a small SQLite file keyed by the
+normalized drug name plus that unit chain, so later runs can apply it
+without another model call. Entries can be evicted by age and by count
+(least recently used first).
+"""
+
+import json
+import re
+import sqlite3
+import time
+from pathlib import Path
+
+DEFAULT_CACHE_NAME = 'packaging_cache.sqlite'
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_name(name):
+    """Case- and whitespace-insensitive form of a drug name."""
+    return _WHITESPACE.sub(' ', str(name)).strip().casefold()
+
+
+def unit_chain(drug):
+    """The drug's unit names, largest first, as shown in the prompt."""
+    return [unit['name'] for unit in drug.get('units', [])]
+
+
+def cache_key(drug):
+    """Cache key for a drug: normalized name plus its unit chain."""
+    return f"{normalize_name(drug['name'])}|{' -> '.join(unit_chain(drug))}"
+
+
+def _plain(structure):
+    return [level.to_dict() if hasattr(level, 'to_dict') else level for level in structure]
+
+
+class PackagingCache:
+    """
+    SQLite-backed map from cache_key(drug) to its packagingStructure.
+
+    Lookups and hits are counted per instance for hit-rate reporting.
+    """
+
+    def __init__(self, path, max_entries=None, max_age_days=None):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.lookups = 0
+        self.hits = 0
+        self._db = sqlite3.connect(str(self.path))
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS packaging ("
+            " key TEXT PRIMARY KEY,"
+            " structure TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS packaging_last_used ON packaging (last_used)")
+        self._db.commit()
+        self.evict()
+
+    def get(self, drug):
+        """Return the cached packagingStructure for a drug, or None."""
+        self.lookups += 1
+        key = cache_key(drug)
+        row = self._db.execute("SELECT structure FROM packaging WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self.hits += 1
+        self._db.execute("UPDATE packaging SET last_used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def peek(self, drug):
+        """Whether a drug is cached, without counting a lookup or touching its entry."""
+        row = self._db.execute("SELECT 1 FROM packaging WHERE key = ?", (cache_key(drug),)).fetchone()
+        return row is not None
+
+    def put(self, drug, structure):
+        """Store the packagingStructure the model returned for a drug."""
+        now = time.time()
+        self._db.execute(
+            "INSERT OR REPLACE INTO packaging (key, structure, created, last_used) VALUES (?, ?, ?, ?)",
+            (cache_key(drug), json.dumps(_plain(structure), ensure_ascii=False), now, now)
+        )
+
+    def commit(self):
+        self._db.commit()
+
+    def evict(self):
+        """
+        Drop entries older than max_age_days, then the least recently used
+        beyond max_entries.
+
+        Returns:
+            int: Number of entries removed
+        """
+        removed = 0
+        if self.max_age_days is not None:
+            cutoff = time.time() - self.max_age_days * 86400
+            removed += self._db.execute("DELETE FROM packaging WHERE created < ?", (cutoff,)).rowcount
+        if self.max_entries is not None:
+            removed += self._db.execute(
+                "DELETE FROM packaging WHERE key IN ("
+                " SELECT key FROM packaging ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+        self._db.commit()
+        return removed
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM packaging").fetchone()[0]
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def report(self):
+        """One-line summary of this run's lookups."""
+        return (f"Cache: {self.hits}/{self.lookups} hits ({self.hit_rate:.1%}), "
+                f"{len(self)} entries in {self.path}")
+
+    def close(self):
+        self.evict()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
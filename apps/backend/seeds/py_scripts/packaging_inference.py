@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Rules-first packaging-structure inference, with a confidence per result.
+
+Two deterministic inferencers already exist; they are tried in order before
+a drug is sent to the model:
+
+1. Quantity ratios (calculate_packaging_from_quantities): stock counts held
+   in each unit, e.g. 2 Packs, 20 Cards, 200 Tablets, give 10 Cards per
+   Pack and 10 Tablets per Card. Only accepted when every level divides
+   exactly into a whole number above one. A ratio taken from a single pack
+   or container is less certain (it may be opened), so it scores lower
+   unless the conventions give the same structure.
+2. Conventions (quick_add_structures): the usual count for the unit chain,
+   e.g. 10 Cards per Pack. Common chains with a settled convention score
+   higher than the generic 10-per-level fallback.
+
+A drug with a single unit has no hierarchy, which is certain. Callers
+accept results at or above a minimum confidence and send the rest to the
+model.
+"""
+
+from calculate_packaging_from_quantities import calculate_packaging_structure
+from packaging_cache import unit_chain
+from quick_add_structures import infer_packaging_structure
+
+DEFAULT_MIN_CONFIDENCE = 0.8
+
+# Quantity-ratio confidence, by whether every larger unit held more than one
+QUANTITY_CONFIDENCE = 0.95
+SINGLE_PACK_CONFIDENCE = 0.7
+# Quantity ratios that match the conventional structure exactly
+AGREEMENT_CONFIDENCE = 0.9
+
+# Convention confidence by unit chain; other chains get the default
+CONVENTION_CONFIDENCE = {
+    ('Pack', 'Card', 'Tablet'): 0.6,
+    ('Card', 'Tablet'): 0.6,
+    ('Container', 'Card', 'Tablet'): 0.5,
+    ('Container', 'Tablet'): 0.3,
+}
+DEFAULT_CONVENTION_CONFIDENCE = 0.2
+
+
+class Inference:
+    """A packaging structure guessed by one of the rules, with its confidence."""
+
+    __slots__ = ('structure', 'source', 'confidence')
+
+    def __init__(self, structure, source, confidence):
+        self.structure = structure
+        self.source = source
+        self.confidence = confidence
+
+    def to_dict(self):
+        return {'source': self.source, 'confidence': self.confidence, 'packagingStructure': self.structure}
+
+
+def stock_chain(drug):
+    """
+    Stock counts in unit-chain order, as {'name', 'quantity'} dicts.
+
+    Uses the drug's quantities when there is one per unit; otherwise its
+    units, whose quantities are stock counts in freshly converted sheets.
+    """
+    names = unit_chain(drug)
+    stock = {quantity['name']: quantity['quantity'] for quantity in drug.get('quantities') or []}
+    if all(name in stock for name in names):
+        return [{'name': name, 'quantity': stock[name]} for name in names]
+    return [{'name': unit['name'], 'quantity': unit['quantity']} for unit in drug.get('units', [])]
+
+
+def infer_from_quantities(drug):
+    """Quantity-ratio inference, or None unless every level divides exactly."""
+    chain = stock_chain(drug)
+    quantities = [unit['quantity'] for unit in chain]
+    if len(chain) < 2 or not all(isinstance(q, int) and q > 0 for q in quantities):
+        return None
+    for larger, smaller in zip(quantities, quantities[1:]):
+        if smaller % larger or smaller // larger < 2:
+            return None
+
+    confidence = QUANTITY_CONFIDENCE if all(q > 1 for q in quantities[:-1]) else SINGLE_PACK_CONFIDENCE
+    return Inference(calculate_packaging_structure(chain), 'quantities', confidence)
+
+
+def infer_from_conventions(drug):
+    """Conventional structure for the drug's unit chain."""
+    names = tuple(unit_chain(drug))
+    confidence = CONVENTION_CONFIDENCE.get(names, DEFAULT_CONVENTION_CONFIDENCE)
+    return Inference(infer_packaging_structure(drug.get('units', [])), 'conventions', confidence)
+
+
+def infer(drug):
+    """
+    The most confident rule-based structure for a drug.
+
+    Returns:
+        Inference: From the quantity ratios if they divide exactly and score
+        at least as high as the conventions, else from the conventions
+    """
+    if len(drug.get('units', [])) <= 1:
+        return Inference([], 'single-unit', 1.0)
+
+    conventional = infer_from_conventions(drug)
+    from_quantities = infer_from_quantities(drug)
+    if from_quantities is None:
+        return conventional
+    if from_quantities.structure == conventional.structure:
+        from_quantities.confidence = max(from_quantities.confidence, AGREEMENT_CONFIDENCE)
+    return from_quantities if from_quantities.confidence >= conventional.confidence else conventional
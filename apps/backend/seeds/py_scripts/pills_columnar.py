@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Columnar (NumPy) transform of the pills CSV into inventory items.
+
+Rows are read in blocks and the Pack/Container, Card and Tablets columns
+are parsed as NumPy arrays. The Container -> Tablet versus
+Pack -> Card -> Tablet decision is made for the whole block with masks, and
+items are only built at the end. Output is identical to
+transform_pills_to_inventory.build_item.
+"""
+
+import csv
+import gc
+from contextlib import contextmanager
+from itertools import compress, islice, zip_longest
+
+from compressed_io import open_text
+from expiry_dates import earliest_and_later
+from inventory_model import InventoryItem, Unit
+from transform_pills_to_inventory import clean_value, parse_quantity
+
+# You'll need to install: pip install numpy
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BLOCK_SIZE = 100_000
+
+# Longest digit string that always fits in int64
+MAX_DIGITS = 18
+INT64_MAX = 2 ** 63 - 1
+
+
+def parse_quantity_column(cells):
+    """
+    Vectorized parse_quantity(clean_value(cell, is_numeric=True)).
+
+    Plain digit strings are converted in bulk. The rare cells int() still
+    accepts in other spellings (e.g. "+5") fall back to the scalar parser.
+
+    Returns:
+        numpy.ndarray: int64 quantities (object dtype if any overflow int64),
+        0 where the scalar parser gives None
+    """
+    stripped = np.char.strip(np.asarray(cells, dtype=str))
+    decimal = np.char.isdecimal(stripped) & (np.char.str_len(stripped) <= MAX_DIGITS)
+
+    quantities = np.zeros(len(stripped), dtype=np.int64)
+    if decimal.any():
+        quantities[decimal] = stripped[decimal].astype(np.int64)
+
+    unusual = ~decimal & (stripped != '') & (stripped != '-')
+    for i in np.flatnonzero(unusual):
+        value = parse_quantity(clean_value(cells[i], is_numeric=True)) or 0
+        if value > INT64_MAX and quantities.dtype != object:
+            quantities = quantities.astype(object)
+        quantities[i] = value
+
+    return np.where(quantities > 0, quantities, 0)
+
+
+def transform_block(header_index, block, spec):
+    """
+    Transform a block of csv.reader rows into inventory items.
+
+    Args:
+        header_index: Dict of header name -> column index
+        block: List of non-empty csv.reader rows
+        spec: Column mapping spec for the pills sheet
+
+    Returns:
+        list: InventoryItems, in row order
+    """
+    columns = list(zip_longest(*block, fillvalue=''))
+    empty_column = ('',) * len(block)
+
+    def column(field):
+        index = header_index.get(spec['columns'][field])
+        if index is None or index >= len(columns):
+            return empty_column
+        return columns[index]
+
+    names = np.char.strip(np.asarray(column('name'), dtype=str))
+    pack = parse_quantity_column(column('pack_container'))
+    card = parse_quantity_column(column('card'))
+    tablets = parse_quantity_column(column('tablets'))
+
+    valid_name = (names != '') & (names != '-') & (np.char.lower(names) != 'n/a')
+    has_units = (pack > 0) | (card > 0) | (tablets > 0)
+    container = (pack > 0) & (card == 0)
+    keep = (valid_name & has_units).tolist()
+
+    # Expiry pairs repeat heavily, so resolve each distinct pair once
+    expiry_pairs = {}
+
+    category = spec['category']
+    items = []
+    append = items.append
+    rows = compress(
+        zip(names.tolist(), pack.tolist(), card.tolist(), tablets.tolist(), container.tolist(),
+            column('exp_date1'), column('exp_date2')),
+        keep
+    )
+    for name, pack_qty, card_qty, tablets_qty, is_container, exp_date1, exp_date2 in rows:
+        if is_container:
+            units = [Unit('Container', 'Containers', pack_qty)]
+        else:
+            units = []
+            if pack_qty:
+                units.append(Unit('Pack', 'Packs', pack_qty))
+            if card_qty:
+                units.append(Unit('Card', 'Cards', card_qty))
+        if tablets_qty:
+            units.append(Unit('Tablet', 'Tablets', tablets_qty))
+
+        pair = (exp_date1, exp_date2)
+        expiry = expiry_pairs.get(pair)
+        if expiry is None:
+            expiry = expiry_pairs[pair] = earliest_and_later(exp_date1, exp_date2)
+        if expiry[0] is not None:
+            item = InventoryItem(name=name, category=category, units=units,
+                                 earliestExpiryDate=expiry[0], laterExpiryDates=list(expiry[1]))
+        else:
+            item = InventoryItem(name=name, category=category, units=units,
+                                 laterExpiryDates=list(expiry[1]))
+
+        append(item)
+
+    return items
+
+
+@contextmanager
+def gc_paused():
+    """
+    Pause the cyclic garbage collector.
+
+    A block allocates hundreds of thousands of acyclic lists and dicts, and
+    letting the collector rescan them repeatedly costs more than the parsing.
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def iter_columnar_items(csv_path, spec, block_size=BLOCK_SIZE):
+    """
+    Yield drug inventory items from a pills CSV, transforming block by block.
+
+    Args:
+        csv_path: Path to input CSV file
+        spec: Column mapping spec for the pills sheet
+        block_size: Rows per NumPy block
+    """
+    if np is None:
+        raise ImportError("numpy is required for columnar mode. Install with: pip install numpy")
+
+    with open_text(csv_path, newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, [])
+        # Later duplicates win, matching csv.DictReader
+        header_index = {name: i for i, name in enumerate(header)}
+
+        while True:
+            with gc_paused():
+                rows = list(islice(reader, block_size))
+                block = [row for row in rows if row]
+                items = transform_block(header_index, block, spec) if block else []
+            if not rows:
+                break
+            yield from items
@@ -1,19 +1,20 @@
 #!/usr/bin/env python3
 """
 Quick script to process a single batch manually.
-Usage: python process_single_batch.py <start_index> <end_index>
+Usage: python process_single_batch.py <start_index> <end_index> [--file drugs.jsonl]
 Example: python process_single_batch.py 0 12
 """
 
-import json
 import sys
+from inventory_snapshot import open_snapshot
 
-def extract_batch(start_idx: int, end_idx: int):
-    """Extract a batch of drugs and generate prompt."""
-    with open('apps/backend/seeds/inventory/drugs.json', 'r', encoding='utf-8') as f:
-        drugs = json.load(f)
+DRUGS_FILE = 'apps/backend/seeds/inventory/drugs.json'
 
-    batch = drugs[start_idx:end_idx]
+def extract_batch(start_idx: int, end_idx: int, file_path: str = DRUGS_FILE):
+    """Extract a batch of drugs and generate prompt."""
+    # Only the batch is decoded from the (auto-refreshed) binary snapshot
+    with open_snapshot(file_path) as snapshot:
+        batch = snapshot[start_idx:end_idx]
 
     # Generate prompt
     prompt = f"""Analyze these {len(batch)} pharmaceutical drugs and determine their packaging structure.
@@ -58,38 +59,51 @@ For drugs with only one unit (e.g., just Tablet), use empty array: "packagingStr
     print("=" * 80)
 
 
-def show_progress():
+def show_progress(file_path: str = DRUGS_FILE):
     """Show current progress."""
-    with open('apps/backend/seeds/inventory/drugs.json', 'r', encoding='utf-8') as f:
-        drugs = json.load(f)
+    total = 0
+    with_structure = 0
+    next_unprocessed = None
+
+    with open_snapshot(file_path) as snapshot:
+        for i, drug in enumerate(snapshot):
+            total += 1
+            if 'packagingStructure' in drug:
+                with_structure += 1
+            elif next_unprocessed is None:
+                next_unprocessed = (i, drug['name'])
 
-    total = len(drugs)
-    with_structure = sum(1 for d in drugs if 'packagingStructure' in d)
     without_structure = total - with_structure
 
     print(f"\nProgress: {with_structure}/{total} drugs have packaging structure")
     print(f"Remaining: {without_structure} drugs")
 
-    if without_structure > 0:
-        # Find first drug without structure
-        for i, drug in enumerate(drugs):
-            if 'packagingStructure' not in drug:
-                print(f"\nNext unprocessed drug: #{i} - {drug['name']}")
-                break
+    if next_unprocessed is not None:
+        # First drug without structure
+        print(f"\nNext unprocessed drug: #{next_unprocessed[0]} - {next_unprocessed[1]}")
 
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        if sys.argv[1] == "progress":
-            show_progress()
+    args = sys.argv[1:]
+    file_path = DRUGS_FILE
+    if '--file' in args:
+        # Drugs file (.json or .jsonl) to read instead of the default
+        i = args.index('--file')
+        file_path = args[i + 1]
+        del args[i:i + 2]
+
+    if args:
+        if args[0] == "progress":
+            show_progress(file_path)
         else:
-            start = int(sys.argv[1])
-            end = int(sys.argv[2]) if len(sys.argv) > 2 else start + 12
-            extract_batch(start, end)
+            start = int(args[0])
+            end = int(args[1]) if len(args) > 1 else start + 12
+            extract_batch(start, end, file_path)
     else:
         print("Usage:")
         print("  python process_single_batch.py <start_index> <end_index>")
         print("  python process_single_batch.py progress")
+        print("  Add --file <path> to read another drugs file (.json or .jsonl)")
         print("\nExamples:")
         print("  python process_single_batch.py 0 12    # Process first 12 drugs")
         print("  python process_single_batch.py 12 24   # Process drugs 12-23")
@@ -4,7 +4,13 @@ Quick script to add packaging structures to all drugs at once.
 This analyzes the unit hierarchy and infers standard pharmaceutical packaging.
 """
 
-import json
+import os
+import sys
+
+from inventory_io import iter_items, temporary_path, write_items
+
+DRUGS_FILE = "apps/backend/seeds/inventory/drugs.json"
+
 
 def infer_packaging_structure(units):
     """
@@ -68,44 +74,46 @@ def infer_packaging_structure(units):
     return structure
 
 
-def process_drugs():
-    """Load, process, and save drugs with packaging structures."""
+def process_drugs(file_path=DRUGS_FILE):
+    """
+    Load, process, and save drugs with packaging structures.
 
-    # Load the data
-    file_path = "apps/backend/seeds/inventory/drugs.json"
+    Drugs are streamed one at a time into a temporary file in the same format
+    (.json or .jsonl), which then replaces the original.
+    """
     print(f"Loading {file_path}...")
 
-    with open(file_path, 'r', encoding='utf-8') as f:
-        drugs = json.load(f)
-
-    print(f"Loaded {len(drugs)} drugs")
-
-    # Process each drug
+    examples = []
     processed = 0
-    for i, drug in enumerate(drugs):
-        # Add packaging structure
-        drug['packagingStructure'] = infer_packaging_structure(drug.get('units', []))
-        processed += 1
 
-        if (i + 1) % 50 == 0:
-            print(f"  Processed {i + 1}/{len(drugs)} drugs...")
+    def add_structures():
+        nonlocal processed
+        for drug in iter_items(file_path):
+            # Add packaging structure
+            drug['packagingStructure'] = infer_packaging_structure(drug.get('units', []))
+            processed += 1
 
-    print(f"\n✓ Processed {processed} drugs")
+            if len(examples) < 5:
+                examples.append(drug)
+            if processed % 50 == 0:
+                print(f"  Processed {processed} drugs...")
+
+            yield drug
 
     # Save the updated data
-    print(f"\nSaving to {file_path}...")
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(drugs, f, indent=2, ensure_ascii=False)
+    tmp_path = temporary_path(file_path)
+    write_items(add_structures(), tmp_path)
+    os.replace(tmp_path, file_path)
 
-    print("✓ File updated successfully!")
+    print(f"\n✓ Processed {processed} drugs")
+    print(f"✓ Saved to {file_path}")
 
     # Show some examples
     print("\n" + "=" * 80)
     print("EXAMPLES OF ADDED STRUCTURES:")
     print("=" * 80)
 
-    for i in range(min(5, len(drugs))):
-        drug = drugs[i]
+    for i, drug in enumerate(examples):
         print(f"\n{i+1}. {drug['name']}")
         units = [u['name'] for u in drug['units']]
         print(f"   Units: {' -> '.join(units)}")
@@ -117,10 +125,11 @@ def process_drugs():
             print(f"   Structure: (no hierarchy - single unit)")
 
     print("\n" + "=" * 80)
-    print(f"✓ All {len(drugs)} drugs now have packaging structure!")
+    print(f"✓ All {processed} drugs now have packaging structure!")
     print("=" * 80)
 
 
 if __name__ == "__main__":
-    process_drugs()
+    # Drugs file can be passed as the first argument (.json or .jsonl)
+    process_drugs(sys.argv[1] if len(sys.argv) > 1 else DRUGS_FILE)
 
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Requests-per-minute and tokens-per-minute limiting for async API calls.
+
+Each limit is a token bucket that holds up to one minute's allowance and
+refills continuously, so short bursts are allowed but the per-minute rate
+is never exceeded. Callers reserve an estimated token count before a request
+and settle it with the real usage reported in the response.
+"""
+
+import asyncio
+import time
+
+# Rough characters per token for English prompts and JSON replies
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """Cheap token estimate for a prompt or reply, without a tokenizer."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class TokenBucket:
+    """A per-minute allowance that refills continuously."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until amount is available (requests above capacity wait for a full bucket)."""
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+
+class RateLimiter:
+    """
+    Async limiter for requests per minute and tokens per minute.
+
+    Either limit may be None to leave it unlimited. Waiters are served in
+    arrival order, so a large request is not starved by small ones.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens=0):
+        """Wait until one request using about `tokens` tokens may be sent."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                delay = 0.0
+                if self.requests:
+                    self.requests.refill(now)
+                    delay = max(delay, self.requests.wait_time(1))
+                if self.tokens:
+                    self.tokens.refill(now)
+                    delay = max(delay, self.tokens.wait_time(tokens))
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+
+            if self.requests:
+                self.requests.level -= 1
+            if self.tokens:
+                self.tokens.level -= min(tokens, self.tokens.capacity)
+
+    def settle(self, reserved, used):
+        """Correct a reservation once the real token usage is known."""
+        if self.tokens and used is not None:
+            self.tokens.refill(time.monotonic())
+            self.tokens.level = min(self.tokens.capacity,
+                                    self.tokens.level + min(reserved, self.tokens.capacity) - used)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Stable batch IDs for manual packaging prompts, and bulk ingestion of the
+saved responses.
+
+When prompts are generated for manual processing, a manifest is written next
+to the drugs file recording, for every batch, an ID and the index, name and
+unit chain of each drug in it, plus the identical drugs that share each
+drug's answer. The ID is the batch's number plus a hash of its drugs'
+indices and names (batch-0001-3f2a9c1e), so regenerating the prompts after
+the pending drugs change gives new IDs, and a response saved for an earlier
+set of prompts can never be applied to the drugs that now share its number. Responses saved as <batch id>.json (or .txt)
+in one directory can then be ingested together: each file is parsed and
+validated against its manifest entry in a worker process, and the valid
+results are applied in batch order with a single checkpoint.
+
+Because drugs are looked up by the manifest's indices and checked against
+its names, batch IDs stay valid however many other batches have been
+processed in between.
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from packaging_cache import unit_chain
+
+MANIFEST_VERSION = 2
+RESPONSE_SUFFIXES = ('.json', '.txt', '.md')
+BATCH_ID_PREFIX = 'batch-'
+
+
+def batch_digest(drugs):
+    """Short hash of a batch's (index, name) pairs."""
+    key = json.dumps([[idx, name] for idx, name in drugs], ensure_ascii=False)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:8]
+
+
+def batch_id(number, drugs):
+    """ID of the number-th batch (1-based) of (index, name) pairs, e.g. batch-0003-3f2a9c1e."""
+    return f"{BATCH_ID_PREFIX}{number:04d}-{batch_digest(drugs)}"
+
+
+def entry_matches(batch, entry):
+    """Whether a manifest entry still holds the drugs its ID was made from."""
+    return batch.rsplit('-', 1)[-1] == batch_digest((drug['index'], drug['name']) for drug in entry['drugs'])
+
+
+def build_manifest(batches, group_members, template, source):
+    """
+    Manifest for a list of batches of (index, drug) pairs.
+
+    group_members maps a representative's index to (group key, [(index,
+    drug), ...]) for the identical drugs that get its answer.
+    """
+    entries = {}
+    for number, batch in enumerate(batches, 1):
+        entries[batch_id(number, [(idx, drug['name']) for idx, drug in batch])] = {
+            'drugs': [{'index': idx, 'name': drug['name'], 'units': unit_chain(drug)} for idx, drug in batch],
+            'groups': {
+                str(idx): {
+                    'key': group_members[idx][0],
+                    'members': [{'index': member, 'name': drug['name']} for member, drug in group_members[idx][1]],
+                }
+                for idx, _ in batch if idx in group_members
+            },
+        }
+    return {
+        'version': MANIFEST_VERSION,
+        'source': str(source),
+        'template': template,
+        'created': datetime.now().isoformat(),
+        'batches': entries,
+    }
+
+
+def load_manifest(manifest_path):
+    """Load a manifest, or return None if it is missing or outdated."""
+    manifest_path = Path(manifest_path)
+    if not manifest_path.exists():
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    return manifest if manifest.get('version') == MANIFEST_VERSION else None
+
+
+def save_manifest(manifest, manifest_path):
+    """Atomically write the manifest."""
+    manifest_path = Path(manifest_path)
+    tmp_path = manifest_path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, manifest_path)
+
+
+def find_responses(directory, manifest):
+    """
+    Saved response files in directory, by batch ID.
+
+    A file is only matched when its name is a batch ID in the manifest and
+    the ID's hash still matches the drugs recorded for it; responses saved
+    for earlier prompts, including ones with old-style IDs, are unknown.
+
+    Returns:
+        tuple: ({batch id: path}, [paths whose name is not a batch in the manifest])
+    """
+    found = {}
+    unknown = []
+    for path in sorted(Path(directory).iterdir()):
+        if not path.is_file() or path.suffix.lower() not in RESPONSE_SUFFIXES:
+            continue
+        entry = manifest['batches'].get(path.stem)
+        if entry is not None and entry_matches(path.stem, entry):
+            found[path.stem] = path
+        else:
+            unknown.append(path)
+    return found, unknown
+
+
+def structure_problem(units, structure):
+    """Why a packagingStructure does not fit a unit chain, or None if it does."""
+    if not isinstance(structure, list):
+        return "packagingStructure is not a list"
+    if len(structure) != max(0, len(units) - 1):
+        return f"{len(structure)} levels for units {' -> '.join(units)}"
+    for level, larger, smaller in zip(structure, units, units[1:]):
+        if not isinstance(level, dict) or level.get('unit') != larger or level.get('of') != smaller:
+            return f"level {level!r} does not match {larger} -> {smaller}"
+        contains = level.get('contains')
+        if not isinstance(contains, int) or isinstance(contains, bool) or contains < 1:
+            return f"{larger} contains {contains!r} {smaller}"
+    return None
+
+
+def validate_response(text, entry):
+    """
+    Parse a saved response and check each result against its manifest entry.
+
+    Returns:
+        dict: 'results' {index: packagingStructure} that passed, 'rejected'
+        [(index, name, reason)], 'missing' [(index, name)] not answered, and
+        'error' if the response could not be parsed at all
+    """
+    # Imported here so worker processes load the adder without a circular import
+    from add_packaging_structure import PackagingStructureAdder
+
+    batch = [(drug['index'], {'name': drug['name'], 'units': [{'name': unit} for unit in drug['units']]})
+             for drug in entry['drugs']]
+    outcome = {'results': {}, 'rejected': [], 'missing': [], 'error': None}
+    try:
+        results, _ = PackagingStructureAdder.parse_reply(text)
+        matched = PackagingStructureAdder.match_results(batch, results)
+    except (ValueError, TypeError, AttributeError) as e:
+        outcome['error'] = f"{type(e).__name__}: {e}"
+        return outcome
+
+    for drug in entry['drugs']:
+        idx = drug['index']
+        if idx not in matched:
+            outcome['missing'].append((idx, drug['name']))
+            continue
+        problem = structure_problem(drug['units'], matched[idx])
+        if problem:
+            outcome['rejected'].append((idx, drug['name'], problem))
+        else:
+            outcome['results'][idx] = matched[idx]
+    return outcome
+
+
+def validate_response_file(path, entry):
+    """validate_response for a saved file; returns (path, outcome)."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return path, {'results': {}, 'rejected': [], 'missing': [], 'error': f"{type(e).__name__}: {e}"}
+    return path, validate_response(text, entry)
+
+
+def validate_responses(responses, manifest, workers=None):
+    """
+    Validate saved responses in parallel.
+
+    Args:
+        responses: {batch id: path}
+        manifest: The manifest the batch IDs come from
+        workers: Worker processes (default: one per CPU, 1 validates in this process)
+
+    Returns:
+        dict: {batch id: (path, outcome)}, in batch ID order
+    """
+    ids = sorted(responses)
+    workers = workers or min(len(ids), os.cpu_count() or 1)
+    entries = [manifest['batches'][batch] for batch in ids]
+    paths = [responses[batch] for batch in ids]
+
+    if workers <= 1:
+        return {batch: validate_response_file(path, entry) for batch, path, entry in zip(ids, paths, entries)}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, len(ids) // (workers * 4))
+        return dict(zip(ids, executor.map(validate_response_file, paths, entries, chunksize=chunksize)))
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Append-only journal of packaging-structure results.
+
+Each result is appended as one JSON line (drug index, name and
+packagingStructure) as soon as it is applied, so progress costs one short
+write per drug instead of rewriting a whole checkpoint after every batch,
+and a crash keeps the results themselves, not only which drugs were done.
+
+Writes reach the OS on every commit(); fsync is batched, running once
+sync_every records or sync_seconds have built up, and always on close().
+replay() restores results on the next run, dropping a torn last line left by
+a crash. compact() rewrites the journal with only the latest result per
+drug.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+from inventory_io import format_line
+
+SYNC_EVERY = 256
+SYNC_SECONDS = 2.0
+
+
+def _plain(structure):
+    return [level.to_dict() if hasattr(level, 'to_dict') else level for level in structure]
+
+
+class ResultJournal:
+    """
+    JSON Lines journal of {"index", "name", "packagingStructure"} records.
+
+    Later records for the same index supersede earlier ones.
+    """
+
+    def __init__(self, path, sync_every=SYNC_EVERY, sync_seconds=SYNC_SECONDS):
+        self.path = Path(path)
+        self.sync_every = sync_every
+        self.sync_seconds = sync_seconds
+        self.records = 0
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def exists(self):
+        return self.path.exists()
+
+    def replay(self):
+        """
+        Read every complete record, truncating a torn or corrupt tail.
+
+        Returns:
+            dict: Index -> (name, packagingStructure), latest record winning
+        """
+        results = {}
+        self.records = 0
+        if not self.path.exists():
+            return results
+
+        good = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                    results[record['index']] = (record['name'], record['packagingStructure'])
+                except (ValueError, KeyError, TypeError):
+                    break
+                good += len(line)
+                self.records += 1
+
+        if good < self.path.stat().st_size:
+            print(f"Dropping an incomplete record at the end of {self.path}")
+            with open(self.path, 'r+b') as f:
+                f.truncate(good)
+        return results
+
+    def append(self, index, name, packaging_structure):
+        """Add one result; it is written out by the next commit()."""
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(format_line({
+            'index': index,
+            'name': name,
+            'packagingStructure': _plain(packaging_structure),
+        }))
+        self._file.write('\n')
+        self.records += 1
+        self._unsynced += 1
+
+    def commit(self):
+        """Flush appended records to the OS, and fsync if enough have built up."""
+        if self._file is None:
+            return
+        self._file.flush()
+        if (self._unsynced >= self.sync_every
+                or time.monotonic() - self._last_sync >= self.sync_seconds):
+            self.sync()
+
+    def sync(self):
+        """Flush and fsync everything appended so far."""
+        if self._file is None:
+            return
+        self._file.flush()
+        if self._unsynced:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def compact(self):
+        """
+        Rewrite the journal with only the latest record per drug.
+
+        Returns:
+            int: Number of superseded records dropped
+        """
+        self.close()
+        if not self.path.exists():
+            return 0
+        results = self.replay()
+        before = self.records
+
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for index in sorted(results):
+                name, packaging_structure = results[index]
+                f.write(format_line({
+                    'index': index,
+                    'name': name,
+                    'packagingStructure': _plain(packaging_structure),
+                }))
+                f.write('\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+        self.records = len(results)
+        return before - self.records
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        """Close and delete the journal once its results are saved elsewhere."""
+        self.close()
+        self.path.unlink(missing_ok=True)
+        self.records = 0
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Resumable CSV -> inventory conversion with periodic checkpoints.
+
+Items are written to a plain partial file next to the output. Every
+checkpoint_rows rows the partial file is flushed to disk and a checkpoint
+records how far the run got: the byte offset of the next CSV record, the
+rows read and items emitted so far, and the sizes of the partial output and
+quarantine files. Running the same conversion again after a crash or an
+interrupt truncates anything written after the last checkpoint and carries
+on from that offset, so the finished output is byte-identical to a
+convert_csv run.
+
+Rows the converter raises on are written to a JSON Lines quarantine file,
+with their record number, byte offset and the error, instead of stopping
+the run.
+"""
+
+import csv
+import inspect
+import json
+import os
+import shutil
+from pathlib import Path
+
+from column_specs import compile_row_transformer
+from compressed_io import is_compressed, open_compressed, open_decompressed, strip_compression
+from conversion_manifest import converter_fingerprint
+from inventory_io import ARRAY_PUNCTUATION, format_item, format_line, is_json_lines, temporary_path
+
+CHECKPOINT_VERSION = 1
+
+# Rows read between checkpoints
+CHECKPOINT_ROWS = 100_000
+
+
+def checkpoint_path_for(output_path):
+    """Return the checkpoint path for an output file."""
+    output_path = Path(output_path)
+    return output_path.with_name(output_path.name + '.checkpoint')
+
+
+def partial_path_for(output_path):
+    """Return the uncompressed partial output path for an output file."""
+    output_path = Path(output_path)
+    return output_path.with_name(strip_compression(output_path).name + '.partial')
+
+
+def quarantine_path_for(output_path):
+    """Return the quarantine file path for an output file, e.g. drugs.quarantine.jsonl."""
+    plain = strip_compression(output_path)
+    return plain.with_name(plain.stem + '.quarantine.jsonl')
+
+
+def load_checkpoint(checkpoint_path):
+    """Load a checkpoint, or return None if there is none."""
+    checkpoint_path = Path(checkpoint_path)
+    if not checkpoint_path.exists():
+        return None
+    with open(checkpoint_path, 'r', encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    return checkpoint if checkpoint.get('version') == CHECKPOINT_VERSION else None
+
+
+def save_checkpoint(checkpoint, checkpoint_path):
+    """Atomically write a checkpoint."""
+    checkpoint_path = Path(checkpoint_path)
+    tmp_path = checkpoint_path.with_name(checkpoint_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, checkpoint_path)
+
+
+def source_identity(csv_path):
+    """Size and modification time of the CSV, to tell whether it changed."""
+    stat = os.stat(csv_path)
+    return {'source': str(csv_path), 'source_size': stat.st_size, 'source_mtime_ns': stat.st_mtime_ns}
+
+
+def iter_offset_lines(f, offset):
+    """
+    Yield decoded lines from a binary file, recording the next line's offset.
+
+    offset is a one-element list updated after each line is handed out, so
+    once csv.reader returns a row, offset[0] is where the next record starts.
+    """
+    for line in f:
+        offset[0] += len(line)
+        yield line.decode('utf-8')
+
+
+def _seek(f, csv_path, offset):
+    if not is_compressed(csv_path):
+        f.seek(offset)
+        return
+    # Decompressed streams can only be skipped through
+    remaining = offset
+    while remaining:
+        skipped = len(f.read(min(remaining, 1 << 20)))
+        if not skipped:
+            raise ValueError(f"{csv_path} is shorter than its checkpoint offset {offset}")
+        remaining -= skipped
+
+
+def _sync(f):
+    f.flush()
+    os.fsync(f.fileno())
+    return f.tell()
+
+
+def _truncate(path, size):
+    with open(path, 'r+b') as f:
+        f.truncate(size)
+
+
+def _finish_output(partial_path, output_path):
+    """Move the completed partial file into place, compressing if asked."""
+    if not is_compressed(output_path):
+        os.replace(partial_path, output_path)
+        return
+    tmp_path = temporary_path(output_path)
+    with open(partial_path, 'rb') as src, open_compressed(tmp_path) as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+    os.replace(tmp_path, output_path)
+    os.remove(partial_path)
+
+
+def convert_csv_resumable(csv_path, output_path, build_item, spec, compact=False,
+                          checkpoint_rows=CHECKPOINT_ROWS, restart=False):
+    """
+    Convert a CSV like convert_csv, checkpointing so a failed run can resume.
+
+    Args:
+        csv_path: Path to input CSV file (plain, .gz or .zst)
+        output_path: Path to output JSON or JSON Lines file
+        build_item: Plug-in build function
+        spec: Column mapping spec for the sheet
+        compact: Write a JSON array without indentation
+        checkpoint_rows: Rows read between checkpoints
+        restart: Ignore an existing checkpoint and start from the beginning
+
+    Returns:
+        dict: Stats with the items written, rows read, rows quarantined and
+        the row the run resumed from (0 for a fresh run)
+    """
+    csv_path = Path(csv_path)
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    checkpoint_path = checkpoint_path_for(output_path)
+    partial_path = partial_path_for(output_path)
+    quarantine_path = quarantine_path_for(output_path)
+    json_lines = is_json_lines(output_path)
+    opening, separator, closing = ARRAY_PUNCTUATION[compact]
+
+    job = {
+        'version': CHECKPOINT_VERSION,
+        **source_identity(csv_path),
+        'converter': converter_fingerprint(inspect.getmodule(build_item), spec),
+        'json_lines': json_lines,
+        'compact': compact,
+    }
+
+    checkpoint = None if restart else load_checkpoint(checkpoint_path)
+    if checkpoint is not None and (
+        any(checkpoint.get(key) != value for key, value in job.items())
+        or not partial_path.exists()
+        or not quarantine_path.exists()
+    ):
+        checkpoint = None
+
+    if checkpoint is not None:
+        _truncate(partial_path, checkpoint['output_bytes'])
+        _truncate(quarantine_path, checkpoint['quarantine_bytes'])
+        state = checkpoint
+    else:
+        open(partial_path, 'wb').close()
+        open(quarantine_path, 'wb').close()
+        state = {**job, 'header': None, 'offset': 0, 'rows': 0, 'items': 0, 'quarantined': 0,
+                 'output_bytes': 0, 'quarantine_bytes': 0}
+    resumed_from = state['rows']
+
+    with open_decompressed(csv_path) as source, \
+            open(partial_path, 'a', encoding='utf-8') as out, \
+            open(quarantine_path, 'a', encoding='utf-8') as quarantine:
+        offset = [0]
+        if state['header'] is None:
+            header_line = source.readline()
+            offset[0] = len(header_line)
+            state['header'] = next(csv.reader([header_line.decode('utf-8')]), [])
+            state['offset'] = offset[0]
+        else:
+            _seek(source, csv_path, state['offset'])
+            offset[0] = state['offset']
+
+        transform = compile_row_transformer(spec, state['header'], build_item)
+        reader = csv.reader(iter_offset_lines(source, offset))
+        rows, items, quarantined = state['rows'], state['items'], state['quarantined']
+        next_checkpoint = rows + checkpoint_rows
+
+        start = offset[0]
+        for row in reader:
+            rows += 1
+            if row:
+                # The transform pads the row in place; quarantine it as read
+                fields = len(row)
+                try:
+                    item = transform(row)
+                except Exception as e:
+                    quarantine.write(json.dumps({
+                        'record': rows,
+                        'offset': start,
+                        'error': f"{type(e).__name__}: {e}",
+                        'row': row[:fields],
+                    }, ensure_ascii=False))
+                    quarantine.write('\n')
+                    quarantined += 1
+                    item = None
+
+                if item is not None:
+                    if json_lines:
+                        out.write(format_line(item))
+                        out.write('\n')
+                    else:
+                        out.write(separator if items else opening)
+                        out.write(format_item(item, compact))
+                    items += 1
+
+            if rows >= next_checkpoint:
+                state.update(offset=offset[0], rows=rows, items=items, quarantined=quarantined,
+                             output_bytes=_sync(out), quarantine_bytes=_sync(quarantine))
+                save_checkpoint(state, checkpoint_path)
+                next_checkpoint = rows + checkpoint_rows
+            start = offset[0]
+
+        if not json_lines:
+            out.write(closing if items else '[]')
+
+    _finish_output(partial_path, output_path)
+    if quarantined == 0:
+        os.remove(quarantine_path)
+    checkpoint_path.unlink(missing_ok=True)
+
+    return {'items': items, 'rows': rows, 'quarantined': quarantined, 'resumed_from': resumed_from}
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Retry decisions and backoff delays for model API calls.
+
+Failed calls are retried with exponential backoff and full jitter: the n-th
+retry waits a random time between zero and base_delay * 2**n, capped at
+max_delay, so many clients retrying at once spread out instead of hitting
+the API together again. A Retry-After header on the error, when present,
+sets the minimum wait.
+
+Authentication and configuration errors (bad API key, no permission,
+unknown model or endpoint) are fatal: no retry or smaller batch fixes them,
+so they stop the run. Errors caused by what was sent (a bad request, a
+prompt over the context length, content the API refuses) are not retried,
+since the same batch fails the same way, but the batch can be split until
+the drug at fault is isolated.
+"""
+
+import random
+
+# Authentication and configuration errors: unauthorized, forbidden, not found
+FATAL_STATUSES = {401, 403, 404}
+# Errors about the request's content: bad request, too large, unprocessable
+CONTENT_ERROR_STATUSES = {400, 413, 422}
+
+
+def status_code(error):
+    """HTTP status of an API error, or None for other errors."""
+    return getattr(error, 'status_code', None)
+
+
+def is_fatal(error):
+    """Whether an error is an authentication or configuration error that retrying or splitting cannot fix."""
+    return status_code(error) in FATAL_STATUSES
+
+
+def is_content_error(error):
+    """Whether an error was caused by what the request contained, so only a smaller batch can help."""
+    return status_code(error) in CONTENT_ERROR_STATUSES
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait, from a Retry-After header, or None."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    try:
+        return max(0.0, float(headers.get('retry-after')))
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """How many times to try a call and how long to wait in between."""
+
+    def __init__(self, attempts=4, base_delay=1.0, max_delay=30.0):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def should_retry(self, error, attempt):
+        """Whether to try again after attempt (0-based) failed with error."""
+        return attempt + 1 < self.attempts and not is_fatal(error) and not is_content_error(error)
+
+    def delay(self, attempt, error=None):
+        """Seconds to wait before the retry that follows attempt (0-based)."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        requested = retry_after(error)
+        if requested is not None:
+            delay = max(delay, min(requested, self.max_delay))
+        return delay
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Per-call and per-run metrics for packaging-structure model calls.
+
+Every model call is appended to a JSON Lines metrics file as it finishes:
+drugs in the batch, prompt and completion tokens (as reported by the API),
+latency, attempt number, outcome, how the reply was parsed and how many
+drugs it matched. When the run ends a summary line is appended with totals,
+percentiles (latency, tokens per call), retries, parse paths and the
+estimated cost.
+
+Token counts for planning use tiktoken when it is installed and the rough
+characters-per-token estimate otherwise.
+"""
+
+import json
+import math
+import time
+from collections import Counter
+from datetime import datetime
+
+from rate_limiter import estimate_tokens
+
+# You'll need to install: pip install tiktoken
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# USD per million tokens for the default model; override for other models
+PROMPT_PRICE_PER_MILLION = 2.50
+COMPLETION_PRICE_PER_MILLION = 10.00
+
+_encoding = None
+
+
+def count_tokens(text):
+    """Tokens in text: exact with tiktoken, estimated without it."""
+    global _encoding
+    if tiktoken is None:
+        return estimate_tokens(text)
+    if _encoding is None:
+        _encoding = tiktoken.get_encoding('o200k_base')
+    return len(_encoding.encode(text))
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers, or None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    # The smallest value with at least fraction of the values at or below it;
+    # rounding first keeps e.g. 0.95 * 100 from landing just above 95
+    rank = math.ceil(round(fraction * len(ordered), 9))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def distribution(values, digits=4):
+    """p50/p95/p99/max of a list of numbers, rounded."""
+    def rounded(value):
+        return None if value is None else round(value, digits)
+    return {
+        'p50': rounded(percentile(values, 0.5)),
+        'p95': rounded(percentile(values, 0.95)),
+        'p99': rounded(percentile(values, 0.99)),
+        'max': rounded(max(values, default=None)),
+    }
+
+
+def cost(prompt_tokens, completion_tokens, prompt_price=PROMPT_PRICE_PER_MILLION,
+         completion_price=COMPLETION_PRICE_PER_MILLION):
+    """Estimated USD for a number of prompt and completion tokens."""
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+class RunMetrics:
+    """
+    Collects one record per model call and writes them to a metrics file.
+
+    path may be None to keep the records in memory only.
+    """
+
+    def __init__(self, path=None, prompt_price=PROMPT_PRICE_PER_MILLION,
+                 completion_price=COMPLETION_PRICE_PER_MILLION):
+        self.path = path
+        self.prompt_price = prompt_price
+        self.completion_price = completion_price
+        self.calls = []
+        self.started = time.perf_counter()
+
+    def record_call(self, drugs, latency, attempt=0, outcome='ok', prompt_tokens=None,
+                    completion_tokens=None, parse_path=None, matched=None):
+        """Record one model call; outcome is 'ok', 'truncated' or the error type."""
+        call = {
+            'timestamp': datetime.now().isoformat(),
+            'drugs': drugs,
+            'latency': round(latency, 4),
+            'attempt': attempt,
+            'outcome': outcome,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'parse_path': parse_path,
+            'matched': matched,
+        }
+        self.calls.append(call)
+        self._write({'type': 'call', **call})
+
+    def latencies(self):
+        return [call['latency'] for call in self.calls]
+
+    def summary(self):
+        """Run-level totals and percentiles."""
+        ok = [call for call in self.calls if call['outcome'] == 'ok']
+        prompt_tokens = sum(call['prompt_tokens'] or 0 for call in self.calls)
+        completion_tokens = sum(call['completion_tokens'] or 0 for call in self.calls)
+        matched = sum(call['matched'] or 0 for call in ok)
+        return {
+            'calls': len(self.calls),
+            'ok_calls': len(ok),
+            'retries': sum(1 for call in self.calls if call['attempt'] > 0),
+            'outcomes': dict(Counter(call['outcome'] for call in self.calls)),
+            'parse_paths': dict(Counter(call['parse_path'] for call in ok)),
+            'drugs_matched': matched,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'tokens_per_drug': round((prompt_tokens + completion_tokens) / matched, 1) if matched else None,
+            'cost_usd': round(cost(prompt_tokens, completion_tokens, self.prompt_price, self.completion_price), 4),
+            'wall_seconds': round(time.perf_counter() - self.started, 3),
+            'latency_seconds': distribution(self.latencies()),
+            'prompt_tokens_per_call': distribution([c['prompt_tokens'] for c in ok if c['prompt_tokens'] is not None], 1),
+            'completion_tokens_per_call': distribution([c['completion_tokens'] for c in ok if c['completion_tokens'] is not None], 1),
+        }
+
+    def report(self):
+        """A few lines summarising the run for the console."""
+        s = self.summary()
+        latency = s['latency_seconds']
+        return '\n'.join([
+            f"Model calls: {s['calls']} ({s['ok_calls']} ok, {s['retries']} retries), "
+            f"{s['drugs_matched']} drugs answered",
+            f"Tokens: {s['prompt_tokens']} prompt + {s['completion_tokens']} completion"
+            + (f" ({s['tokens_per_drug']} per drug)" if s['tokens_per_drug'] else "")
+            + f", about ${s['cost_usd']:.2f}",
+            f"Latency: p50 {latency['p50']}s, p95 {latency['p95']}s, p99 {latency['p99']}s, max {latency['max']}s",
+        ])
+
+    def close(self):
+        """Append the run summary, if any calls were made."""
+        if self.calls:
+            self._write({'type': 'run', 'timestamp': datetime.now().isoformat(), **self.summary()})
+
+    def _write(self, record):
+        if self.path is None:
+            return
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def recorded_latencies(path):
+    """Latencies of successful calls in an existing metrics file, for planning."""
+    latencies = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('type') == 'call' and record.get('outcome') == 'ok':
+                    latencies.append(record['latency'])
+    except FileNotFoundError:
+        pass
+    return latencies
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for token-budget batching: how the adaptive batch size limit reacts to
+responses, and how batches are packed against the token budgets.
+
+Run from this directory: python -m pytest test_batch_planner.py
+"""
+
+from batch_planner import BatchSizer, next_batch_end
+
+
+def test_complete_full_batch_grows_limit():
+    sizer = BatchSizer(12)
+    sizer.record(12, 12)
+    assert sizer.limit == 15
+    # A complete batch smaller than the limit says nothing about larger ones
+    sizer.record(6, 6)
+    assert sizer.limit == 15
+    assert sizer.history == [12, 15]
+
+
+def test_growth_stops_at_maximum():
+    sizer = BatchSizer(50, maximum=60)
+    for _ in range(5):
+        sizer.record(sizer.limit, sizer.limit)
+    assert sizer.limit == 60
+
+
+def test_truncated_reply_halves_limit():
+    sizer = BatchSizer(20)
+    sizer.record(20, 0, truncated=True)
+    assert sizer.limit == 10
+    sizer.record(3, 0, truncated=True)
+    assert sizer.limit == 1
+
+
+def test_a_few_missing_drugs_leave_limit_alone():
+    sizer = BatchSizer(20)
+    sizer.record(20, 19)
+    sizer.record(20, 12)
+    assert sizer.limit == 20
+    assert sizer.history == [20]
+
+
+def test_most_of_a_full_batch_missing_halves_limit():
+    sizer = BatchSizer(20)
+    sizer.record(20, 8)
+    assert sizer.limit == 10
+
+
+def test_small_resends_missing_drugs_do_not_shrink_limit():
+    sizer = BatchSizer(20)
+    # A re-sent drug or a split half dropped entirely
+    sizer.record(1, 0)
+    sizer.record(4, 0)
+    assert sizer.limit == 20
+
+
+def test_batches_sized_under_an_older_limit_are_ignored():
+    sizer = BatchSizer(24)
+    # Four concurrent batches of 24 are in flight when the first is cut off
+    sizer.record(24, 0, truncated=True)
+    assert sizer.limit == 12
+    sizer.record(24, 0, truncated=True)
+    sizer.record(24, 3)
+    sizer.record(24, 24)
+    assert sizer.limit == 12
+    assert sizer.history == [24, 12]
+
+
+def test_limit_never_drops_below_minimum():
+    sizer = BatchSizer(4, minimum=3)
+    sizer.record(4, 0, truncated=True)
+    assert sizer.limit == 3
+
+
+def test_batch_packs_until_limit():
+    costs = [(10, 10)] * 10
+    assert next_batch_end(costs, 0, 4, 1000, 1000) == 4
+    assert next_batch_end(costs, 8, 4, 1000, 1000) == 10
+
+
+def test_batch_packs_until_prompt_or_completion_budget():
+    costs = [(10, 30)] * 10
+    # Overhead 20 leaves room for three drugs' prompts
+    assert next_batch_end(costs, 0, 10, 50, 1000, prompt_overhead=20) == 3
+    assert next_batch_end(costs, 0, 10, 1000, 100) == 3
+
+
+def test_batch_holds_one_drug_over_budget():
+    costs = [(500, 500), (10, 10)]
+    assert next_batch_end(costs, 0, 10, 100, 100) == 1
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Regression check for adaptive batching under concurrency: replies that leave
+a drug out must not shrink the batch size limit, however many requests are
+in flight when they arrive.
+
+Runs the pipeline against mock_model_server.py, so it needs the openai package.
+Run from this directory: python -m pytest test_bench_packaging.py
+"""
+
+import pytest
+
+pytest.importorskip('openai')
+
+from bench_packaging import MockServer, run_benchmarks, synthetic_drugs
+
+DRUG = {
+    'name': 'Gabapentin 300mg',
+    'category': 'Drug',
+    'units': [{'name': 'Container', 'plural': 'Containers', 'quantity': 1},
+              {'name': 'Tablet', 'plural': 'Tablets', 'quantity': 37}],
+    'earliestExpiryDate': '2030-01-01',
+    'laterExpiryDates': [],
+}
+
+
+def test_dropped_drugs_do_not_collapse_batch_size(tmp_path):
+    drugs = synthetic_drugs([DRUG], 300)
+    server = MockServer(['--latency', '0.01', '--latency-per-drug', '0', '--jitter', '0',
+                         '--drop-rate', '0.2', '--seed', '1'])
+    try:
+        results = run_benchmarks(drugs, server, [1, 4], [12], tmp_path, max_resumes=0)
+    finally:
+        server.stop()
+
+    for result in results:
+        assert result['unprocessed'] == 0
+        # Left-out drugs are re-sent; the limit itself only ever grows
+        assert min(result['batch_limits']) == 12, result['batch_limits']
+        assert result['batch_limits'][-1] > 12
+    serial, concurrent = results
+    assert concurrent['calls_per_drug'] <= 3 * serial['calls_per_drug']
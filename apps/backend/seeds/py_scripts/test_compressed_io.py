@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Tests for transparent compression: gzip and Zstandard files round-trip
+through open_text, appends read back as one stream, suffix helpers keep the
+data format, and compressed CSVs convert to the same output as plain ones.
+
+Run from this directory: python -m pytest test_compressed_io.py
+"""
+
+import gzip
+import io
+
+import pytest
+
+from column_specs import get_spec
+from compressed_io import (
+    ReadAheadReader,
+    compression_for,
+    format_suffixes,
+    is_compressed,
+    open_compressed,
+    open_text,
+    strip_compression,
+)
+from conversion_engine import convert_csv, convert_csv_parallel
+from inventory_io import load_items, save_items
+from transform_pills_to_inventory import CATEGORY, build_item
+
+TEXT = 'Paracétamol 500mg,1,10,100\n' * 500 + 'last line without newline'
+
+CSV = (
+    'Pills,Pack/Container,Card,Tablets,Exp. Date,Exp. Date 2\n'
+    'Amoxil 500mg,2,20,200,03/27,06/2027\n'
+    '"Augmentin 625mg, film coated",1,,14,12/26,\n'
+    ',,,,,\n'
+    'Vitamin C,-,,30,n/a,\n'
+)
+
+ITEMS = [
+    {'name': 'Amoxil 500mg', 'category': 'Drug', 'units': [], 'laterExpiryDates': []},
+    {'name': 'Zinc', 'category': 'Drug', 'units': [], 'laterExpiryDates': ['2030-01-01']},
+]
+
+
+@pytest.fixture(params=['.gz', '.zst'])
+def suffix(request):
+    if request.param == '.zst':
+        pytest.importorskip('zstandard')
+    return request.param
+
+
+def test_compression_is_picked_by_the_last_suffix():
+    assert compression_for('drugs.json.gz') == 'gzip'
+    assert compression_for('drugs.jsonl.ZST') == 'zstd'
+    assert compression_for('drugs.gz.json') is None
+    assert not is_compressed('drugs.csv')
+    assert strip_compression('inventory/drugs.jsonl.gz').as_posix() == 'inventory/drugs.jsonl'
+    assert strip_compression('drugs.json').name == 'drugs.json'
+    assert format_suffixes('drugs.jsonl.zst') == '.jsonl.zst'
+    assert format_suffixes('drugs.json') == '.json'
+
+
+@pytest.mark.parametrize('read_ahead', [True, False])
+def test_text_round_trip(tmp_path, suffix, read_ahead):
+    path = tmp_path / f"drugs.csv{suffix}"
+    with open_text(path, 'w') as f:
+        f.write(TEXT)
+    assert path.read_bytes()[:len(TEXT)] != TEXT.encode('utf-8')
+    with open_text(path, read_ahead=read_ahead) as f:
+        assert f.read() == TEXT
+
+
+def test_appends_read_back_as_one_stream(tmp_path, suffix):
+    path = tmp_path / f"drugs.jsonl{suffix}"
+    for line in ('first\n', 'second\n', 'third\n'):
+        with open_text(path, 'a') as f:
+            f.write(line)
+    with open_text(path) as f:
+        assert f.read().splitlines() == ['first', 'second', 'third']
+
+
+def test_gzip_output_is_standard_gzip(tmp_path):
+    path = tmp_path / 'drugs.json.gz'
+    with open_compressed(path) as f:
+        f.write(TEXT.encode('utf-8'))
+    assert gzip.decompress(path.read_bytes()).decode('utf-8') == TEXT
+
+
+def test_unsupported_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match='Unsupported mode'):
+        open_text(tmp_path / 'drugs.json.gz', 'r+')
+
+
+def test_read_ahead_reader_matches_source_and_reraises_errors():
+    data = bytes(range(256)) * 40
+    with io.BufferedReader(ReadAheadReader(io.BytesIO(data), chunk_size=100, depth=2), 64) as f:
+        assert f.read() == data
+
+    class FailingSource(io.BytesIO):
+        def read(self, size=-1):
+            chunk = super().read(size)
+            if self.tell() > 300:
+                raise OSError('disk went away')
+            return chunk
+
+    reader = ReadAheadReader(FailingSource(data), chunk_size=100)
+    with pytest.raises(OSError, match='disk went away'):
+        while reader.read(1000):
+            pass
+    reader.close()
+
+
+def test_truncated_gzip_raises(tmp_path):
+    path = tmp_path / 'drugs.json.gz'
+    path.write_bytes(gzip.compress(TEXT.encode('utf-8'))[:-20])
+    with pytest.raises(EOFError):
+        with open_text(path) as f:
+            f.read()
+
+
+@pytest.mark.parametrize('output_name', ['drugs.json', 'drugs.jsonl.gz'])
+def test_compressed_csv_converts_like_plain_csv(tmp_path, suffix, output_name):
+    spec = get_spec(CATEGORY)
+    plain = tmp_path / 'drugs.csv'
+    plain.write_text(CSV, encoding='utf-8')
+    compressed = tmp_path / f"drugs.csv{suffix}"
+    with open_text(compressed, 'w', newline='') as f:
+        f.write(CSV)
+
+    assert convert_csv(plain, tmp_path / output_name, build_item, spec) == 3
+    expected = load_items(tmp_path / output_name)
+    assert [item['name'] for item in expected] == ['Amoxil 500mg', 'Augmentin 625mg, film coated', 'Vitamin C']
+    assert all(item['category'] == CATEGORY for item in expected)
+
+    out = tmp_path / 'out' / output_name
+    assert convert_csv(compressed, out, build_item, spec) == 3
+    assert load_items(out) == expected
+    # The parallel converter falls back to streaming compressed input
+    assert convert_csv_parallel(compressed, out, build_item, spec, workers=2) == 3
+    assert load_items(out) == expected
+
+
+def test_compressed_inventory_round_trip(tmp_path, suffix):
+    for name in (f"drugs.json{suffix}", f"drugs.jsonl{suffix}"):
+        assert save_items(ITEMS, tmp_path / name) == 2
+        assert load_items(tmp_path / name) == ITEMS
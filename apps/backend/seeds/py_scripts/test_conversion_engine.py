@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming conversion engine: byte ranges split the data rows
+at line starts, memory-mapped input reads the same lines and rows as a file
+object, and the parallel converter's merged output is byte-identical to the
+streaming one in every output format and for edge-case inputs.
+
+Run from this directory: python -m pytest test_conversion_engine.py
+"""
+
+import gzip
+import json
+
+import pytest
+
+from column_specs import get_spec
+from conversion_engine import (
+    convert_csv,
+    convert_csv_parallel,
+    find_chunk_ranges,
+    iter_csv_rows,
+    iter_mapped_lines,
+    merge_fragments,
+    read_header,
+)
+from transform_pills_to_inventory import CATEGORY, build_item, transform_csv_to_inventory
+
+HEADER = 'Pills,Pack/Container,Card,Tablets,Exp. Date,Exp. Date 2\n'
+
+
+def pills_csv(path, rows=40, trailing_newline=True):
+    """A small drugs sheet, with skipped and unusual rows mixed in."""
+    lines = [HEADER]
+    for i in range(rows):
+        if i % 9 == 4:
+            lines.append(',,,,,\n')
+        elif i % 7 == 3:
+            lines.append(f'"Drug {i}, syrup",-,,{i},03/{26 + i % 4},n/a\n')
+        else:
+            lines.append(f'Drug {i} 500mg,{i % 3},{i % 5 * 10},{i * 10},{1 + i % 12}/27,06/2026\n')
+    text = ''.join(lines)
+    path.write_text(text if trailing_newline else text.rstrip('\n'), encoding='utf-8')
+    return path
+
+
+@pytest.mark.parametrize('chunk_count', [1, 2, 3, 7, 100])
+@pytest.mark.parametrize('trailing_newline', [True, False])
+def test_chunk_ranges_cover_data_rows_at_line_starts(tmp_path, chunk_count, trailing_newline):
+    csv_path = pills_csv(tmp_path / 'drugs.csv', trailing_newline=trailing_newline)
+    data = csv_path.read_bytes()
+    _, data_start = read_header(csv_path)
+    assert data_start == len(HEADER)
+
+    ranges = find_chunk_ranges(csv_path, chunk_count, data_start)
+    assert ranges[0][0] == data_start and ranges[-1][1] == len(data)
+    assert all(end == next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
+    assert all(data[start - 1:start] == b'\n' for start, _ in ranges)
+    assert len(ranges) <= chunk_count + 1
+
+
+def test_header_only_csv_has_no_ranges(tmp_path):
+    csv_path = tmp_path / 'empty.csv'
+    csv_path.write_text(HEADER, encoding='utf-8')
+    _, data_start = read_header(csv_path)
+    assert find_chunk_ranges(csv_path, 4, data_start) == []
+
+
+@pytest.mark.parametrize('output_name, compact', [
+    ('drugs.json', False), ('drugs.json', True), ('drugs.jsonl', False), ('drugs.json.gz', False),
+])
+def test_parallel_output_is_byte_identical(tmp_path, output_name, compact):
+    csv_path = pills_csv(tmp_path / 'drugs.csv', rows=200)
+    spec = get_spec(CATEGORY)
+    serial_path = tmp_path / 'serial' / output_name
+    parallel_path = tmp_path / 'parallel' / output_name
+
+    count = convert_csv(csv_path, serial_path, build_item, spec, compact=compact)
+    assert convert_csv_parallel(csv_path, parallel_path, build_item, spec, workers=2, compact=compact) == count
+    assert parallel_path.read_bytes() == serial_path.read_bytes()
+    assert not [path for path in parallel_path.parent.iterdir() if path.name.startswith('.fragments_')]
+
+
+def test_mmap_output_is_byte_identical(tmp_path):
+    csv_path = pills_csv(tmp_path / 'drugs.csv', trailing_newline=False)
+    spec = get_spec(CATEGORY)
+    convert_csv(csv_path, tmp_path / 'read.json', build_item, spec)
+    convert_csv(csv_path, tmp_path / 'mapped.json', build_item, spec, use_mmap=True)
+    assert (tmp_path / 'mapped.json').read_bytes() == (tmp_path / 'read.json').read_bytes()
+
+
+def test_transform_returns_count_or_items(tmp_path):
+    csv_path = pills_csv(tmp_path / 'drugs.csv')
+    output_path = tmp_path / 'drugs.json'
+    count = transform_csv_to_inventory(csv_path, output_path)
+    assert isinstance(count, int) and count > 0
+
+    items = transform_csv_to_inventory(csv_path, output_path, restart=True, return_items=True)
+    assert items == json.loads(output_path.read_text(encoding='utf-8'))
+    assert len(items) == count
+    # Drug 0 has no stock in any unit and is skipped
+    assert items[0] == {
+        'name': 'Drug 1 500mg', 'category': 'Drug',
+        'units': [{'name': 'Pack', 'plural': 'Packs', 'quantity': 1},
+                  {'name': 'Card', 'plural': 'Cards', 'quantity': 10},
+                  {'name': 'Tablet', 'plural': 'Tablets', 'quantity': 10}],
+        'earliestExpiryDate': '2026-06-01', 'laterExpiryDates': ['2027-02-01'],
+    }
+
+
+def test_long_line_spanning_several_chunks_is_one_range(tmp_path):
+    csv_path = tmp_path / 'drugs.csv'
+    csv_path.write_text(HEADER + f'Drug {"x" * 500},1,10,100,,\n' + 'Drug y,1,10,100,,\n', encoding='utf-8')
+    _, data_start = read_header(csv_path)
+    ranges = find_chunk_ranges(csv_path, 20, data_start)
+    lines = csv_path.read_bytes()[data_start:].splitlines(keepends=True)
+    assert ranges == [(data_start, data_start + len(lines[0])),
+                      (data_start + len(lines[0]), csv_path.stat().st_size)]
+
+
+def test_merge_skips_empty_fragments(tmp_path):
+    fragments = []
+    for i, (text, count) in enumerate([('', 0), ('  1', 1), ('', 0), ('  2,\n  3', 2)]):
+        path = tmp_path / f'{i}.part'
+        path.write_text(text, encoding='utf-8')
+        fragments.append((path, count))
+    output_path = tmp_path / 'merged.json'
+    assert merge_fragments(fragments, output_path) == 3
+    assert json.loads(output_path.read_text(encoding='utf-8')) == [1, 2, 3]
+
+    assert merge_fragments(fragments[:1], output_path) == 0
+    assert output_path.read_text(encoding='utf-8') == '[]'
+
+
+@pytest.mark.parametrize('csv_name, rows, workers', [
+    # More workers than rows, and compressed input converted without splitting
+    ('drugs.csv', 3, 8), ('drugs.csv', 0, 2), ('drugs.csv.gz', 60, 2),
+])
+def test_parallel_edge_cases_match_serial(tmp_path, csv_name, rows, workers):
+    csv_path = pills_csv(tmp_path / 'drugs.csv', rows=rows)
+    if csv_name.endswith('.gz'):
+        csv_path = tmp_path / csv_name
+        csv_path.write_bytes(gzip.compress((tmp_path / 'drugs.csv').read_bytes()))
+    spec = get_spec(CATEGORY)
+    convert_csv(csv_path, tmp_path / 'serial.json', build_item, spec)
+    convert_csv_parallel(csv_path, tmp_path / 'parallel.json', build_item, spec, workers=workers)
+    assert (tmp_path / 'parallel.json').read_bytes() == (tmp_path / 'serial.json').read_bytes()
+
+
+@pytest.mark.parametrize('block_size', [1, 5, 64, 1 << 20])
+def test_mapped_lines_match_file_lines(tmp_path, block_size):
+    text = 'Pills,Card\r\nParacétamol ½,10\r\n"Multi\nline",2\nlast line without newline'
+    csv_path = tmp_path / 'drugs.csv'
+    csv_path.write_bytes(text.encode('utf-8'))
+    with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+        expected = list(f)
+    assert list(iter_mapped_lines(csv_path, block_size=block_size)) == expected
+
+
+def test_mapped_lines_by_byte_range(tmp_path):
+    csv_path = tmp_path / 'drugs.csv'
+    csv_path.write_bytes(b'a,1\nbb,2\nccc,3\n')
+    # Lines that start before end are yielded whole
+    assert list(iter_mapped_lines(csv_path, 4, 10)) == ['bb,2\n', 'ccc,3\n']
+    assert list(iter_mapped_lines(csv_path, 4, 9)) == ['bb,2\n']
+
+    empty_path = tmp_path / 'empty.csv'
+    empty_path.write_bytes(b'')
+    assert list(iter_mapped_lines(empty_path)) == []
+
+
+def test_mmap_rows_match_file_rows(tmp_path):
+    csv_path = pills_csv(tmp_path / 'drugs.csv', trailing_newline=False)
+    assert list(iter_csv_rows(csv_path, use_mmap=True)) == list(iter_csv_rows(csv_path))
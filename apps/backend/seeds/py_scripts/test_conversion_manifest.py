@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental re-conversion: converter fingerprints must change when
+any local module a converter depends on is edited, and unchanged rows reuse
+the previous output's items without changing the result.
+
+Run from this directory: python -m pytest test_conversion_manifest.py
+"""
+
+import importlib
+import json
+import sys
+
+import pytest
+
+import transform_pills_to_inventory
+from conversion_manifest import convert_csv_incremental, converter_fingerprint, local_dependencies
+from inventory_io import iter_records
+
+HELPER_SOURCE = '''
+def label(name):
+    return name.strip().upper()
+'''
+
+CONVERTER_SOURCE = '''
+from fixture_label_helper import label
+
+
+def build_item(category, name):
+    return {'name': label(name), 'category': category}
+'''
+
+SPEC = {'category': 'Fixture', 'converter': 'fixture_label_converter', 'columns': {'name': 'Name'}}
+
+
+def load_converter(directory, monkeypatch):
+    """Write the fixture converter and helper into directory and import them."""
+    (directory / 'fixture_label_helper.py').write_text(HELPER_SOURCE, encoding='utf-8')
+    (directory / 'fixture_label_converter.py').write_text(CONVERTER_SOURCE, encoding='utf-8')
+    monkeypatch.syspath_prepend(str(directory))
+    # Edits within the same second must not be shadowed by cached bytecode
+    monkeypatch.setattr(sys, 'dont_write_bytecode', True)
+    for name in ('fixture_label_helper', 'fixture_label_converter'):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    return importlib.import_module('fixture_label_converter')
+
+
+def test_shared_modules_are_dependencies():
+    names = {path.name for path in local_dependencies(transform_pills_to_inventory.__file__)}
+    assert {'transform_pills_to_inventory.py', 'expiry_dates.py', 'inventory_model.py', 'column_specs.py'} <= names
+
+
+def test_editing_shared_helper_invalidates_manifest(tmp_path, monkeypatch):
+    modules = tmp_path / 'converters'
+    modules.mkdir()
+    converter = load_converter(modules, monkeypatch)
+    csv_path = tmp_path / 'fixture.csv'
+    csv_path.write_text('Name\nalpha\nbeta\n', encoding='utf-8')
+    output_path = tmp_path / 'fixture.json'
+
+    fingerprint = converter_fingerprint(converter, SPEC)
+    entry, stats = convert_csv_incremental(csv_path, output_path, converter.build_item, SPEC, fingerprint)
+    assert stats['transformed'] == 2
+
+    # Unchanged sources: the whole file is skipped
+    _, stats = convert_csv_incremental(csv_path, output_path, converter.build_item, SPEC,
+                                       converter_fingerprint(converter, SPEC), entry)
+    assert stats['skipped']
+
+    # Editing only the helper changes the fingerprint and re-converts every row
+    (modules / 'fixture_label_helper.py').write_text(HELPER_SOURCE.replace('upper', 'lower'), encoding='utf-8')
+    importlib.reload(importlib.import_module('fixture_label_helper'))
+    converter = importlib.reload(converter)
+    new_fingerprint = converter_fingerprint(converter, SPEC)
+    assert new_fingerprint != fingerprint
+
+    _, stats = convert_csv_incremental(csv_path, output_path, converter.build_item, SPEC, new_fingerprint, entry)
+    assert not stats['skipped']
+    assert stats['transformed'] == 2 and stats['reused'] == 0
+    with open(output_path, 'r', encoding='utf-8') as f:
+        assert [item['name'] for item in json.load(f)] == ['alpha', 'beta']
+
+
+NOTE_SPEC = {'category': 'Fixture', 'columns': {'name': 'Name', 'note': 'Note'}}
+
+
+def build_note_item(category, name, note):
+    return {'name': name, 'category': category, 'note': note}
+
+
+def write_csv(path, rows):
+    path.write_text('Name,Note\n' + ''.join(f"{name},{note}\n" for name, note in rows), encoding='utf-8')
+
+
+def convert_notes(csv_path, output_path, entry=None):
+    return convert_csv_incremental(csv_path, output_path, build_note_item, NOTE_SPEC, 'notes', entry)
+
+
+def read_output(output_path):
+    return list(iter_records(output_path))
+
+
+@pytest.mark.parametrize('output_name', ['notes.json', 'notes.jsonl.gz'])
+def test_unchanged_rows_reuse_previous_items(tmp_path, output_name):
+    csv_path = tmp_path / 'notes.csv'
+    output_path = tmp_path / output_name
+    write_csv(csv_path, [('a', 1), ('b', 2), ('c', 3), ('d', 4)])
+    entry, _ = convert_notes(csv_path, output_path)
+
+    write_csv(csv_path, [('a', 1), ('b', 2), ('c', 30), ('d', 4), ('e', 5)])
+    entry, stats = convert_notes(csv_path, output_path, entry)
+    assert (stats['reused'], stats['transformed']) == (3, 2)
+
+    fresh_path = tmp_path / f"fresh_{output_name}"
+    convert_notes(csv_path, fresh_path)
+    assert read_output(output_path) == read_output(fresh_path)
+    assert [item['note'] for item in read_output(output_path)] == ['1', '2', '30', '4', '5']
+
+
+def test_rows_moved_up_are_converted_again(tmp_path):
+    csv_path = tmp_path / 'notes.csv'
+    output_path = tmp_path / 'notes.json'
+    write_csv(csv_path, [('a', 1), ('b', 2), ('c', 3), ('d', 4)])
+    entry, _ = convert_notes(csv_path, output_path)
+
+    # The old output is read forward only: once d is reused, a-c are behind it
+    write_csv(csv_path, [('d', 4), ('a', 1), ('b', 2), ('c', 3)])
+    _, stats = convert_notes(csv_path, output_path, entry)
+    assert (stats['reused'], stats['transformed']) == (1, 3)
+    assert [item['name'] for item in read_output(output_path)] == ['d', 'a', 'b', 'c']
+
+
+def test_duplicate_names_are_not_reused(tmp_path):
+    csv_path = tmp_path / 'notes.csv'
+    output_path = tmp_path / 'notes.json'
+    write_csv(csv_path, [('a', 1), ('b', 2), ('a', 3)])
+    entry, _ = convert_notes(csv_path, output_path)
+    assert set(entry['rows']) == {'b'}
+
+    write_csv(csv_path, [('a', 1), ('b', 2), ('a', 3), ('c', 4)])
+    _, stats = convert_notes(csv_path, output_path, entry)
+    assert (stats['reused'], stats['transformed']) == (1, 3)
+    assert [item['note'] for item in read_output(output_path)] == ['1', '2', '3', '4']
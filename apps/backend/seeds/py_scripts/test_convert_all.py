@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for converting every category sheet in a directory: sheets are matched
+to their specs by file name, each output matches its converter run on its
+own, and re-runs skip sheets that have not changed.
+
+Run from this directory: python -m pytest test_convert_all.py
+"""
+
+import gzip
+import json
+from pathlib import Path
+
+import convert_consumables
+import transform_pills_to_inventory
+from column_specs import get_spec
+from conversion_engine import convert_csv
+from convert_all import convert_all, find_category_csvs
+
+DRUGS_CSV = (
+    'Pills,Pack/Container,Card,Tablets,Exp. Date,Exp. Date 2\n'
+    'Amoxil 500mg,2,20,200,03/30,5/26\n'
+    'Paracetamol 500mg,-,10,100,06/2026,\n'
+    ',,,,,\n'
+)
+CONSUMABLES_CSV = (
+    'Item,Pack,Units,Expiry Date\n'
+    'Syringe 5ml,3,300,01/28\n'
+    'Cotton wool,,12,-\n'
+)
+
+
+def write_sheets(csv_dir):
+    csv_dir.mkdir()
+    (csv_dir / 'Drugs.csv').write_text(DRUGS_CSV, encoding='utf-8')
+    with gzip.open(csv_dir / 'consumables.csv.gz', 'wt', encoding='utf-8') as f:
+        f.write(CONSUMABLES_CSV)
+    (csv_dir / 'notes.csv').write_text('Not,A,Sheet\n', encoding='utf-8')
+
+
+def test_sheets_are_matched_case_insensitively(tmp_path):
+    csv_dir = tmp_path / 'csv'
+    write_sheets(csv_dir)
+    # A plain export wins over a compressed one of the same sheet
+    (csv_dir / 'drugs.csv.gz').write_bytes(gzip.compress(DRUGS_CSV.encode('utf-8')))
+
+    jobs = find_category_csvs(csv_dir)
+    assert [(spec['category'], path.name) for spec, path in jobs] == [
+        ('Drug', 'Drugs.csv'), ('Consumable', 'consumables.csv.gz')]
+
+
+def test_outputs_match_each_converter_and_reruns_skip(tmp_path):
+    csv_dir = tmp_path / 'csv'
+    output_dir = tmp_path / 'inventory'
+    write_sheets(csv_dir)
+
+    summaries = convert_all(csv_dir, output_dir, workers=2)
+    assert [(summary['category'], summary['items'], summary['skipped']) for summary in summaries] == [
+        ('Drug', 2, False), ('Consumable', 2, False)]
+
+    convert_csv(csv_dir / 'Drugs.csv', tmp_path / 'drugs.json',
+                transform_pills_to_inventory.build_item, get_spec('Drug'))
+    convert_csv(csv_dir / 'consumables.csv.gz', tmp_path / 'consumables.json',
+                convert_consumables.build_item, get_spec('Consumable'))
+    for name in ('drugs.json', 'consumables.json'):
+        assert (output_dir / name).read_bytes() == (tmp_path / name).read_bytes()
+
+    # Nothing changed: both sheets are skipped
+    assert [summary['skipped'] for summary in convert_all(csv_dir, output_dir, workers=2)] == [True, True]
+
+    # One changed row in one sheet: only that row is transformed again
+    (csv_dir / 'Drugs.csv').write_text(DRUGS_CSV.replace('2,20,200', '3,30,300'), encoding='utf-8')
+    drugs, consumables = convert_all(csv_dir, output_dir, workers=2)
+    assert (drugs['skipped'], drugs['transformed'], drugs['reused']) == (False, 2, 1)
+    assert consumables['skipped']
+
+    # --force rebuilds everything
+    assert [summary['transformed'] for summary in convert_all(csv_dir, output_dir, workers=2, force=True)] == [3, 2]
+
+
+def test_json_lines_and_compressed_outputs(tmp_path):
+    csv_dir = tmp_path / 'csv'
+    output_dir = tmp_path / 'inventory'
+    write_sheets(csv_dir)
+
+    summaries = convert_all(csv_dir, output_dir, workers=1, output_format='jsonl', compression='gz')
+    assert [Path(summary['output']).name for summary in summaries] == [
+        'drugs.jsonl.gz', 'consumables.jsonl.gz']
+    with gzip.open(output_dir / 'drugs.jsonl.gz', 'rt', encoding='utf-8') as f:
+        assert [json.loads(line)['name'] for line in f] == ['Amoxil 500mg', 'Paracetamol 500mg']
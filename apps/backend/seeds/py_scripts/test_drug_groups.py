@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Tests for grouping identical drugs: a brand name with its ingredient in
+brackets groups with the generic, but brackets naming a maker or a form do
+not make different products look the same.
+
+Run from this directory: python -m pytest test_drug_groups.py
+"""
+
+from drug_groups import group_drugs, group_key
+
+
+def drug(name, *units):
+    return {'name': name, 'units': [{'name': unit} for unit in units or ('Pack', 'Card', 'Tablet')]}
+
+
+def grouped_names(*drugs):
+    return [[member['name'] for _, member in members] for _, members in group_drugs(enumerate(drugs))]
+
+
+def test_brand_groups_with_generic():
+    assert group_key(drug('Diamet (metformin 500mg)')) == group_key(drug('Metformin 500 mg tabs'))
+    assert group_key(drug('Oxyurea capsules (Hydroxyurea)')) == group_key(drug('Hydroxyurea capsules'))
+    assert group_key(drug('Kinvox 750mg (levofloxacin)')) == group_key(drug('Levofloxacin 750mg'))
+    assert group_key(drug('Tagrol(Carbamazepine)')) == group_key(drug('Carbamazepine'))
+
+
+def test_combinations_in_brackets_are_ingredients():
+    assert group_key(drug('Glepid-plus(glimepiride 2mg + met 500mg)')).startswith('glimepiride + met 2mg 500mg|')
+    assert group_key(drug('Dolopain(Vit B1,6,12)')).startswith('vit b1 6 12|')
+
+
+def test_makers_and_forms_in_brackets_are_not_ingredients():
+    assert grouped_names(
+        drug('Fluconazole (Pinnacle) 200mg'),
+        drug('Fluconazole (Emzor) 200mg'),
+        drug('Ibuprofen (Emzor) 200mg'),
+        drug('Dequadin (Lozenges)'),
+        drug('Strepsils (Lozenges)'),
+    ) == [['Fluconazole (Pinnacle) 200mg'], ['Fluconazole (Emzor) 200mg'], ['Ibuprofen (Emzor) 200mg'],
+          ['Dequadin (Lozenges)'], ['Strepsils (Lozenges)']]
+
+
+def test_bracketed_strength_alone_is_not_an_ingredient():
+    assert group_key(drug('Panadol (500mg)')) != group_key(drug('Amoxil (500mg)'))
+
+
+def test_groups_need_the_same_unit_chain():
+    assert grouped_names(
+        drug('Eficef (cefixime 200mg)'),
+        drug('Trafix(Cefixime 200mg)'),
+        drug('Cefixime 200mg', 'Pack', 'Capsule'),
+    ) == [['Eficef (cefixime 200mg)', 'Trafix(Cefixime 200mg)'], ['Cefixime 200mg']]
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Tests for expiry date normalization: the MM/YY and MM/YYYY cells the stock
+sheets use, and everything else coming back as None rather than raising.
+
+Run from this directory: python -m pytest test_expiry_dates.py
+"""
+
+import pytest
+
+from expiry_dates import earliest_and_later, expiry_to_iso, normalize_expiry, normalize_expiry_column
+
+
+@pytest.mark.parametrize('value, iso', [
+    ('03/30', '2030-03-01'),
+    ('5/26', '2026-05-01'),
+    ('06/2026', '2026-06-01'),
+    (' 12 / 27 ', '2027-12-01'),
+    ('1/5', '2005-01-01'),
+])
+def test_month_year_formats(value, iso):
+    assert expiry_to_iso(value) == iso
+
+
+@pytest.mark.parametrize('value', [
+    None, '', '  ', '-', 'N/A', 'n/a',
+    '13/26', '0/26', '03/026', '03/20266', '03-2026', '03/26/01', 'Mar/26', '03/',
+    # Digits str.isdigit() accepts but int() does not
+    '0²/26', '03/2²', '①/26',
+])
+def test_unparseable_values_are_none(value):
+    assert normalize_expiry(value) is None
+
+
+def test_sort_key_orders_by_month():
+    assert normalize_expiry('12/25').sort_key + 1 == normalize_expiry('01/26').sort_key
+
+
+def test_column_keeps_input_order():
+    assert [parsed and parsed.iso for parsed in normalize_expiry_column(['03/30', '-', '03/30', '1/26'])] == \
+        ['2030-03-01', None, '2030-03-01', '2026-01-01']
+
+
+def test_earliest_and_later():
+    assert earliest_and_later('06/2027', '-', '03/26', '6/27', '01/28') == \
+        ('2026-03-01', ['2027-06-01', '2028-01-01'])
+    assert earliest_and_later('', None) == (None, [])
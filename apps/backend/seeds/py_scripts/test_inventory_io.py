@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Tests for reading and writing inventory files: JSON Lines round trips,
+JSON arrays parsed one element at a time, accepting exactly what json.load
+does, and serializer backends whose pretty output matches json.dump.
+
+Run from this directory: python -m pytest test_inventory_io.py
+"""
+
+import io
+import json
+
+import pytest
+
+from inventory_io import (
+    SERIALIZERS,
+    get_serializer,
+    is_json_lines,
+    iter_json_array,
+    iter_records,
+    load_items,
+    save_items,
+    serializer_name,
+    set_serializer,
+    temporary_path,
+    write_items,
+    write_json_lines,
+)
+from inventory_model import InventoryItem
+from quick_add_structures import process_drugs
+
+ITEMS = [
+    {'name': 'Amoxil 500mg', 'category': 'Drug',
+     'units': [{'name': 'Pack', 'plural': 'Packs', 'quantity': 2}, {'name': 'Card', 'plural': 'Cards', 'quantity': 20}],
+     'laterExpiryDates': []},
+    {'name': 'Syrup "Junior"\nline', 'category': 'Suspension or Syrup', 'units': [], 'laterExpiryDates': ['2030-01-01']},
+]
+
+ARRAYS = [
+    '[]',
+    ' [ ]\n',
+    '[1,2,3]',
+    '[{"a": [1, {"b": "x]"}]}, 12345, true, null, "s,"]',
+    '[\n  {\n    "name": "Paracétamol"\n  }\n]\n',
+    '[1e5, -0.5, 10,1.25E-3 ,false]',
+]
+
+
+@pytest.mark.parametrize('text', ARRAYS)
+@pytest.mark.parametrize('read_size', [1, 2, 3, 7, 1 << 16])
+def test_json_array_matches_json_load(text, read_size):
+    assert list(iter_json_array(io.StringIO(text), read_size)) == json.loads(text)
+
+
+@pytest.mark.parametrize('text', ['', '{}', '[1,]', '[1 2]', '[1', '[1] x', '[,1]', '[', '[{}x]', '[tru]'])
+@pytest.mark.parametrize('read_size', [1, 4, 1 << 16])
+def test_malformed_json_array_raises(text, read_size):
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array(io.StringIO(text), read_size))
+
+
+@pytest.mark.parametrize('name', ['drugs.jsonl', 'drugs.ndjson', 'drugs.JSONL', 'drugs.jsonl.gz'])
+def test_json_lines_round_trip(tmp_path, name):
+    path = tmp_path / name
+    assert is_json_lines(path)
+    assert save_items([InventoryItem.from_dict(item) for item in ITEMS], path) == 2
+    assert list(iter_records(path)) == ITEMS
+    assert load_items(path) == ITEMS
+
+
+def test_json_lines_are_one_object_per_line(tmp_path):
+    path = tmp_path / 'drugs.jsonl'
+    save_items(ITEMS, path)
+    lines = path.read_text(encoding='utf-8').split('\n')
+    assert lines[-1] == '' and [json.loads(line) for line in lines[:-1]] == ITEMS
+
+    # Appending adds records after the existing ones
+    write_json_lines(ITEMS[:1], path, append=True)
+    assert [item['name'] for item in iter_records(path)] == ['Amoxil 500mg', 'Syrup "Junior"\nline', 'Amoxil 500mg']
+
+
+def test_json_lines_skip_blank_lines_and_report_bad_ones(tmp_path):
+    path = tmp_path / 'drugs.jsonl'
+    path.write_text('\n' + json.dumps(ITEMS[0]) + '\n  \n{"name": \n', encoding='utf-8')
+    with pytest.raises(ValueError, match=r'drugs.jsonl:4: invalid JSON Lines record'):
+        list(iter_records(path))
+    path.write_text('\n' + json.dumps(ITEMS[0]) + '\n\n', encoding='utf-8')
+    assert list(iter_records(path)) == ITEMS[:1]
+
+
+def test_json_array_and_json_lines_hold_the_same_items(tmp_path):
+    save_items(ITEMS, tmp_path / 'drugs.json')
+    save_items(load_items(tmp_path / 'drugs.json'), tmp_path / 'drugs.jsonl')
+    assert not is_json_lines(tmp_path / 'drugs.json')
+    assert load_items(tmp_path / 'drugs.jsonl') == ITEMS
+    assert json.loads((tmp_path / 'drugs.json').read_text(encoding='utf-8')) == ITEMS
+
+
+def test_temporary_path_keeps_format_suffixes():
+    assert temporary_path('inventory/drugs.jsonl.gz').name == 'drugs.tmp.jsonl.gz'
+    assert temporary_path('drugs.json').name == 'drugs.tmp.json'
+
+
+def test_scripts_rewrite_json_lines_in_place(tmp_path):
+    path = tmp_path / 'drugs.jsonl'
+    save_items(ITEMS, path)
+    process_drugs(path)
+    lines = path.read_text(encoding='utf-8').splitlines()
+    assert [json.loads(line)['packagingStructure'] for line in lines] == [
+        [{'unit': 'Pack', 'contains': 10, 'of': 'Card'}], []]
+    assert not temporary_path(path).exists()
+
+
+@pytest.fixture(params=['stdlib', 'orjson'])
+def serializer(request):
+    if request.param not in SERIALIZERS:
+        pytest.skip(f"{request.param} is not installed")
+    previous = set_serializer(request.param)
+    yield request.param
+    set_serializer(previous)
+
+
+SERIALIZED = ITEMS + [
+    {'name': 'Ibuprofène 400 mg – 中文', 'category': 'Drug', 'isActive': True, 'minStockLevel': None,
+     'units': [{'name': 'Tablet', 'plural': 'Tablets', 'quantity': 12345678901234567890}],
+     'tags': [], 'notes': {}},
+]
+
+
+def test_pretty_output_matches_json_dump(tmp_path, serializer):
+    assert serializer_name() == serializer
+    path = tmp_path / 'drugs.json'
+    assert write_items(SERIALIZED, path) == 3
+    assert path.read_text(encoding='utf-8') == json.dumps(SERIALIZED, indent=2, ensure_ascii=False)
+
+    write_items([], path)
+    assert path.read_text(encoding='utf-8') == '[]'
+
+
+def test_compact_output_has_no_whitespace(tmp_path, serializer):
+    path = tmp_path / 'drugs.json'
+    write_items(SERIALIZED, path, compact=True)
+    text = path.read_text(encoding='utf-8')
+    assert text == json.dumps(SERIALIZED, ensure_ascii=False, separators=(',', ':'))
+    assert load_items(path) == SERIALIZED
+
+
+def test_unknown_serializer_is_rejected(monkeypatch):
+    with pytest.raises(ValueError, match="'simdjson' is not available"):
+        get_serializer('simdjson')
+    with pytest.raises(ValueError):
+        set_serializer('simdjson')
+    assert serializer_name() in SERIALIZERS
+
+    monkeypatch.setenv('SEED_JSON_SERIALIZER', 'stdlib')
+    assert get_serializer().name == 'stdlib'
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for the compact item model: items round-trip to the same JSON object,
+key order and unknown keys included, and support the dict-style access the
+scripts use.
+
+Run from this directory: python -m pytest test_inventory_model.py
+"""
+
+import json
+
+import pytest
+
+from inventory_model import InventoryItem, PackagingLevel, Quantity, Unit, to_plain
+
+DRUG = {
+    'name': 'Amoxil 500mg',
+    'category': 'Drug',
+    'units': [{'name': 'Pack', 'plural': 'Packs', 'quantity': 2},
+              {'name': 'Capsule', 'plural': 'Capsules', 'quantity': 200}],
+    'quantities': [{'name': 'Pack', 'quantity': 2}],
+    'earliestExpiryDate': '2026-05-01',
+    'laterExpiryDates': ['2030-03-01'],
+    'packagingStructure': [{'unit': 'Pack', 'contains': 100, 'of': 'Capsule'}],
+}
+
+
+def test_round_trips_to_the_same_json():
+    item = InventoryItem.from_dict(json.loads(json.dumps(DRUG)))
+    assert json.dumps(item.to_dict()) == json.dumps(DRUG)
+    assert isinstance(item['units'][0], Unit)
+    assert isinstance(item['quantities'][0], Quantity)
+    assert isinstance(item['packagingStructure'][0], PackagingLevel)
+
+
+def test_unknown_keys_and_odd_records_are_kept_in_order():
+    data = {
+        'sku': 'X-1',
+        'name': 'Odd',
+        'units': [{'plural': 'Packs', 'name': 'Pack', 'quantity': 1},
+                  {'name': 'Tablet', 'plural': 'Tablets', 'quantity': 1.5, 'note': 'x'}],
+        'notes': {'a': [1]},
+    }
+    item = InventoryItem.from_dict(data)
+    assert list(item) == ['sku', 'name', 'units', 'notes']
+    assert json.dumps(to_plain(item)) == json.dumps(data)
+    assert not any(isinstance(unit, Unit) for unit in item['units'])
+
+
+def test_dict_style_access():
+    item = InventoryItem(name='Amoxil', category='Drug', units=[Unit('Pack', 'Packs', 2)], laterExpiryDates=[])
+    assert item['units'][0]['name'] == 'Pack' and item['units'][0].get('missing', 0) == 0
+    assert 'packagingStructure' not in item and item.get('packagingStructure') is None
+
+    item['packagingStructure'] = [{'unit': 'Pack', 'contains': 10, 'of': 'Card'}]
+    assert isinstance(item['packagingStructure'][0], PackagingLevel)
+    assert list(item.keys())[-1] == 'packagingStructure'
+
+    item['units'][0]['quantity'] = 3
+    del item['laterExpiryDates']
+    assert item == {
+        'name': 'Amoxil', 'category': 'Drug', 'units': [{'name': 'Pack', 'plural': 'Packs', 'quantity': 3}],
+        'packagingStructure': [{'unit': 'Pack', 'contains': 10, 'of': 'Card'}],
+    }
+    with pytest.raises(KeyError):
+        item['laterExpiryDates']
+    with pytest.raises(KeyError):
+        item['units'][0]['colour'] = 'red'
+
+
+def test_items_share_layouts_and_strings():
+    first = InventoryItem.from_dict(json.loads(json.dumps(DRUG)))
+    second = InventoryItem.from_dict(json.loads(json.dumps(DRUG)))
+    assert first.layout is second.layout
+    assert first['units'][0]['plural'] is second['units'][0]['plural']
+    assert first['earliestExpiryDate'] is second['earliestExpiryDate']
+    assert not hasattr(first, '__dict__')
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Tests for binary inventory snapshots: every item reads back exactly as in
+its source file, whether it fits the fixed layout or not, and a snapshot is
+rebuilt when its source changes.
+
+Run from this directory: python -m pytest test_inventory_snapshot.py
+"""
+
+import json
+import os
+
+import pytest
+
+from inventory_io import iter_records, save_items
+from inventory_snapshot import (
+    InventorySnapshot,
+    build_snapshot,
+    load_snapshot_items,
+    open_snapshot,
+    snapshot_path_for,
+)
+
+ITEMS = [
+    {'name': 'Amoxil 500mg', 'category': 'Drug',
+     'units': [{'name': 'Pack', 'plural': 'Packs', 'quantity': 2},
+               {'name': 'Capsule', 'plural': 'Capsules', 'quantity': 200}],
+     'quantities': [{'name': 'Pack', 'quantity': 2}],
+     'earliestExpiryDate': '2026-05-01', 'laterExpiryDates': ['2030-03-01', '2031-01-01'],
+     'packagingStructure': [{'unit': 'Pack', 'contains': 100, 'of': 'Capsule'}]},
+    # Key order differs, no expiry: still the fixed layout
+    {'category': 'Drug', 'name': 'Paracétamol', 'units': [], 'laterExpiryDates': []},
+    # Do not fit the fixed layout: stored as JSON text
+    {'name': 'Odd', 'category': 'Drug', 'sku': 'X-1', 'units': []},
+    {'name': 'Float', 'units': [{'name': 'Bottle', 'plural': 'Bottles', 'quantity': 1.5}]},
+    {'name': 'Huge', 'units': [{'name': 'Tablet', 'plural': 'Tablets', 'quantity': 2 ** 70}]},
+    {'name': None, 'category': 'Drug'},
+]
+
+
+@pytest.mark.parametrize('source_name', ['drugs.json', 'drugs.jsonl.gz'])
+def test_items_read_back_exactly(tmp_path, source_name):
+    source = tmp_path / source_name
+    save_items(ITEMS, source)
+    with open_snapshot(source) as snapshot:
+        assert len(snapshot) == len(ITEMS)
+        assert [json.dumps(item.to_dict()) for item in snapshot] == [json.dumps(item) for item in ITEMS]
+        assert snapshot[-1] == ITEMS[-1] and snapshot[1:3] == ITEMS[1:3]
+        assert [snapshot.name(i) for i in range(len(snapshot))] == [item['name'] for item in ITEMS]
+        with pytest.raises(IndexError):
+            snapshot[len(ITEMS)]
+
+
+def test_snapshot_is_reused_until_the_source_changes(tmp_path):
+    source = tmp_path / 'drugs.json'
+    save_items(ITEMS, source)
+    snapshot_path = build_snapshot(source)
+    assert snapshot_path == snapshot_path_for(source)
+    built = snapshot_path.stat().st_mtime_ns
+
+    # Touching the source without changing it keeps the snapshot
+    os.utime(source, ns=(built + 10 ** 9, built + 10 ** 9))
+    open_snapshot(source).close()
+    assert snapshot_path.stat().st_mtime_ns == built
+
+    save_items(ITEMS[:2], source)
+    assert load_snapshot_items(source) == ITEMS[:2]
+    assert load_snapshot_items(source) == list(iter_records(source))
+
+
+def test_corrupt_snapshot_is_rebuilt(tmp_path):
+    source = tmp_path / 'drugs.json'
+    save_items(ITEMS, source)
+    snapshot_path_for(source).write_bytes(b'not a snapshot' * 10)
+    with pytest.raises(ValueError):
+        InventorySnapshot(snapshot_path_for(source))
+    assert load_snapshot_items(source) == ITEMS
+
+    # Too short to hold a header
+    snapshot_path_for(source).write_bytes(b'INVSNAP')
+    assert load_snapshot_items(source) == ITEMS
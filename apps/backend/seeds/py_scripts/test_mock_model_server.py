@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Tests for the mock chat-completions server: it reads the drugs out of both
+prompt templates, answers in every reply shape the adder can parse, and
+misbehaves (server errors, rate limits, cut-off replies, dropped drugs) as
+configured. The server runs in this process on a free port.
+
+Run from this directory: python -m pytest test_mock_model_server.py
+"""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from add_packaging_structure import PackagingStructureAdder
+from mock_model_server import SHAPES, MockConfig, format_reply, make_server, packaging_structure, prompt_drugs
+
+
+def drug(name, *units):
+    return {'name': name, 'units': [{'name': unit, 'plural': f"{unit}s", 'quantity': 1} for unit in units]}
+
+
+BATCH = [
+    (0, drug('Amoxil 500mg', 'Pack', 'Card', 'Capsule')),
+    (1, drug('Ciproxin 500mg', 'Pack', 'Tablet')),
+    (2, drug('Gabapentin 300mg', 'Container', 'Tablet')),
+]
+
+
+def prompt(template):
+    adder = PackagingStructureAdder('drugs.json', prompt_template=template)
+    return adder.format_prompt_for_batch(BATCH)
+
+
+@pytest.fixture
+def serve():
+    """Start a mock server with the given MockConfig; returns its base URL."""
+    servers = []
+
+    def start(config):
+        server = make_server(config, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def request(url, body=None):
+    """(status, headers, JSON body) for a GET, or a POST when body is given."""
+    data = None if body is None else json.dumps(body).encode('utf-8')
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data), timeout=10) as response:
+            return response.status, response.headers, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, json.load(e)
+
+
+def complete(url, text, max_tokens=None):
+    return request(f"{url}/v1/chat/completions",
+                   {'model': 'mock', 'max_tokens': max_tokens, 'messages': [{'role': 'user', 'content': text}]})
+
+
+def quiet(**options):
+    return MockConfig(latency=0, latency_per_drug=0, jitter=0, seed=1, **options)
+
+
+@pytest.mark.parametrize('template', ['compact', 'verbose'])
+def test_prompt_drugs_reads_both_templates(template):
+    drugs, compact = prompt_drugs(prompt(template))
+    assert compact == (template == 'compact')
+    assert drugs == [('Amoxil 500mg', ['Pack', 'Card', 'Capsule']), ('Ciproxin 500mg', ['Pack', 'Tablet']),
+                     ('Gabapentin 300mg', ['Container', 'Tablet'])]
+
+
+def test_structures_are_plausible_and_repeatable():
+    structure = packaging_structure('Amoxil 500mg', ['Pack', 'Card', 'Capsule'])
+    assert [(level['unit'], level['of']) for level in structure] == [('Pack', 'Card'), ('Card', 'Capsule')]
+    assert structure[0]['contains'] in (10, 3, 5, 2) and structure[1]['contains'] in (10, 14, 6)
+    assert packaging_structure('Amoxil 500mg', ['Pack', 'Card', 'Capsule']) == structure
+    assert packaging_structure('Flagyl', ['Tablet']) == []
+
+
+@pytest.mark.parametrize('shape', SHAPES)
+def test_every_reply_shape_parses(shape):
+    results = [{'n': 1, 'contains': [10]}]
+    assert PackagingStructureAdder.parse_reply(format_reply(results, shape))[0] == results
+
+
+@pytest.mark.parametrize('template', ['compact', 'verbose'])
+def test_replies_match_the_prompted_drugs(serve, template):
+    url = serve(quiet(shapes=SHAPES))
+    for _ in range(4):
+        status, _, body = complete(url, prompt(template))
+        assert status == 200
+        assert body['choices'][0]['finish_reason'] == 'stop'
+        assert body['usage']['total_tokens'] == body['usage']['prompt_tokens'] + body['usage']['completion_tokens']
+        results, _ = PackagingStructureAdder.parse_reply(body['choices'][0]['message']['content'])
+        matched = PackagingStructureAdder.match_results(BATCH, results)
+        assert {idx: [level['contains'] for level in structure] for idx, structure in matched.items()} == {
+            idx: [level['contains'] for level in packaging_structure(item['name'], [u['name'] for u in item['units']])]
+            for idx, item in BATCH}
+
+    _, _, stats = request(f"{url}/stats")
+    assert (stats['requests'], stats['drugs'], stats['in_flight']) == (4, 12, 0)
+
+
+def test_errors_and_rate_limits(serve):
+    status, headers, body = complete(serve(quiet(error_rate=1.0)), prompt('compact'))
+    assert status == 503 and body['error']['type'] == 'server_error'
+
+    status, headers, body = complete(serve(quiet(rate_limit_rate=1.0, retry_after=3)), prompt('compact'))
+    assert status == 429 and headers['Retry-After'] == '3'
+
+
+def test_long_replies_are_cut_off(serve):
+    url = serve(quiet())
+    status, _, body = complete(url, prompt('verbose'), max_tokens=20)
+    assert status == 200
+    assert body['choices'][0]['finish_reason'] == 'length'
+    assert body['usage']['completion_tokens'] == 20
+    with pytest.raises(ValueError):
+        PackagingStructureAdder.parse_reply(body['choices'][0]['message']['content'])
+    assert request(f"{url}/stats")[2]['truncated'] == 1
+
+
+def test_dropped_drugs_and_bad_requests(serve):
+    url = serve(quiet(drop_rate=1.0))
+    _, _, body = complete(url, prompt('compact'))
+    results, _ = PackagingStructureAdder.parse_reply(body['choices'][0]['message']['content'])
+    assert len(results) == 2
+
+    assert request(f"{url}/v1/embeddings", {})[0] == 404
+    assert request(f"{url}/nowhere")[0] == 404
+
+
+def test_adder_settles_a_batch_against_the_server(serve, tmp_path, monkeypatch):
+    pytest.importorskip('openai')
+    monkeypatch.setenv('OPENAI_API_KEY', 'mock')
+    adder = PackagingStructureAdder(str(tmp_path / 'drugs.json'), base_url=f"{serve(quiet())}/v1")
+    settled, failed = adder.settle_batch(BATCH)
+    assert failed == []
+    (sent, results), = settled
+    assert sorted(PackagingStructureAdder.match_results(sent, results)) == [0, 1, 2]
+    call, = adder.metrics.calls
+    assert (call['matched'], call['parse_path']) == (3, 'drugs')
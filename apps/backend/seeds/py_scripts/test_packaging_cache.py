@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for the packaging structure cache: answers persist across runs, keys
+ignore case and spacing but not the unit chain, eviction drops old and
+least recently used entries, and lookups are counted for the hit rate.
+
+Run from this directory: python -m pytest test_packaging_cache.py
+"""
+
+import pytest
+
+import packaging_cache
+from inventory_model import InventoryItem
+from packaging_cache import PackagingCache, cache_key, normalize_name
+
+
+def drug(name, *units):
+    return {'name': name, 'units': [{'name': unit, 'plural': f"{unit}s", 'quantity': 1} for unit in units]}
+
+
+AMOXIL = drug('Amoxil 500mg', 'Pack', 'Card', 'Capsule')
+STRUCTURE = [{'unit': 'Pack', 'contains': 10, 'of': 'Card'}, {'unit': 'Card', 'contains': 10, 'of': 'Capsule'}]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.time() for the cache module."""
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(packaging_cache.time, 'time', lambda: now[0])
+    return now
+
+
+def test_keys_ignore_case_and_spacing_but_not_units():
+    assert normalize_name('  AMOXIL\t 500MG ') == 'amoxil 500mg'
+    assert cache_key(drug(' amoxil  500MG', 'Pack', 'Card', 'Capsule')) == cache_key(AMOXIL)
+    assert cache_key(AMOXIL) == 'amoxil 500mg|Pack -> Card -> Capsule'
+    assert cache_key(drug('Amoxil 500mg', 'Card', 'Capsule')) != cache_key(AMOXIL)
+
+
+def test_entries_persist_across_runs(tmp_path):
+    path = tmp_path / 'cache.sqlite'
+    with PackagingCache(path) as cache:
+        assert cache.get(AMOXIL) is None
+        # InventoryItem levels are stored as plain dicts
+        cache.put(AMOXIL, InventoryItem.from_dict({**AMOXIL, 'packagingStructure': STRUCTURE})['packagingStructure'])
+        cache.commit()
+
+    with PackagingCache(path) as cache:
+        assert len(cache) == 1
+        assert cache.peek(drug('AMOXIL 500MG', 'Pack', 'Card', 'Capsule'))
+        assert cache.get(drug('amoxil 500mg', 'Pack', 'Card', 'Capsule')) == STRUCTURE
+        assert cache.get(drug('Amoxil 500mg', 'Card', 'Capsule')) is None
+
+
+def test_put_replaces_an_existing_answer(tmp_path):
+    with PackagingCache(tmp_path / 'cache.sqlite') as cache:
+        cache.put(AMOXIL, STRUCTURE)
+        cache.put(AMOXIL, STRUCTURE[:1] + [{'unit': 'Card', 'contains': 14, 'of': 'Capsule'}])
+        assert len(cache) == 1
+        assert cache.get(AMOXIL)[1]['contains'] == 14
+
+
+def test_hit_rate_counts_lookups_not_peeks(tmp_path):
+    with PackagingCache(tmp_path / 'cache.sqlite') as cache:
+        assert cache.hit_rate == 0.0
+        cache.put(AMOXIL, STRUCTURE)
+        cache.peek(AMOXIL)
+        cache.get(AMOXIL)
+        cache.get(drug('Ciproxin 500mg', 'Pack', 'Tablet'))
+        cache.get(AMOXIL)
+        cache.get(drug('Flagyl 400mg', 'Tablet'))
+        assert (cache.hits, cache.lookups, cache.hit_rate) == (2, 4, 0.5)
+        assert cache.report().startswith('Cache: 2/4 hits (50.0%), 1 entries in ')
+
+
+def test_old_entries_are_evicted(tmp_path, clock):
+    path = tmp_path / 'cache.sqlite'
+    with PackagingCache(path) as cache:
+        cache.put(AMOXIL, STRUCTURE)
+        clock[0] += 20 * 86400
+        cache.put(drug('Ciproxin 500mg', 'Pack', 'Tablet'), STRUCTURE[:1])
+        cache.commit()
+
+    clock[0] += 15 * 86400
+    with PackagingCache(path, max_age_days=30) as cache:
+        assert len(cache) == 1 and not cache.peek(AMOXIL)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    drugs = [drug(f"Drug {i}", 'Pack', 'Tablet') for i in range(5)]
+    with PackagingCache(tmp_path / 'cache.sqlite', max_entries=3) as cache:
+        for item in drugs:
+            clock[0] += 1
+            cache.put(item, STRUCTURE[:1])
+        clock[0] += 1
+        cache.get(drugs[0])
+        assert cache.evict() == 2
+        assert [cache.peek(item) for item in drugs] == [True, False, False, True, True]
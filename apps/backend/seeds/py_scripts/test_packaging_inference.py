@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Tests for rules-first packaging inference: which rule answers a drug, with
+what confidence, and which drugs the adder fills in before calling the model.
+
+Run from this directory: python -m pytest test_packaging_inference.py
+"""
+
+import json
+
+from add_packaging_structure import PackagingStructureAdder
+from packaging_inference import (
+    AGREEMENT_CONFIDENCE,
+    CONVENTION_CONFIDENCE,
+    QUANTITY_CONFIDENCE,
+    SINGLE_PACK_CONFIDENCE,
+    infer,
+)
+
+
+def drug(name, *units, quantities=None):
+    item = {'name': name, 'units': [{'name': unit, 'quantity': quantity} for unit, quantity in units]}
+    if quantities is not None:
+        item['quantities'] = [{'name': unit, 'quantity': quantity} for unit, quantity in quantities]
+    return item
+
+
+def test_exact_ratios_across_several_packs():
+    inference = infer(drug('Amoxil 500mg', ('Pack', 2), ('Card', 20), ('Capsule', 200)))
+    assert inference.source == 'quantities'
+    assert inference.confidence == QUANTITY_CONFIDENCE
+    assert inference.structure == [{'unit': 'Pack', 'contains': 10, 'of': 'Card'},
+                                   {'unit': 'Card', 'contains': 10, 'of': 'Capsule'}]
+
+
+def test_single_pack_ratio_scores_lower_unless_conventions_agree():
+    opened = infer(drug('Gabapentin 300mg', ('Container', 1), ('Tablet', 37)))
+    assert (opened.source, opened.confidence) == ('quantities', SINGLE_PACK_CONFIDENCE)
+    assert opened.structure == [{'unit': 'Container', 'contains': 37, 'of': 'Tablet'}]
+
+    conventional = infer(drug('Paracetamol 500mg', ('Pack', 1), ('Card', 10), ('Tablet', 100)))
+    assert (conventional.source, conventional.confidence) == ('quantities', AGREEMENT_CONFIDENCE)
+
+
+def test_ratios_that_do_not_divide_fall_back_to_conventions():
+    inference = infer(drug('Metformin 500mg', ('Pack', 3), ('Card', 20), ('Tablet', 150)))
+    assert inference.source == 'conventions'
+    assert inference.confidence == CONVENTION_CONFIDENCE[('Pack', 'Card', 'Tablet')]
+
+
+def test_stock_quantities_are_preferred_to_unit_quantities():
+    inference = infer(drug('Amoxil 500mg', ('Pack', 0), ('Card', 0), ('Capsule', 0),
+                           quantities=[('Pack', 3), ('Card', 30), ('Capsule', 300)]))
+    assert (inference.source, inference.confidence) == ('quantities', QUANTITY_CONFIDENCE)
+
+
+def test_single_unit_needs_no_structure():
+    inference = infer(drug('Cough syrup', ('Bottle', 4)))
+    assert (inference.structure, inference.source, inference.confidence) == ([], 'single-unit', 1.0)
+
+
+def test_adder_fills_in_confident_inferences_and_logs_all(tmp_path):
+    drugs_path = tmp_path / 'drugs.json'
+    drugs_path.write_text(json.dumps([
+        drug('Amoxil 500mg', ('Pack', 2), ('Card', 20), ('Capsule', 200)),
+        drug('Gabapentin 300mg', ('Container', 1), ('Tablet', 37)),
+    ]), encoding='utf-8')
+
+    adder = PackagingStructureAdder(str(drugs_path))
+    try:
+        adder.load_data()
+        assert adder.apply_inferred_results() == 1
+        assert adder.processed_indices == {0}
+        assert 'packagingStructure' not in adder.drugs[1]
+    finally:
+        adder.close()
+
+    with open(tmp_path / 'drugs_inference.jsonl', 'r', encoding='utf-8') as f:
+        audit = [json.loads(line) for line in f]
+    assert [(entry['name'], entry['source'], entry['accepted']) for entry in audit] == [
+        ('Amoxil 500mg', 'quantities', True), ('Gabapentin 300mg', 'quantities', False)]
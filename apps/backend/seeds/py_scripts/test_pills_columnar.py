@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Tests for the NumPy columnar pills transform: its output must be identical
+to transform_pills_to_inventory.build_item's, cell spelling for cell
+spelling.
+
+Run from this directory: python -m pytest test_pills_columnar.py
+"""
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from column_specs import get_spec
+from conversion_engine import convert_csv
+from inventory_io import write_items
+from pills_columnar import iter_columnar_items, parse_quantity_column
+from transform_pills_to_inventory import CATEGORY, build_item, clean_value, parse_quantity
+
+QUANTITY_CELLS = ['', '-', ' 12 ', '0', '007', '+5', '-3', 'n/a', 'ten', '1.5', '١٢', '99999999999999999999']
+
+ROWS = [
+    # Pack -> Card -> Tablet, Container -> Tablet and Card -> Tablet chains
+    'Amoxil 500mg,2,20,200,03/30,5/26',
+    'Gabapentin 300mg,1,,37,06/2026,',
+    'Metformin 500mg,-,10,100,-,N/A',
+    # Skipped: no name, no stock
+    ',1,1,1,,', 'N/A,1,1,1,,', 'Empty,-,0,,,',
+    # Unusual spellings the scalar parser still accepts or rejects
+    'Plus, +5 ,007,1.5,13/26,03/2²',
+    'Huge,99999999999999999999,,1,,',
+    'Short row,3',
+    '"Quoted, name",1,2,3,1/27,12/26',
+]
+
+
+def test_quantity_column_matches_scalar_parser():
+    expected = [parse_quantity(clean_value(cell, is_numeric=True)) or 0 for cell in QUANTITY_CELLS]
+    assert parse_quantity_column(QUANTITY_CELLS).tolist() == expected
+
+
+@pytest.mark.parametrize('block_size', [1, 4, 100])
+def test_columnar_output_matches_build_item(tmp_path, block_size):
+    csv_path = tmp_path / 'drugs.csv'
+    csv_path.write_text('Pills,Pack/Container,Card,Tablets,Exp. Date,Exp. Date 2\n' + '\n'.join(ROWS) + '\n\n',
+                        encoding='utf-8')
+    spec = get_spec(CATEGORY)
+
+    count = convert_csv(csv_path, tmp_path / 'rows.json', build_item, spec)
+    assert count == 7
+    assert write_items(iter_columnar_items(csv_path, spec, block_size), tmp_path / 'columnar.json') == count
+    assert (tmp_path / 'columnar.json').read_bytes() == (tmp_path / 'rows.json').read_bytes()
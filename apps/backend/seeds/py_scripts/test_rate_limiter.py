@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests for the async rate limiter: bursts up to a minute's allowance go out
+at once, further requests wait for the buckets to refill, requests larger
+than the allowance wait for a full bucket instead of forever, settling
+returns unused tokens, and waiters are served in arrival order.
+
+Run from this directory: python -m pytest test_rate_limiter.py
+"""
+
+import asyncio
+
+import pytest
+
+import rate_limiter
+from rate_limiter import RateLimiter, estimate_tokens
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Fake monotonic clock that asyncio.sleep advances; returns the sleeps taken.
+
+    Tests pick limits whose waits are exact in floating point: a wait that
+    falls a rounding error short would never move this clock forward.
+    """
+    now = [1000.0]
+    sleeps = []
+
+    async def sleep(delay):
+        sleeps.append(round(delay, 6))
+        now[0] += delay
+
+    monkeypatch.setattr(rate_limiter.time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(rate_limiter.asyncio, 'sleep', sleep)
+    return sleeps
+
+
+def acquire_all(limiter, *tokens):
+    async def run():
+        for amount in tokens:
+            await limiter.acquire(amount)
+    asyncio.run(run())
+
+
+def test_estimate_tokens():
+    assert estimate_tokens('') == 1
+    assert estimate_tokens('x' * 400) == 101
+
+
+def test_no_limits_never_wait(clock):
+    acquire_all(RateLimiter(), *[10_000] * 50)
+    assert clock == []
+
+
+def test_requests_burst_then_wait_for_refill(clock):
+    limiter = RateLimiter(requests_per_minute=60)
+    acquire_all(limiter, *[0] * 60)
+    assert clock == []
+    # One request per second refills
+    acquire_all(limiter, 0, 0)
+    assert clock == [1.0, 1.0]
+
+
+def test_tokens_wait_for_refill(clock):
+    limiter = RateLimiter(tokens_per_minute=1000)
+    acquire_all(limiter, 600)
+    assert clock == []
+    # 200 more tokens are needed, at 1000/60 per second
+    acquire_all(limiter, 600)
+    assert clock == [12.0]
+
+
+def test_oversized_request_waits_for_a_full_bucket(clock):
+    limiter = RateLimiter(tokens_per_minute=1000)
+    acquire_all(limiter, 5000, 5000)
+    assert clock == [60.0]
+    assert limiter.tokens.level == 0
+
+
+def test_settle_returns_unused_tokens(clock):
+    limiter = RateLimiter(tokens_per_minute=1000)
+    acquire_all(limiter, 600)
+    limiter.settle(600, 100)
+    assert limiter.tokens.level == 900
+    acquire_all(limiter, 900)
+    assert clock == []
+
+    # Using more than reserved takes the difference from the allowance
+    limiter.settle(900, 1200)
+    assert limiter.tokens.level == -300
+    # Unknown usage leaves the reservation in place
+    limiter.settle(900, None)
+    assert limiter.tokens.level == -300
+
+
+def test_waiters_are_served_in_arrival_order(clock):
+    limiter = RateLimiter(tokens_per_minute=600)
+    served = []
+
+    async def request(name, tokens):
+        await limiter.acquire(tokens)
+        served.append(name)
+
+    async def run():
+        await limiter.acquire(600)
+        await asyncio.gather(request('large', 500), request('small', 10), request('tiny', 5))
+
+    asyncio.run(run())
+    # The small requests could have gone first, but queue behind the large one
+    assert served == ['large', 'small', 'tiny']
+    assert clock[0] == 50.0
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Tests for bulk ingestion of saved manual responses: results from the rules
+and the cache in the session that generated the prompts must survive into
+the separate --ingest run, so it can finish and save the drugs file, and
+responses saved for an earlier set of prompts must never be applied.
+
+Run from this directory: python -m pytest test_response_ingest.py
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from packaging_cache import DEFAULT_CACHE_NAME, PackagingCache
+
+SCRIPT = Path(__file__).parent / 'add_packaging_structure.py'
+
+
+def drug(name, *units):
+    return {
+        'name': name,
+        'category': 'Drug',
+        'units': [{'name': unit, 'plural': f"{unit}s", 'quantity': quantity} for unit, quantity in units],
+        'earliestExpiryDate': '2030-01-01',
+        'laterExpiryDates': [],
+    }
+
+
+DRUGS = [
+    # Exact stock ratios: answered by the rules
+    drug('Amoxil 500mg', ('Pack', 2), ('Card', 20), ('Capsule', 200)),
+    # Too uncertain for the rules; answered by the cache
+    drug('Gabapentin 300mg', ('Container', 1), ('Tablet', 37)),
+    # Too uncertain for the rules and not cached; sent out as a manual prompt
+    drug('Omeprazole 20mg', ('Container', 3), ('Capsule', 50)),
+]
+CACHED = [{'unit': 'Container', 'contains': 30, 'of': 'Tablet'}]
+
+
+def run_script(drugs_path, *args, stdin=''):
+    result = subprocess.run(
+        [sys.executable, str(SCRIPT), str(drugs_path), *args],
+        input=stdin, capture_output=True, text=True, cwd=SCRIPT.parent, timeout=120,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    return result.stdout
+
+
+def test_cache_hits_survive_into_ingest(tmp_path):
+    drugs_path = tmp_path / 'drugs.json'
+    drugs_path.write_text(json.dumps(DRUGS, indent=2), encoding='utf-8')
+    with PackagingCache(tmp_path / DEFAULT_CACHE_NAME) as cache:
+        cache.put(DRUGS[1], CACHED)
+        cache.commit()
+
+    # Session 1: rules and cache fill two drugs, the third goes into a prompt
+    output = run_script(drugs_path, stdin='2\n')
+    assert 'Applied 1 packaging structures from the cache' in output
+    manifest = json.loads((tmp_path / 'drugs_manifest.json').read_text(encoding='utf-8'))
+    assert [[entry['name'] for entry in batch['drugs']] for batch in manifest['batches'].values()] == \
+        [['Omeprazole 20mg']]
+
+    responses = tmp_path / 'drugs_responses'
+    responses.mkdir()
+    batch_id = next(iter(manifest['batches']))
+    (responses / f"{batch_id}.json").write_text(json.dumps({'drugs': [{'n': 1, 'contains': [100]}]}),
+                                                encoding='utf-8')
+
+    # Session 2, a new process: ingesting the one response finishes the file
+    output = run_script(drugs_path, '--ingest')
+    assert 'Remaining: 0 drugs' in output, output
+
+    saved = {item['name']: item['packagingStructure'] for item in
+             json.loads(drugs_path.read_text(encoding='utf-8'))}
+    assert saved == {
+        'Amoxil 500mg': [{'unit': 'Pack', 'contains': 10, 'of': 'Card'},
+                         {'unit': 'Card', 'contains': 10, 'of': 'Capsule'}],
+        'Gabapentin 300mg': CACHED,
+        'Omeprazole 20mg': [{'unit': 'Container', 'contains': 100, 'of': 'Capsule'}],
+    }
+
+
+def test_responses_for_earlier_prompts_are_rejected(tmp_path):
+    drugs_path = tmp_path / 'drugs.json'
+    drugs_path.write_text(json.dumps([DRUGS[2]], indent=2), encoding='utf-8')
+    run_script(drugs_path, '--no-cache', stdin='2\n')
+    manifest_path = tmp_path / 'drugs_manifest.json'
+    old_id = next(iter(json.loads(manifest_path.read_text(encoding='utf-8'))['batches']))
+    responses = tmp_path / 'drugs_responses'
+    responses.mkdir()
+    (responses / f"{old_id}.json").write_text(json.dumps({'drugs': [{'n': 1, 'contains': [100]}]}),
+                                              encoding='utf-8')
+
+    # A drug is added ahead of Omeprazole and the prompts are generated again:
+    # the first batch now starts with a different drug, so it needs a new ID
+    ciprofloxacin = drug('Ciprofloxacin 500mg', ('Container', 2), ('Tablet', 13))
+    drugs_path.write_text(json.dumps([ciprofloxacin, DRUGS[2]], indent=2), encoding='utf-8')
+    run_script(drugs_path, '--no-cache', stdin='2\n')
+    batches = json.loads(manifest_path.read_text(encoding='utf-8'))['batches']
+    new_id = next(iter(batches))
+    assert new_id != old_id and new_id.startswith('batch-0001-')
+    assert [entry['name'] for entry in batches[new_id]['drugs']] == ['Ciprofloxacin 500mg', 'Omeprazole 20mg']
+
+    # The stale response (whose "n": 1 would now be Ciprofloxacin) is rejected
+    output = run_script(drugs_path, '--no-cache', '--ingest')
+    assert f"{old_id}.json: not a batch in the current manifest" in output
+    assert 'Remaining: 2 drugs' in output, output
+
+    # A response for the current prompts is applied to the right drugs
+    (responses / f"{new_id}.json").write_text(
+        json.dumps({'drugs': [{'n': 1, 'contains': [10]}, {'n': 2, 'contains': [100]}]}), encoding='utf-8')
+    output = run_script(drugs_path, '--no-cache', '--ingest')
+    assert 'Remaining: 0 drugs' in output, output
+    saved = {item['name']: item['packagingStructure'] for item in
+             json.loads(drugs_path.read_text(encoding='utf-8'))}
+    assert saved == {
+        'Ciprofloxacin 500mg': [{'unit': 'Container', 'contains': 10, 'of': 'Tablet'}],
+        'Omeprazole 20mg': [{'unit': 'Container', 'contains': 100, 'of': 'Capsule'}],
+    }
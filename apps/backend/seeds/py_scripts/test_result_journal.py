@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests for the append-only result journal: results written by one run are
+replayed by the next, a torn last line left by a crash is dropped, and
+compaction keeps only the latest result per drug.
+
+Run from this directory: python -m pytest test_result_journal.py
+"""
+
+import json
+
+from add_packaging_structure import PackagingStructureAdder
+from inventory_io import save_items
+from result_journal import ResultJournal
+
+AMOXIL = [{'unit': 'Pack', 'contains': 10, 'of': 'Card'}, {'unit': 'Card', 'contains': 10, 'of': 'Capsule'}]
+CIPROXIN = [{'unit': 'Pack', 'contains': 10, 'of': 'Tablet'}]
+
+
+def test_results_are_replayed_by_the_next_run(tmp_path):
+    path = tmp_path / 'drugs_journal.jsonl'
+    journal = ResultJournal(path, sync_every=1)
+    assert journal.replay() == {}
+    journal.append(0, 'Amoxil 500mg', AMOXIL)
+    journal.append(3, 'Ciproxin 500mg', CIPROXIN)
+    journal.commit()
+    # Committed records reach the file before close()
+    assert len(path.read_text(encoding='utf-8').splitlines()) == 2
+    journal.close()
+
+    replayed = ResultJournal(path)
+    assert replayed.replay() == {0: ('Amoxil 500mg', AMOXIL), 3: ('Ciproxin 500mg', CIPROXIN)}
+    assert replayed.records == 2
+
+
+def test_torn_last_line_is_dropped(tmp_path, capsys):
+    path = tmp_path / 'drugs_journal.jsonl'
+    journal = ResultJournal(path)
+    journal.append(0, 'Amoxil 500mg', AMOXIL)
+    journal.close()
+    complete = path.stat().st_size
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"index": 1, "name": "Cipro')
+
+    journal = ResultJournal(path)
+    assert journal.replay() == {0: ('Amoxil 500mg', AMOXIL)}
+    assert 'Dropping an incomplete record' in capsys.readouterr().out
+    assert path.stat().st_size == complete
+
+    # Appending after the replay continues from the last good record
+    journal.append(1, 'Ciproxin 500mg', CIPROXIN)
+    journal.close()
+    assert ResultJournal(path).replay() == {0: ('Amoxil 500mg', AMOXIL), 1: ('Ciproxin 500mg', CIPROXIN)}
+
+
+def test_corrupt_line_stops_the_replay(tmp_path):
+    path = tmp_path / 'drugs_journal.jsonl'
+    good = json.dumps({'index': 0, 'name': 'Amoxil 500mg', 'packagingStructure': AMOXIL}) + '\n'
+    path.write_text(good + '{"index": 1}\n' + good.replace('"index": 0', '"index": 2'), encoding='utf-8')
+    assert ResultJournal(path).replay() == {0: ('Amoxil 500mg', AMOXIL)}
+    assert path.read_text(encoding='utf-8') == good
+
+
+def test_compact_keeps_the_latest_result_per_drug(tmp_path):
+    path = tmp_path / 'drugs_journal.jsonl'
+    journal = ResultJournal(path)
+    journal.append(2, 'Ciproxin 500mg', [{'unit': 'Pack', 'contains': 1, 'of': 'Tablet'}])
+    journal.append(0, 'Amoxil 500mg', AMOXIL)
+    journal.append(2, 'Ciproxin 500mg', CIPROXIN)
+    assert journal.compact() == 1
+    assert journal.records == 2
+    assert [json.loads(line)['index'] for line in path.read_text(encoding='utf-8').splitlines()] == [0, 2]
+    assert ResultJournal(path).replay() == {0: ('Amoxil 500mg', AMOXIL), 2: ('Ciproxin 500mg', CIPROXIN)}
+
+    journal.remove()
+    assert not path.exists() and journal.records == 0
+    assert journal.compact() == 0
+
+
+def test_adder_resumes_from_its_journal(tmp_path, capsys):
+    drugs = [
+        {'name': 'Amoxil 500mg', 'units': [{'name': 'Pack', 'plural': 'Packs', 'quantity': 2},
+                                           {'name': 'Card', 'plural': 'Cards', 'quantity': 20},
+                                           {'name': 'Capsule', 'plural': 'Capsules', 'quantity': 200}]},
+        {'name': 'Ciproxin 500mg', 'units': [{'name': 'Pack', 'plural': 'Packs', 'quantity': 1},
+                                             {'name': 'Tablet', 'plural': 'Tablets', 'quantity': 10}]},
+        {'name': 'Flagyl 400mg', 'units': [{'name': 'Tablet', 'plural': 'Tablets', 'quantity': 21}]},
+    ]
+    drugs_path = tmp_path / 'drugs.json'
+    save_items(drugs, drugs_path)
+    journal = ResultJournal(tmp_path / 'drugs_journal.jsonl')
+    journal.append(0, 'Amoxil 500mg', AMOXIL)
+    journal.append(1, 'Cipro (renamed since)', CIPROXIN)
+    journal.close()
+
+    adder = PackagingStructureAdder(str(drugs_path))
+    adder.load_data()
+    assert adder.processed_indices == {0}
+    assert adder.drugs[0]['packagingStructure'] == AMOXIL
+    assert 'packagingStructure' not in adder.drugs[1]
+    assert '1 journal entries do not match a drug' in capsys.readouterr().out
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tests for checkpointed conversion: a run interrupted partway and resumed
+must write exactly what an uninterrupted convert_csv run writes, and rows
+the converter raises on are quarantined with their position instead of
+stopping the run.
+
+Run from this directory: python -m pytest test_resumable_conversion.py
+"""
+
+import csv
+import json
+import sys
+
+import pytest
+
+from compressed_io import open_text
+from conversion_engine import convert_csv
+from resumable_conversion import (
+    checkpoint_path_for,
+    convert_csv_resumable,
+    partial_path_for,
+    quarantine_path_for,
+)
+
+SPEC = {'category': 'Fixture', 'columns': {'name': 'Name', 'note': 'Note'}}
+
+# Name of the row that interrupts the run, like Ctrl+C partway through
+interrupt_at = None
+
+
+def build_note_item(category, name, note):
+    if name == interrupt_at:
+        raise KeyboardInterrupt
+    if note == 'bad':
+        raise ValueError(f"unreadable note for {name}")
+    if not name:
+        return None
+    return {'name': name, 'category': category, 'note': note}
+
+
+def write_csv(path, rows):
+    with open_text(path, 'w', newline='') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(['Name', 'Note'])
+        writer.writerows(rows)
+    return path
+
+
+def read_text(path):
+    with open_text(path) as f:
+        return f.read()
+
+
+ROWS = [(f"Item {i}, café" if i % 4 else '', i) for i in range(25)]
+
+
+@pytest.fixture
+def interrupt(monkeypatch):
+    def set_row(name):
+        monkeypatch.setattr(sys.modules[__name__], 'interrupt_at', name)
+    return set_row
+
+
+@pytest.mark.parametrize('csv_name', ['notes.csv', 'notes.csv.gz'])
+@pytest.mark.parametrize('output_name, compact', [
+    ('notes.json', False),
+    ('notes.json', True),
+    ('notes.jsonl.gz', False),
+])
+def test_resumed_run_matches_uninterrupted_run(tmp_path, interrupt, csv_name, output_name, compact):
+    csv_path = write_csv(tmp_path / csv_name, ROWS)
+    expected_path = tmp_path / 'expected' / output_name
+    assert convert_csv(csv_path, expected_path, build_note_item, SPEC, compact=compact) == 18
+
+    output_path = tmp_path / output_name
+    interrupt('Item 17, café')
+    with pytest.raises(KeyboardInterrupt):
+        convert_csv_resumable(csv_path, output_path, build_note_item, SPEC, compact=compact, checkpoint_rows=5)
+    assert not output_path.exists()
+    assert partial_path_for(output_path).exists()
+    checkpoint = json.loads(checkpoint_path_for(output_path).read_text(encoding='utf-8'))
+    assert checkpoint['rows'] == 15 and checkpoint['items'] == 11
+    # Items written after the last checkpoint are dropped on resume
+    assert partial_path_for(output_path).stat().st_size > checkpoint['output_bytes']
+
+    interrupt(None)
+    stats = convert_csv_resumable(csv_path, output_path, build_note_item, SPEC, compact=compact, checkpoint_rows=5)
+    assert stats == {'items': 18, 'rows': 25, 'quarantined': 0, 'resumed_from': 15}
+    # Compare decompressed: gzip headers record the file name and time
+    assert read_text(output_path) == read_text(expected_path)
+    assert not checkpoint_path_for(output_path).exists()
+    assert not partial_path_for(output_path).exists()
+    assert not quarantine_path_for(output_path).exists()
+
+
+def test_changed_source_starts_over(tmp_path, interrupt):
+    csv_path = write_csv(tmp_path / 'notes.csv', ROWS)
+    output_path = tmp_path / 'notes.json'
+    interrupt('Item 9, café')
+    with pytest.raises(KeyboardInterrupt):
+        convert_csv_resumable(csv_path, output_path, build_note_item, SPEC, checkpoint_rows=4)
+    assert checkpoint_path_for(output_path).exists()
+
+    interrupt(None)
+    write_csv(csv_path, ROWS + [('Late addition', 99)])
+    stats = convert_csv_resumable(csv_path, output_path, build_note_item, SPEC, checkpoint_rows=4)
+    assert stats['resumed_from'] == 0 and stats['items'] == 19
+    assert json.loads(output_path.read_text(encoding='utf-8'))[-1]['name'] == 'Late addition'
+
+
+def test_failing_rows_are_quarantined(tmp_path):
+    rows = [('Amoxil', 1), ('Broken "one"', 'bad'), ('Ciproxin', 3), ('Dioralyte', 'bad')]
+    csv_path = write_csv(tmp_path / 'notes.csv.gz', rows)
+    output_path = tmp_path / 'notes.json.gz'
+
+    stats = convert_csv_resumable(csv_path, output_path, build_note_item, SPEC)
+    assert stats == {'items': 2, 'rows': 4, 'quarantined': 2, 'resumed_from': 0}
+    with open_text(output_path) as f:
+        assert [item['name'] for item in json.load(f)] == ['Amoxil', 'Ciproxin']
+
+    quarantine_path = quarantine_path_for(output_path)
+    assert quarantine_path.name == 'notes.quarantine.jsonl'
+    records = [json.loads(line) for line in quarantine_path.read_text(encoding='utf-8').splitlines()]
+    assert [(record['record'], record['row']) for record in records] == [
+        (2, ['Broken "one"', 'bad']), (4, ['Dioralyte', 'bad'])]
+    assert records[0]['error'] == 'ValueError: unreadable note for Broken "one"'
+    # Offsets are byte positions in the decompressed CSV
+    with open_text(csv_path, newline='') as f:
+        text = f.read()
+    assert text[records[1]['offset']:] == 'Dioralyte,bad\n'
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Tests for retries and batch bisection: transient errors are retried with
+capped, jittered backoff, content errors split the batch until the drug at
+fault is isolated, fatal errors stop the run, and drugs a response leaves
+out are sent again.
+
+Run from this directory: python -m pytest test_retry_policy.py
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+import add_packaging_structure
+import retry_policy
+from add_packaging_structure import PackagingStructureAdder, TruncatedResponseError
+from retry_policy import RetryPolicy, is_content_error, is_fatal, retry_after
+
+
+class APIError(Exception):
+    """Stand-in for an openai.APIStatusError."""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"Error code: {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+@pytest.mark.parametrize('status, fatal, content', [
+    (401, True, False),
+    (403, True, False),
+    (404, True, False),
+    (400, False, True),
+    (413, False, True),
+    (422, False, True),
+    (429, False, False),
+    (500, False, False),
+    (None, False, False),
+])
+def test_errors_are_classified_by_status(status, fatal, content):
+    error = APIError(status) if status else TimeoutError('timed out')
+    assert is_fatal(error) == fatal
+    assert is_content_error(error) == content
+    assert RetryPolicy().should_retry(error, 0) == (not fatal and not content)
+
+
+def test_retries_stop_after_the_last_attempt():
+    policy = RetryPolicy(attempts=3)
+    error = APIError(503)
+    assert [policy.should_retry(error, attempt) for attempt in range(3)] == [True, True, False]
+    assert not RetryPolicy(attempts=0).should_retry(error, 0)
+
+
+def test_delays_grow_exponentially_up_to_the_cap(monkeypatch):
+    # Always take the top of the jitter range
+    monkeypatch.setattr(retry_policy.random, 'uniform', lambda low, high: high)
+    policy = RetryPolicy(base_delay=1.0, max_delay=10.0)
+    assert [policy.delay(attempt) for attempt in range(6)] == [1.0, 2.0, 4.0, 8.0, 10.0, 10.0]
+
+    monkeypatch.setattr(retry_policy.random, 'uniform', lambda low, high: low)
+    assert policy.delay(3) == 0.0
+
+
+def test_retry_after_sets_the_minimum_delay(monkeypatch):
+    monkeypatch.setattr(retry_policy.random, 'uniform', lambda low, high: low)
+    policy = RetryPolicy(base_delay=1.0, max_delay=30.0)
+    assert retry_after(APIError(429, {'retry-after': '7'})) == 7.0
+    assert policy.delay(0, APIError(429, {'retry-after': '7'})) == 7.0
+    assert policy.delay(0, APIError(429, {'retry-after': '120'})) == 30.0
+    assert retry_after(APIError(429, {'retry-after': 'Wed, 21 Oct 2026 07:28:00 GMT'})) is None
+    assert retry_after(TimeoutError()) is None
+
+
+def drug(name):
+    return {'name': name, 'units': [{'name': 'Pack', 'plural': 'Packs', 'quantity': 1},
+                                    {'name': 'Tablet', 'plural': 'Tablets', 'quantity': 10}]}
+
+
+BATCH = [(idx, drug(name)) for idx, name in enumerate(['Amoxil', 'Bad drug', 'Ciproxin', 'Dioralyte', 'Flagyl'])]
+
+
+@pytest.fixture
+def adder(tmp_path, monkeypatch):
+    """An adder whose model calls are answered by adder.reply(batch, attempt)."""
+    adder = PackagingStructureAdder(str(tmp_path / 'drugs.json'), retry=RetryPolicy(attempts=3), max_requeues=1)
+    adder.calls = []
+    adder.sleeps = []
+    monkeypatch.setattr(add_packaging_structure.time, 'sleep', adder.sleeps.append)
+
+    def process_batch_with_ai(batch, api_key=None, attempt=0):
+        adder.calls.append([item['name'] for _, item in batch])
+        return adder.reply(batch, attempt)
+
+    adder.process_batch_with_ai = process_batch_with_ai
+    return adder
+
+
+def answer(batch):
+    return [{'n': number, 'contains': [10]} for number in range(1, len(batch) + 1)]
+
+
+def settled_names(settled):
+    """Names of the drugs the settled responses answer."""
+    names = {idx: item['name'] for idx, item in BATCH}
+    return sorted(names[idx] for sent, results in settled
+                  for idx in PackagingStructureAdder.match_results(sent, results))
+
+
+def test_content_error_is_bisected_down_to_the_bad_drug(adder):
+    def reply(batch, attempt):
+        if any(item['name'] == 'Bad drug' for _, item in batch):
+            raise APIError(400)
+        return answer(batch)
+
+    adder.reply = reply
+    settled, failed = adder.settle_batch(BATCH, 'key')
+    assert failed == [BATCH[1]]
+    assert settled_names(settled) == ['Amoxil', 'Ciproxin', 'Dioralyte', 'Flagyl']
+    # Content errors are never retried, only split
+    assert adder.calls == [
+        ['Amoxil', 'Bad drug', 'Ciproxin', 'Dioralyte', 'Flagyl'],
+        ['Amoxil', 'Bad drug'],
+        ['Amoxil'],
+        ['Bad drug'],
+        ['Ciproxin', 'Dioralyte', 'Flagyl'],
+    ]
+    assert adder.sleeps == []
+
+
+def test_transient_errors_are_retried_before_splitting(adder):
+    def reply(batch, attempt):
+        if len(batch) == 5 or attempt == 0:
+            raise APIError(503)
+        return answer(batch)
+
+    adder.reply = reply
+    settled, failed = adder.settle_batch(BATCH, 'key')
+    assert failed == []
+    assert settled_names(settled) == sorted(item['name'] for _, item in BATCH)
+    # 3 attempts at the whole batch, then each half succeeds on its second attempt
+    assert [len(call) for call in adder.calls] == [5, 5, 5, 2, 2, 3, 3]
+    assert len(adder.sleeps) == 4
+
+
+def test_truncated_response_is_split_without_retrying(adder):
+    def reply(batch, attempt):
+        if len(batch) > 2:
+            raise TruncatedResponseError('stopped at the token limit')
+        return answer(batch)
+
+    adder.reply = reply
+    settled, failed = adder.settle_batch(BATCH, 'key')
+    assert failed == [] and len(settled_names(settled)) == 5
+    assert [len(call) for call in adder.calls] == [5, 2, 3, 1, 2]
+    assert adder.sleeps == []
+
+
+def test_fatal_error_stops_the_run(adder):
+    def reply(batch, attempt):
+        raise APIError(401)
+
+    adder.reply = reply
+    with pytest.raises(APIError):
+        adder.settle_batch(BATCH, 'key')
+    assert len(adder.calls) == 1
+
+
+def test_drugs_left_out_of_a_response_are_sent_again(adder):
+    def reply(batch, attempt):
+        # The model always skips Bad drug, and skips Dioralyte the first time
+        names = [item['name'] for _, item in batch]
+        return [result for result, name in zip(answer(batch), names)
+                if name != 'Bad drug' and not (name == 'Dioralyte' and len(batch) == 5)]
+
+    adder.reply = reply
+    settled, failed = adder.settle_batch(BATCH, 'key')
+    # max_requeues=1: Bad drug is given up on once it is left out of the resend too
+    assert adder.calls[1:] == [['Bad drug', 'Dioralyte']]
+    assert failed == [BATCH[1]]
+    assert settled_names(settled) == ['Amoxil', 'Ciproxin', 'Dioralyte', 'Flagyl']
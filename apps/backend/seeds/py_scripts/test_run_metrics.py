@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Tests for packaging run metrics and the dry-run planner: percentiles and
+cost add up, every call and the run summary reach the metrics file, and
+plan_run counts the calls a run would make without calling the model or
+changing anything.
+
+Run from this directory: python -m pytest test_run_metrics.py
+"""
+
+import json
+import math
+
+import pytest
+
+from add_packaging_structure import PackagingStructureAdder
+from inventory_io import save_items
+from inventory_model import to_plain
+from packaging_cache import PackagingCache
+from run_metrics import RunMetrics, cost, distribution, percentile, recorded_latencies
+
+
+def test_percentiles_use_the_nearest_rank():
+    values = list(range(1, 101))
+    assert [percentile(values, fraction) for fraction in (0.5, 0.95, 0.99, 1.0)] == [50, 95, 99, 100]
+    assert [percentile([1, 2, 3, 4], fraction) for fraction in (0.0, 0.25, 0.26, 0.5, 0.75)] == [1, 1, 2, 2, 3]
+    assert percentile([3.0], 0.99) == 3.0
+    assert percentile([], 0.5) is None
+    assert distribution([0.12345, 2.0, 1.0]) == {'p50': 1.0, 'p95': 2.0, 'p99': 2.0, 'max': 2.0}
+    assert distribution([]) == {'p50': None, 'p95': None, 'p99': None, 'max': None}
+
+
+def test_cost_is_priced_per_million_tokens():
+    assert cost(1_000_000, 0) == 2.50
+    assert cost(200_000, 100_000, prompt_price=1.0, completion_price=4.0) == pytest.approx(0.6)
+
+
+def test_calls_and_summary_are_written_to_the_metrics_file(tmp_path):
+    path = tmp_path / 'drugs_metrics.jsonl'
+    metrics = RunMetrics(path, prompt_price=1.0, completion_price=2.0)
+    metrics.record_call(12, 1.5, outcome='APITimeoutError')
+    metrics.record_call(12, 2.0, attempt=1, prompt_tokens=1000, completion_tokens=300, parse_path='drugs', matched=12)
+    metrics.record_call(6, 1.0, prompt_tokens=500, completion_tokens=150, parse_path='fenced json/array', matched=5)
+    metrics.record_call(12, 3.0, prompt_tokens=1000, completion_tokens=4000, outcome='truncated')
+    metrics.close()
+
+    summary = metrics.summary()
+    assert (summary['calls'], summary['ok_calls'], summary['retries']) == (4, 2, 1)
+    assert summary['outcomes'] == {'APITimeoutError': 1, 'ok': 2, 'truncated': 1}
+    assert summary['parse_paths'] == {'drugs': 1, 'fenced json/array': 1}
+    # Failed calls still cost tokens, but only answered drugs count per drug
+    assert (summary['prompt_tokens'], summary['completion_tokens'], summary['drugs_matched']) == (2500, 4450, 17)
+    assert summary['tokens_per_drug'] == round(6950 / 17, 1)
+    assert summary['cost_usd'] == round((2500 * 1.0 + 4450 * 2.0) / 1_000_000, 4)
+    assert summary['latency_seconds'] == {'p50': 1.5, 'p95': 3.0, 'p99': 3.0, 'max': 3.0}
+    assert summary['prompt_tokens_per_call']['max'] == 1000
+
+    records = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert [record['type'] for record in records] == ['call'] * 4 + ['run']
+    assert records[-1]['calls'] == 4
+    assert recorded_latencies(path) == [2.0, 1.0]
+    assert 'Model calls: 4 (2 ok, 1 retries), 17 drugs answered' in metrics.report()
+
+
+def test_recorded_latencies_skip_bad_lines(tmp_path):
+    path = tmp_path / 'drugs_metrics.jsonl'
+    assert recorded_latencies(path) == []
+    path.write_text('{"type": "call", "outcome": "ok", "latency": 0.5}\n{"type": "ca\n', encoding='utf-8')
+    assert recorded_latencies(path) == [0.5]
+
+
+def drug(name, *units):
+    return {
+        'name': name,
+        'category': 'Drug',
+        'units': [{'name': unit, 'plural': f"{unit}s", 'quantity': quantity} for unit, quantity in units],
+    }
+
+
+DRUGS = [
+    # Answered by the rules
+    drug('Amoxil 500mg', ('Pack', 2), ('Card', 20), ('Capsule', 200)),
+    # Answered by the cache
+    drug('Gabapentin 300mg', ('Container', 1), ('Tablet', 37)),
+    # Shares the first uncertain drug's answer
+    drug('Omeprazole 20mg', ('Container', 3), ('Capsule', 50)),
+] + [drug(f"Omeprazole {strength}mg", ('Container', 3), ('Capsule', 50)) for strength in range(20, 620, 20)]
+
+
+@pytest.fixture
+def adder(tmp_path):
+    drugs_path = tmp_path / 'drugs.json'
+    save_items(DRUGS, drugs_path)
+    cache = PackagingCache(tmp_path / 'cache.sqlite')
+    cache.put(DRUGS[1], [{'unit': 'Container', 'contains': 30, 'of': 'Tablet'}])
+    cache.commit()
+    adder = PackagingStructureAdder(str(drugs_path), cache=cache)
+    adder.load_data()
+    yield adder
+    adder.close()
+
+
+def test_plan_counts_calls_without_changing_anything(adder, tmp_path):
+    files = sorted(path.name for path in tmp_path.iterdir())
+    drugs = [to_plain(item) for item in adder.drugs]
+
+    plans = adder.plan_run()
+    compact, verbose = plans['compact'], plans['verbose']
+    # 30 Omeprazole strengths are sent; the duplicate shares its first one's answer
+    assert (compact['drugs'], compact['shared']) == (30, 1)
+    assert compact['calls'] == math.ceil(30 / adder.batch_size)
+    assert compact['tokens_per_drug'] < verbose['tokens_per_drug']
+    assert compact['cost_usd'] < verbose['cost_usd']
+    assert compact['latency_source'] == 'estimated'
+
+    assert [to_plain(item) for item in adder.drugs] == drugs
+    assert adder.processed_indices == set() and adder.group_members == {}
+    assert adder.prompt_template == 'compact'
+    assert (adder.cache.lookups, adder.metrics.calls) == (0, [])
+    assert sorted(path.name for path in tmp_path.iterdir()) == files
+
+
+def test_plan_uses_recorded_latency_and_rate_limits(adder):
+    metrics = RunMetrics(adder.metrics.path)
+    for latency in (4.0, 6.0, 100.0):
+        metrics.record_call(12, latency, matched=12)
+
+    plan = adder.plan_run(concurrency=3)['compact']
+    assert plan['latency_source'] == 'recorded'
+    assert plan['wall_seconds'] == math.ceil(6.0 * plan['calls'] / min(3, plan['calls']))
+
+    slow = adder.plan_run(concurrency=3, requests_per_minute=1)['compact']
+    assert slow['wall_seconds'] == 60 * slow['calls']
@@ -3,11 +3,19 @@
 Transform CSV directly into inventory items format with units structure.
 """
 
-import csv
-import json
+import argparse
 import sys
 from pathlib import Path
-from datetime import datetime
+
+from column_specs import get_spec
+from conversion_engine import convert_csv, convert_csv_parallel
+from expiry_dates import earliest_and_later
+from inventory_io import iter_records, write_items
+from inventory_model import InventoryItem, Unit
+from resumable_conversion import CHECKPOINT_ROWS, convert_csv_resumable, quarantine_path_for
+
+# Column mapping for this category lives in column_mappings.json
+CATEGORY = 'Drug'
 
 
 def parse_quantity(value):
@@ -21,111 +29,6 @@ def parse_quantity(value):
         return None
 
 
-def parse_exp_date_to_iso(date_str):
-    """
-    Parse expiration date string to ISO 8601 format for MongoDB.
-    Handles formats like: MM/YYYY, M/YY, MM/YY
-    Returns ISO date string (YYYY-MM-DD) or None
-    """
-    if not date_str:
-        return None
-
-    date_str = str(date_str).strip()
-    if date_str == '' or date_str == '-' or date_str.lower() == 'n/a':
-        return None
-
-    try:
-        # Handle MM/YYYY or M/YY format
-        parts = date_str.split('/')
-        if len(parts) != 2:
-            return None
-
-        month = int(parts[0])
-        year_str = parts[1]
-
-        # Handle 2-digit vs 4-digit years
-        if len(year_str) == 2:
-            year = 2000 + int(year_str)
-        else:
-            year = int(year_str)
-
-        # Validate month
-        if month < 1 or month > 12:
-            return None
-
-        # Create ISO date string (first day of month)
-        # Format: YYYY-MM-DD
-        return f"{year:04d}-{month:02d}-01"
-    except (ValueError, TypeError):
-        return None
-
-
-def parse_date_for_comparison(date_str):
-    """
-    Parse date string to datetime for comparison.
-    Handles formats like: MM/YYYY, M/YY, MM/YY
-    """
-    if not date_str:
-        return None
-
-    date_str = str(date_str).strip()
-    if date_str == '' or date_str == '-' or date_str.lower() == 'n/a':
-        return None
-
-    try:
-        # Handle MM/YYYY or M/YY format
-        parts = date_str.split('/')
-        if len(parts) != 2:
-            return None
-
-        month = int(parts[0])
-        year_str = parts[1]
-
-        # Handle 2-digit vs 4-digit years
-        if len(year_str) == 2:
-            year = 2000 + int(year_str)
-        else:
-            year = int(year_str)
-
-        # Create date at first day of month for comparison
-        return datetime(year, month, 1)
-    except (ValueError, TypeError):
-        return None
-
-
-def get_earliest_and_later_dates(date1_str, date2_str):
-    """
-    Determine earliest and later expiry dates in ISO format.
-
-    Returns:
-        tuple: (earliestExpiryDate, laterExpiryDates)
-        - earliestExpiryDate: ISO date string (YYYY-MM-DD) or None
-        - laterExpiryDates: list of ISO date strings (empty if no later dates)
-    """
-    date1_parsed = parse_date_for_comparison(date1_str)
-    date2_parsed = parse_date_for_comparison(date2_str)
-
-    date1_iso = parse_exp_date_to_iso(date1_str)
-    date2_iso = parse_exp_date_to_iso(date2_str)
-
-    # If both are None
-    if date1_parsed is None and date2_parsed is None:
-        return None, []
-
-    # If only one exists
-    if date1_parsed is None:
-        return date2_iso, []
-    if date2_parsed is None:
-        return date1_iso, []
-
-    # Both exist - compare
-    if date1_parsed <= date2_parsed:
-        later_dates = [date2_iso] if date1_parsed < date2_parsed else []
-        return date1_iso, later_dates
-    else:
-        return date2_iso, [date1_iso]
-
-
 def build_units(pack_container, card, tablets):
     """
     Build units array based on the data.
@@ -144,40 +47,20 @@ def build_units(pack_container, card, tablets):
     if pack_container_qty is not None and card_qty is None:
         # Container -> Tablet structure
         if pack_container_qty is not None:
-            units.append({
-                'name': 'Container',
-                'plural': 'Containers',
-                'quantity': pack_container_qty
-            })
+            units.append(Unit('Container', 'Containers', pack_container_qty))
 
         if tablets_qty is not None:
-            units.append({
-                'name': 'Tablet',
-                'plural': 'Tablets',
-                'quantity': tablets_qty
-            })
+            units.append(Unit('Tablet', 'Tablets', tablets_qty))
     else:
         # Pack -> Card -> Tablet structure
         if pack_container_qty is not None:
-            units.append({
-                'name': 'Pack',
-                'plural': 'Packs',
-                'quantity': pack_container_qty
-            })
+            units.append(Unit('Pack', 'Packs', pack_container_qty))
 
         if card_qty is not None:
-            units.append({
-                'name': 'Card',
-                'plural': 'Cards',
-                'quantity': card_qty
-            })
+            units.append(Unit('Card', 'Cards', card_qty))
 
         if tablets_qty is not None:
-            units.append({
-                'name': 'Tablet',
-                'plural': 'Tablets',
-                'quantity': tablets_qty
-            })
+            units.append(Unit('Tablet', 'Tablets', tablets_qty))
 
     return units
 
@@ -194,97 +77,142 @@ def clean_value(value, is_numeric=False):
     return value
 
 
-def transform_csv_to_inventory(csv_path, output_path=None):
+def build_item(category, name, pack_container, card, tablets, exp_date1, exp_date2):
     """
-    Transform CSV directly to inventory items format.
+    Build a drug inventory item from one row's mapped columns.
 
-    Args:
-        csv_path: Path to input CSV file
-        output_path: Path to output JSON file (optional)
+    Returns:
+        InventoryItem, or None if the row should be skipped
     """
-    csv_path = Path(csv_path)
-
-    if not csv_path.exists():
-        print(f"Error: CSV file not found at {csv_path}")
-        sys.exit(1)
+    name = clean_value(name)
+    if not name:
+        return None
 
-    if output_path is None:
-        output_path = csv_path.parent / 'inventory_items.json'
-    else:
-        output_path = Path(output_path)
+    pack_container = clean_value(pack_container, is_numeric=True)
+    card = clean_value(card, is_numeric=True)
+    tablets = clean_value(tablets, is_numeric=True)
 
-    try:
-        inventory_items = []
+    # Get expiry dates (raw strings for comparison)
+    exp_date1_raw = clean_value(exp_date1)
+    exp_date2_raw = clean_value(exp_date2)
 
-        with open(csv_path, 'r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
+    # Determine earliest and later dates (converted to ISO format)
+    earliest_expiry, later_expiry_dates = earliest_and_later(exp_date1_raw, exp_date2_raw)
 
-            for row in reader:
-                name = clean_value(row.get('Pills', ''))
-                if not name:
-                    continue
+    # Build units array
+    units = build_units(pack_container, card, tablets)
 
-                pack_container = clean_value(row.get('Pack/Container', ''), is_numeric=True)
-                card = clean_value(row.get('Card', ''), is_numeric=True)
-                tablets = clean_value(row.get('Tablets', ''), is_numeric=True)
+    # Skip if no valid units
+    if not units:
+        return None
 
-                # Get expiry dates (raw strings for comparison)
-                exp_date1_raw = clean_value(row.get('Exp. Date', ''))
-                exp_date2_raw = clean_value(row.get('Exp. Date 2', ''))
+    # Create inventory item, with the earliest expiry date only if there is one
+    if earliest_expiry is not None:
+        return InventoryItem(name=name.strip(), category=category, units=units,
+                             earliestExpiryDate=earliest_expiry, laterExpiryDates=later_expiry_dates or [])
+    return InventoryItem(name=name.strip(), category=category, units=units,
+                         laterExpiryDates=later_expiry_dates or [])
 
-                # Determine earliest and later dates (converted to ISO format)
-                earliest_expiry, later_expiry_dates = get_earliest_and_later_dates(
-                    exp_date1_raw, exp_date2_raw
-                )
 
-                # Build units array
-                units = build_units(pack_container, card, tablets)
+def transform_csv_to_inventory(csv_path, output_path=None, workers=None, columnar=False, use_mmap=False,
+                               compact=False, restart=False, checkpoint_rows=CHECKPOINT_ROWS, return_items=False):
+    """
+    Transform CSV directly to inventory items format.
 
-                # Skip if no valid units
-                if not units:
-                    continue
+    Items are streamed to the output file as they are produced, so memory
+    use does not grow with the size of the CSV. With more than one worker
+    the CSV is split into byte ranges that are transformed in parallel.
+    Columnar mode parses quantity columns in NumPy blocks instead.
 
-                # Create inventory item
-                inventory_item = {
-                    'name': name.strip(),
-                    'category': 'Drug',
-                    'units': units
-                }
+    The default single-process mode checkpoints its progress: if a run is
+    interrupted, running it again resumes from the last checkpoint, and rows
+    that fail to convert are quarantined to a side file instead of stopping
+    the run. The worker, columnar and mmap modes do not checkpoint.
 
-                # Add expiry date fields if available
-                if earliest_expiry is not None:
-                    inventory_item['earliestExpiryDate'] = earliest_expiry
+    Args:
+        csv_path: Path to input CSV file
+        output_path: Path to output JSON or JSON Lines file (optional)
+        workers: Number of worker processes for chunked parsing (optional)
+        columnar: Use the NumPy columnar transform (requires numpy)
+        use_mmap: Scan the CSV from a memory-mapped buffer
+        compact: Write a JSON array without indentation
+        restart: Ignore a checkpoint left by an interrupted run
+        checkpoint_rows: Rows read between checkpoints
+        return_items: Return the items written, as plain dicts, instead of
+            their count (reads the whole output back into memory)
 
-                if later_expiry_dates:
-                    inventory_item['laterExpiryDates'] = later_expiry_dates
-                else:
-                    inventory_item['laterExpiryDates'] = []
+    Returns:
+        int: Number of items written, or list of the items with return_items
+    """
+    csv_path = Path(csv_path)
 
-                inventory_items.append(inventory_item)
+    if not csv_path.exists():
+        print(f"Error: CSV file not found at {csv_path}")
+        sys.exit(1)
 
-        # Write output
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(inventory_items, f, indent=2, ensure_ascii=False)
+    if output_path is None:
+        output_path = csv_path.parent / 'inventory_items.json'
+    else:
+        output_path = Path(output_path)
 
-        print(f"✓ Successfully transformed {len(inventory_items)} items")
+    try:
+        spec = get_spec(CATEGORY)
+        if columnar:
+            from pills_columnar import iter_columnar_items
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            count = write_items(iter_columnar_items(csv_path, spec), output_path, compact=compact)
+        elif workers and workers > 1:
+            count = convert_csv_parallel(csv_path, output_path, build_item, spec, workers, compact=compact)
+        elif use_mmap:
+            count = convert_csv(csv_path, output_path, build_item, spec, use_mmap, compact)
+        else:
+            stats = convert_csv_resumable(csv_path, output_path, build_item, spec, compact,
+                                          checkpoint_rows, restart)
+            count = stats['items']
+            if stats['resumed_from']:
+                print(f"✓ Resumed from checkpoint at row {stats['resumed_from']}")
+            if stats['quarantined']:
+                print(f"⚠ {stats['quarantined']} rows failed and were quarantined to: "
+                      f"{quarantine_path_for(output_path)}")
+
+        print(f"✓ Successfully transformed {count} items")
         print(f"✓ Output saved to: {output_path}")
 
-        return inventory_items
+        if return_items:
+            return list(iter_records(output_path))
+        return count
 
     except Exception as e:
         print(f"Error processing file: {e}")
         import traceback
         traceback.print_exc()
+        if not (columnar or use_mmap or (workers and workers > 1)):
+            print("Progress was checkpointed; run the same command again to resume.")
         sys.exit(1)
 
 
 if __name__ == '__main__':
     # Default paths
-    default_csv = Path('/Users/chidiebereekennia/Downloads/drugs.csv')
+    default_csv = Path('/Users/chidiebereekennia/Downloads') / get_spec(CATEGORY)['csv']
 
     # Allow command line arguments
-    csv_path = sys.argv[1] if len(sys.argv) > 1 else str(default_csv)
-    output_path = sys.argv[2] if len(sys.argv) > 2 else None
-
-    transform_csv_to_inventory(csv_path, output_path)
-
+    parser = argparse.ArgumentParser(description="Transform a pills CSV into inventory items")
+    parser.add_argument('csv_path', nargs='?', default=str(default_csv))
+    parser.add_argument('output_path', nargs='?', default=None)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Split the CSV into byte ranges and transform them in N processes")
+    parser.add_argument('--columnar', action='store_true',
+                        help="Parse quantity columns with NumPy (requires numpy)")
+    parser.add_argument('--mmap', action='store_true',
+                        help="Scan the CSV from a memory-mapped buffer (no checkpoints: an interrupted run "
+                             "starts over)")
+    parser.add_argument('--compact', action='store_true',
+                        help="Write the JSON array without indentation")
+    parser.add_argument('--restart', action='store_true',
+                        help="Ignore the checkpoint of an interrupted run and start over")
+    parser.add_argument('--checkpoint-rows', type=int, default=CHECKPOINT_ROWS,
+                        help=f"Rows between checkpoints (default: {CHECKPOINT_ROWS})")
+    args = parser.parse_args()
+
+    transform_csv_to_inventory(args.csv_path, args.output_path, args.workers, args.columnar, args.mmap,
+                               args.compact, args.restart, args.checkpoint_rows)